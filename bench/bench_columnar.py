@@ -0,0 +1,113 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Samples export format benchmark.
+Encodes synthetic calibration sessions (test and reference photometers,
+one sample per second with frequency and box temperature noise) as CSV
+and as the columnar format, then compares their encoding time and their
+sizes as written into the ZIP archive with each compression codec.
+The columnar format is Parquet if pyarrow is installed, native otherwise.
+
+Usage: python bench/bench_columnar.py [-s SESSIONS] [-r ROUNDS] [-p SAMPLES] [--seed SEED]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import io
+import csv
+import time
+import random
+import zipfile
+import argparse
+import datetime
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.export import columnar, compress
+from tesslabel.export.engine import SAMPLES_HEADERS
+
+# ----------------
+# Module constants
+# ----------------
+
+ROLES = (
+    ('test', 'TESS-W', 'stars1000', '5C:CF:7F:00:00:01', 10.0),
+    ('ref',  'TESS-W', 'stars3',    '5C:CF:7F:76:65:54', 12.5),
+)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def session_rows(rnd, session, nrounds, per_round):
+    '''Samples rows of a session, as returned by the export samples query'''
+    start = datetime.datetime.fromisoformat(session)
+    rows = list()
+    for round_ in range(1, nrounds + 1):
+        for role, model, name, mac, freq in ROLES:
+            tstamp = start + datetime.timedelta(seconds=(round_ - 1) * per_round)
+            temp = 25.0 + rnd.gauss(0, 0.2)
+            for seq in range(per_round):
+                tstamp += datetime.timedelta(seconds=1, microseconds=rnd.randint(-20000, 20000))
+                temp += rnd.gauss(0, 0.01)
+                rows.append((model, name, mac, session, role, round_,
+                    tstamp.strftime('%Y-%m-%dT%H:%M:%S.%f'), round(freq + rnd.gauss(0, 0.02), 3), round(temp, 2), seq))
+    return rows
+
+
+def as_csv(rows):
+    '''Same encoding as the exporter CSV files'''
+    buffer = io.StringIO(newline='')
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(SAMPLES_HEADERS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def zipped(files, extension, codec):
+    '''Bytes taken by the files as entries of a ZIP archive'''
+    with zipfile.ZipFile(io.BytesIO(), 'w') as archive:
+        return sum(compress.append(archive, *compress.compress(f"samples{i}{extension}", data, codec)) for i, data in enumerate(files))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Samples export format benchmark')
+    parser.add_argument('-s', '--sessions', type=int, default=20, help='calibration sessions')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='rounds per session')
+    parser.add_argument('-p', '--samples', type=int, default=180, help='samples per round and photometer')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    options = parser.parse_args()
+    rnd = random.Random(options.seed)
+    t0 = datetime.datetime(2022, 1, 1, 20, 0, 0)
+    sessions = list()
+    for i in range(options.sessions):
+        session = (t0 + datetime.timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%S')
+        sessions.append((session, session_rows(rnd, session, options.rounds, options.samples)))
+    nrows = sum(len(rows) for session, rows in sessions)
+    print(f"{options.sessions} sessions, {nrows} samples, columnar format: {columnar.extension()}")
+    results = dict()
+    for label, extension, encode in (
+            ('csv', '.csv', lambda session, rows: as_csv(rows)),
+            ('columnar', columnar.extension(), columnar.encode_samples)):
+        t = time.perf_counter()
+        files = [encode(session, rows) for session, rows in sessions]
+        elapsed = time.perf_counter() - t
+        sizes = {'raw': sum(len(data) for data in files)}
+        for codec in compress.CODECS:
+            sizes[codec] = zipped(files, extension, codec)
+        results[label] = sizes
+        print(f"{label:<9s} encode = {1000*elapsed:8.1f} ms  " + "  ".join(f"{codec} = {size:>10d}" for codec, size in sizes.items()))
+    print("csv / columnar size ratio  " + "  ".join(f"{codec} = {results['csv'][codec] / results['columnar'][codec]:5.1f}" for codec in results['csv']))
+
+
+if __name__ == '__main__':
+    main()
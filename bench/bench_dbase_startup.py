@@ -0,0 +1,96 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Database bootstrap benchmark.
+Measures the DatabaseService startup path (file check, schema creation or
+update, configuration read) for a brand new database, a database two
+versions behind and an already current database.
+
+Usage: python bench/bench_dbase_startup.py [-n REPETITIONS]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel import SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR
+from tesslabel.dbase.utils import create_database, read_configuration, create_schema
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def bootstrap(path):
+    connection, _ = create_database(path)
+    configuration = read_configuration(connection)
+    just_created, file_list = create_schema(connection, SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR, configuration)
+    if just_created or file_list:
+        configuration = read_configuration(connection)
+    connection.close()
+    return configuration
+
+
+def downgrade(path):
+    '''Simulates a version 01 database, prior to the migrations ledger'''
+    connection, _ = create_database(path)
+    connection.executescript('''
+        DROP TABLE migrations_t;
+        DELETE FROM config_t WHERE section = 'database' AND property = 'profile';
+        UPDATE config_t SET value = '01' WHERE section = 'database' AND property = 'version';
+    ''')
+    connection.close()
+
+
+def measure(label, setup, path, n):
+    samples = list()
+    for i in range(n):
+        setup(path)
+        t0 = time.perf_counter()
+        bootstrap(path)
+        samples.append(time.perf_counter() - t0)
+    print(f"{label:<16s} median = {1000*statistics.median(samples):8.3f} ms   min = {1000*min(samples):8.3f} ms  ({n} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database bootstrap benchmark')
+    parser.add_argument('-n', '--repetitions', type=int, default=50, help='repetitions per scenario')
+    options = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix='tesslabel-bench-')
+    path = os.path.join(work_dir, 'bench.db')
+    try:
+        def fresh(path):
+            if os.path.exists(path):
+                os.remove(path)
+        def outdated(path):
+            fresh(path)
+            bootstrap(path)
+            downgrade(path)
+        def current(path):
+            if not os.path.exists(path):
+                bootstrap(path)
+        measure("new database", fresh, path, options.repetitions)
+        measure("outdated", outdated, path, options.repetitions)
+        fresh(path)
+        measure("current", current, path, options.repetitions)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
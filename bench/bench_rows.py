@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Row representation benchmark.
+Measures the time and memory needed to build 100k rows of tess_t columns
+with each of the dbase.tables row factories.
+
+Usage: python bench/bench_rows.py [-r ROWS] [-n REPETITIONS]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import time
+import sqlite3
+import argparse
+import statistics
+import tracemalloc
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.dbase.rows import make_row_factory, ROW_FACTORIES
+
+# ----------------
+# Module constants
+# ----------------
+
+COLUMNS = ('mac', 'prefix', 'suffix', 'sensor', 'zero_point', 'freq_offset', 'interval',
+    'telnet_port', 'broker', 'password_hash', 'ssid', 'creation_date')
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def fetch(nrows):
+    '''Result tuples exactly as returned by sqlite3 for a tess_t like table'''
+    connection = sqlite3.connect(':memory:')
+    connection.execute(f"CREATE TABLE tess_t({','.join(COLUMNS)})")
+    connection.executemany(f"INSERT INTO tess_t VALUES ({','.join('?' * len(COLUMNS))})", (
+        (f"{i:012X}", 'stars', i, 'TSL237', 20.5, 0.0, 60, 23, 'test.mosquitto.org', None, 'ssid', '2022-01-01T00:00:00')
+        for i in range(nrows)))
+    rows = connection.execute("SELECT * FROM tess_t").fetchall()
+    connection.close()
+    return rows
+
+
+def measure(kind, rows, n):
+    factory = make_row_factory(kind, COLUMNS, 'tess_t_row')
+    samples = list()
+    for i in range(n):
+        t0 = time.perf_counter()
+        result = factory(rows)
+        samples.append(time.perf_counter() - t0)
+        del result
+    tracemalloc.start()
+    result = factory(rows)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{kind:<12s} time = {1000*statistics.median(samples):8.2f} ms   memory = {memory/2**20:8.2f} MiB  ({len(rows)} rows, {n} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Row representation benchmark')
+    parser.add_argument('-r', '--rows', type=int, default=100000, help='rows per run')
+    parser.add_argument('-n', '--repetitions', type=int, default=10, help='repetitions per row factory')
+    options = parser.parse_args()
+    rows = fetch(options.rows)
+    for kind in ROW_FACTORIES:
+        measure(kind, rows, options.repetitions)
+
+
+if __name__ == '__main__':
+    main()
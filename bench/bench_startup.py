@@ -0,0 +1,99 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Startup benchmark.
+Measures the cold start of the tesslabel command (python -m tesslabel
+--version, which goes through all the top level imports) and, with
+python -X importtime, the cumulative import time of every entry point
+module together with the modules that weigh the most on each of them.
+Every measurement runs in a fresh interpreter.
+
+Usage: python bench/bench_startup.py [-n REPETITIONS] [-t TOP]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+# ----------------
+# Module constants
+# ----------------
+
+# Entry point modules, from the command line path to the GUI path
+MODULES = (
+    'tesslabel',
+    'tesslabel.dbase.service',
+    'tesslabel.cli.service',
+    'tesslabel.mail.service',
+    'tesslabel.gui.service',
+    'tesslabel.gui.application',
+    'tesslabel.gui.controller.batch',
+    'tesslabel.photometer.service',
+)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def environment():
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (src, env.get('PYTHONPATH'))))
+    return env
+
+
+def importtime(module, env):
+    '''Returns {module: (self_us, cumulative_us)} for a fresh import of module'''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        env=env, capture_output=True, text=True, check=True)
+    timings = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative))
+    return timings
+
+
+def cold_start(env, n):
+    samples = list()
+    for i in range(n):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'tesslabel', '--version'], env=env, capture_output=True, check=True)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup benchmark')
+    parser.add_argument('-n', '--repetitions', type=int, default=10, help='repetitions per measurement')
+    parser.add_argument('-t', '--top', type=int, default=5, help='heaviest imported modules shown per entry point')
+    options = parser.parse_args()
+    env = environment()
+    samples = cold_start(env, options.repetitions)
+    print(f"{'cold start':<36s} median = {1000*statistics.median(samples):8.1f} ms   min = {1000*min(samples):8.1f} ms  ({options.repetitions} runs)")
+    for module in MODULES:
+        runs = [importtime(module, env) for i in range(options.repetitions)]
+        cumulative = statistics.median(run[module][1] for run in runs)
+        print(f"{module:<36s} median = {cumulative/1000:8.1f} ms")
+        # Heaviest modules by their own import time, as seen in the median run
+        run = sorted(runs, key=lambda run: run[module][1])[len(runs) // 2]
+        heaviest = sorted(((self_us, name) for name, (self_us, _) in run.items() if name != module), reverse=True)
+        for self_us, name in heaviest[:options.top]:
+            print(f"    {name:<32s} self   = {self_us/1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
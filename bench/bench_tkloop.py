@@ -0,0 +1,108 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Tk event loop integration benchmark.
+For every tesslabel.gui.tkloop mode, measures the process CPU usage while
+the GUI is idle and the latency from a reactor callback changing a widget
+to Tk handling the resulting event. Each mode runs in its own process,
+since a reactor can not be restarted. Needs a display.
+
+Usage: python bench/bench_tkloop.py [-i IDLE_SECONDS] [-e EVENTS] [--no-wakeup]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import sys
+import time
+import random
+import argparse
+import subprocess
+import statistics
+import tkinter as tk
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.internet import reactor
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.gui import tkloop
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def run(mode, idle, events, wakeup):
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"{mode:<10s} skipped: {e}")
+        return
+    label = tk.Label(root, text='0', width=12)
+    label.pack()
+    tkloop.install(root, mode)
+    latencies = list()
+    state = dict()
+
+    def onPing(event):
+        latencies.append(time.perf_counter() - state['t0'])
+
+    def ping(i):
+        state['t0'] = time.perf_counter()
+        label.configure(text=str(i))
+        root.event_generate('<<Ping>>', when='tail')
+        if wakeup:
+            tkloop.wakeup()
+        if i < events:
+            reactor.callLater(random.uniform(0.05, 0.25), ping, i + 1)
+        else:
+            reactor.callLater(0.3, reactor.stop)
+
+    def idleBegin():
+        state['cpu'], state['wall'] = time.process_time(), time.perf_counter()
+        reactor.callLater(idle, idleEnd)
+
+    def idleEnd():
+        state['usage'] = (time.process_time() - state['cpu']) / (time.perf_counter() - state['wall'])
+        ping(1)
+
+    root.bind('<<Ping>>', onPing)
+    # Let the window be mapped before measuring
+    reactor.callLater(1, idleBegin)
+    reactor.run()
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{mode:<10s} idle CPU = {100*state['usage']:6.2f} %   latency median = {1000*statistics.median(latencies):6.2f} ms  "
+        f"p95 = {1000*p95:6.2f} ms  max = {1000*latencies[-1]:6.2f} ms  ({len(latencies)} events)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tk event loop integration benchmark')
+    parser.add_argument('-i', '--idle', type=float, default=10, help='idle CPU measurement seconds')
+    parser.add_argument('-e', '--events', type=int, default=100, help='latency measurement events')
+    parser.add_argument('--no-wakeup', action='store_true', default=False, help="don't call tkloop.wakeup() after widget changes")
+    parser.add_argument('--mode', type=str, choices=tkloop.MODES, default=None, help='run a single mode in this process')
+    options = parser.parse_args()
+    if options.mode:
+        run(options.mode, options.idle, options.events, not options.no_wakeup)
+        return
+    for mode in tkloop.MODES:
+        args = [sys.executable, __file__, '--mode', mode, '--idle', str(options.idle), '--events', str(options.events)]
+        if options.no_wakeup:
+            args.append('--no-wakeup')
+        subprocess.run(args, check=True)
+
+
+if __name__ == '__main__':
+    main()
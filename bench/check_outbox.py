@@ -0,0 +1,202 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Email outbox functional check against a local SMTP stand-in (not a benchmark).
+Starts a Twisted ESMTP server on localhost and an OutboxService over a
+scratch database, then checks one delivery with attachment going through
+at the first attempt, and one delivery rejected by the server, scheduled
+for a retry after the backoff delay and delivered at the second attempt.
+Prints the delivery times and exits with status 1 if any check fails.
+
+Usage: python bench/check_outbox.py [-d RETRY_DELAY]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from zope.interface import implementer
+from twisted.mail import smtp
+from twisted.internet import reactor, defer, task
+from twisted.python.failure import Failure
+from twisted.application import service
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.dbase.service import DatabaseService
+from tesslabel.mail.service import OutboxService, STATUS_SENT, STATUS_PENDING
+
+# ----------------
+# Module constants
+# ----------------
+
+SENDER    = 'station@example.org'
+RECEIVERS = 'first@example.org, second@example.org'
+
+NRECEIVERS = len(RECEIVERS.split(','))
+
+# --------------
+# Module Classes
+# --------------
+
+@implementer(smtp.IMessage)
+class Message:
+
+    def __init__(self, server):
+        self.server = server
+        self.lines = list()
+
+    def lineReceived(self, line):
+        self.lines.append(line)
+
+    def eomReceived(self):
+        self.server.received.append(b'\n'.join(self.lines))
+        return defer.succeed(None)
+
+    def connectionLost(self):
+        pass
+
+
+@implementer(smtp.IMessageDelivery)
+class StandIn(smtp.SMTPFactory):
+    '''
+    ESMTP server keeping a copy of the messages received per recipient,
+    rejecting recipients while reject is set
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.received = list()
+        self.reject = False
+
+    def buildProtocol(self, addr):
+        protocol = smtp.ESMTP()
+        protocol.factory = self
+        protocol.delivery = self
+        return protocol
+
+    def receivedHeader(self, helo, origin, recipients):
+        return b'Received: from tesslabel bench'
+
+    def validateFrom(self, helo, origin):
+        return origin
+
+    def validateTo(self, user):
+        if self.reject:
+            raise smtp.SMTPBadRcpt(user)
+        return lambda: Message(self)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def check(label, condition, failures):
+    print(f"{'ok    ' if condition else 'FAILED'} {label}")
+    if not condition:
+        failures.append(label)
+
+
+def outbox(txn):
+    txn.execute("SELECT id, status, attempts, next_attempt, last_error FROM outbox_t ORDER BY id")
+    return txn.fetchall()
+
+
+@defer.inlineCallbacks
+def run(application, database, mailer, server, port, attachment, retry_delay, failures):
+    service.IService(application).startService()
+    mailer.retry_delay = retry_delay
+    yield database.dao.config.saveSection('smtp', {'host': '127.0.0.1', 'port': str(port.getHost().port),
+        'sender': SENDER, 'receivers': RECEIVERS, 'password': '', 'starttls': '0'})
+
+    # Success path
+    yield mailer.enqueue('Bench report', 'With attachment', attachment=attachment)
+    t0 = time.perf_counter()
+    yield mailer.flush()
+    elapsed = time.perf_counter() - t0
+    rows = yield database.pool.runReadInteraction(outbox)
+    print(f"first attempt delivery: {1000*elapsed:.1f} ms")
+    check("delivered at the first attempt", rows[0][1:3] == (STATUS_SENT, 1), failures)
+    name = os.path.basename(attachment).encode()
+    check("attachment received by every recipient", len(server.received) == NRECEIVERS and all(name in m for m in server.received), failures)
+
+    # Retry path
+    server.reject = True
+    yield mailer.enqueue('Bench retry', 'Rejected once')
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    yield mailer.flush()
+    rows = yield database.pool.runReadInteraction(outbox)
+    _, status, attempts, next_attempt, error = rows[1]
+    delay = (datetime.datetime.fromisoformat(next_attempt) - now).total_seconds()
+    print(f"rejected, retry in {delay:.1f} s.: {error.splitlines()[0]}")
+    check("pending after a rejection", (status, attempts) == (STATUS_PENDING, 1), failures)
+    check("retry delayed by the backoff", retry_delay - 1 <= delay <= 1.1 * retry_delay + 1, failures)
+    server.reject = False
+    yield mailer.flush()
+    rows = yield database.pool.runReadInteraction(outbox)
+    check("not retried before its due time", rows[1][1:3] == (STATUS_PENDING, 1), failures)
+    yield task.deferLater(reactor, delay + 1, lambda: None)
+    t0 = time.perf_counter()
+    yield mailer.flush()
+    elapsed = time.perf_counter() - t0
+    rows = yield database.pool.runReadInteraction(outbox)
+    print(f"second attempt delivery: {1000*elapsed:.1f} ms")
+    check("delivered at the second attempt", rows[1][1:3] == (STATUS_SENT, 2), failures)
+    check("second message received by every recipient", len(server.received) == 2 * NRECEIVERS, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Email outbox check against a local SMTP stand-in')
+    parser.add_argument('-d', '--retry-delay', type=int, default=2, help='seconds before the first retry')
+    options = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix='tesslabel-bench-')
+    attachment = os.path.join(work_dir, 'bench_report.zip')
+    with open(attachment, 'wb') as fd:
+        fd.write(os.urandom(64*1024))
+    application = service.Application("bench")
+    database = DatabaseService(path=os.path.join(work_dir, 'bench.db'))
+    database.setName(DatabaseService.NAME)
+    database.setServiceParent(application)
+    mailer = OutboxService()
+    mailer.setName(OutboxService.NAME)
+    mailer.setServiceParent(application)
+    server = StandIn()
+    port = reactor.listenTCP(0, server, interface='127.0.0.1')
+    failures = list()
+
+    def done(result):
+        if isinstance(result, Failure):
+            result.printTraceback()
+            failures.append('run')
+        # The database service stops the reactor once stopped
+        port.stopListening()
+        service.IService(application).stopService()
+
+    reactor.callWhenRunning(lambda: run(application, database, mailer, server, port, attachment, options.retry_delay, failures).addBoth(done))
+    try:
+        reactor.run()
+    finally:
+        shutil.rmtree(work_dir)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
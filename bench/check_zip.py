@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+ZIP entries round trip check for export/compress.py.
+For every codec and a few kinds of contents (empty, short text, random
+bytes, over a MiB of CSV like text, an already compressed file name),
+writes archives with compress() + append() and with EntryStream + append(),
+then checks that ZipFile.testzip() finds no error, that every entry reads
+back to its contents and that both archives are byte identical to the same
+entries written by ZipFile.writestr(). Runs both with the RAW path forced,
+whatever compress.RAW_VERSIONS says, and with the writestr() fallback.
+Run it on a new Python version before adding it to compress.RAW_VERSIONS.
+Exits with status 1 if any check fails.
+
+Usage: python bench/check_zip.py [-l LEVEL] [--seed SEED]
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import io
+import sys
+import random
+import zipfile
+import argparse
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.export import compress
+
+# ----------------
+# Module constants
+# ----------------
+
+DATE_TIME = (2022, 1, 1, 20, 0, 0)
+
+# Bytes written at a time into an EntryStream
+WRITE_SIZE = 100000
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def contents(rnd):
+    '''(name, data) entries exercising the compressors'''
+    lines = (f"2022-01-01T20:00:{i % 60:02d}.{i:06d};TESS-W;stars{i % 7};{10 + rnd.gauss(0, 0.02):.3f};{i}\n" for i in range(40000))
+    return (
+        ('empty.csv', b''),
+        ('short.csv', b'session;role;round\n2022-01-01T20:00:00;test;1\n'),
+        ('random.bin', rnd.randbytes(300000)),
+        ('samples.csv', ''.join(lines).encode('utf-8')),
+        ('samples.tsc', rnd.randbytes(5000)),
+    )
+
+
+def reference(entries, codec, level):
+    '''Archive bytes written by ZipFile.writestr()'''
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=DATE_TIME)
+            info.external_attr = 0o600 << 16
+            stored = name.endswith(compress.COMPRESSED_EXTENSIONS)
+            compress_type = zipfile.ZIP_STORED if stored else compress.CODECS[codec]
+            archive.writestr(info, data, compress_type=compress_type, compresslevel=level)
+    return buffer.getvalue()
+
+
+def appended(entries, codec, level):
+    '''Archive bytes written by compress() + append()'''
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compresslevel=level) as archive:
+        for name, data in entries:
+            compress.append(archive, *compress.compress(name, data, codec, level, DATE_TIME))
+    return buffer.getvalue()
+
+
+def streamed(entries, codec, level):
+    '''Archive bytes written by EntryStream + append()'''
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compresslevel=level) as archive:
+        for name, data in entries:
+            spool = io.BytesIO()
+            stream = compress.EntryStream(spool, name, codec, level, DATE_TIME)
+            for i in range(0, len(data), WRITE_SIZE):
+                stream.write(data[i:i+WRITE_SIZE])
+            stream.close()
+            spool.seek(stream.offset)
+            compress.append(archive, stream.info, spool)
+    return buffer.getvalue()
+
+
+def check(label, condition, failures):
+    print(f"{'ok    ' if condition else 'FAILED'} {label}")
+    if not condition:
+        failures.append(label)
+
+
+def verify(label, data, entries, expected, failures):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        check(f"{label}: testzip", archive.testzip() is None, failures)
+        check(f"{label}: contents", all(archive.read(name) == value for name, value in entries), failures)
+    check(f"{label}: same bytes as writestr()", data == expected, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ZIP entries round trip check')
+    parser.add_argument('-l', '--level', type=int, default=None, help='compression level, codec default if not given')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    options = parser.parse_args()
+    entries = contents(random.Random(options.seed))
+    print(f"Python {sys.version.split()[0]}, RAW = {compress.RAW}")
+    failures = list()
+    raw = compress.RAW
+    for mode in ((True, False) if compress._INTERNALS else (False,)):
+        compress.RAW = mode
+        for codec in compress.CODECS:
+            level = options.level if options.level is None or options.level in compress.LEVELS[codec] else None
+            expected = reference(entries, codec, level)
+            prefix = f"{'raw' if mode else 'writestr'} {codec}"
+            verify(f"{prefix} compress()", appended(entries, codec, level), entries, expected, failures)
+            verify(f"{prefix} EntryStream", streamed(entries, codec, level), entries, expected, failures)
+    compress.RAW = raw
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,7 @@ import os
 import sys
 
 # Access SQL scripts withing the package
-from pkg_resources import resource_filename
+from importlib.resources import files
 
 # ---------------
 # Twisted imports
@@ -25,7 +25,7 @@ from twisted  import __version__ as __twisted_version__
 # local imports
 # -------------
 
-from ._version import get_versions
+from ._version import __version__
 
 
 # ----------------
@@ -61,9 +61,9 @@ TSTAMP_SESSION_FMT = '%Y-%m-%dT%H:%M:%S'
 
 
 # DATABASE RESOURCES
-SQL_SCHEMA           = resource_filename(__name__, os.path.join('dbase', 'sql', 'schema.sql'))
-SQL_INITIAL_DATA_DIR = resource_filename(__name__, os.path.join('dbase', 'sql', 'initial' ))
-SQL_UPDATES_DATA_DIR = resource_filename(__name__, os.path.join('dbase', 'sql', 'updates' ))
+SQL_SCHEMA           = str(files(__name__).joinpath('dbase/sql/schema.sql'))
+SQL_INITIAL_DATA_DIR = str(files(__name__).joinpath('dbase/sql/initial'))
+SQL_UPDATES_DATA_DIR = str(files(__name__).joinpath('dbase/sql/updates'))
 
 # ------------------------
 # Module Utility Functions
@@ -84,8 +84,6 @@ def set_status_code(code):
 # Assume bad result unless we set it to ok
 _exit_status_code = 1
 
-__version__ = get_versions()['version']
-
 name = os.path.split(os.path.dirname(sys.argv[0]))[-1]
 
 FULL_VERSION_STRING = "{4} {0} on Twisted {1}, Python {2}.{3}".format(
@@ -95,5 +93,4 @@ FULL_VERSION_STRING = "{4} {0} on Twisted {1}, Python {2}.{3}".format(
 		sys.version_info.minor,
 		name)
 
-del get_versions
 del name
@@ -71,6 +71,7 @@ def createParser():
     # -----------------------------------------------------------------------------------
 
     parser_gui.add_argument('-m','--messages', type=str, choices=["ref","test","both"], default=None, help='log photometer messages')
+    parser_gui.add_argument('--loop', type=str, choices=["poll","adaptive"], default="poll", help='Tk event loop integration: fixed 10 ms polling (default) or adaptive')
 
     # -----------------------------
     # Arguments for 'cli' command
@@ -78,6 +79,14 @@ def createParser():
    
     group0 = parser_cli.add_mutually_exclusive_group()
     group0.add_argument('-t', '--test',    action='store_true',  default=False, help="Don't update database")
+    group1 = parser_cli.add_mutually_exclusive_group()
+    group1.add_argument('--export-changes', type=str, default=None, metavar='<file path>', help='export registered photometers changes not yet sent to --remote database')
+    group1.add_argument('--import-changes', type=str, default=None, metavar='<file path>', help='import a changes file exported by another database')
+    group1.add_argument('--export-batch', type=str, default=None, metavar='<file path>', help='export the latest closed batch into a ZIP file')
+    parser_cli.add_argument('--remote', type=str, default=None, metavar='<UUID>', help='remote database UUID for --export-changes')
+    parser_cli.add_argument('--full', action='store_true', default=False, help='export all changes, not only those not yet sent')
+    parser_cli.add_argument('--updated', action='store_true', default=False, help='--export-batch only calibrations whose zero point was written to the photometer')
+    parser_cli.add_argument('--format', type=str, choices=["csv","columnar"], default="csv", help='--export-batch samples file format')
    
     return parser
 
@@ -111,6 +120,14 @@ if options.command == 'gui':
     )
     guiService.setName(GraphicalService.NAME)
     guiService.setServiceParent(application)
+    from tesslabel.dbase.maintenance import MaintenanceService
+    maintenanceService = MaintenanceService()
+    maintenanceService.setName(MaintenanceService.NAME)
+    maintenanceService.setServiceParent(application)
+    from tesslabel.mail.service import OutboxService
+    outboxService = OutboxService()
+    outboxService.setName(OutboxService.NAME)
+    outboxService.setServiceParent(application)
 elif options.command == 'cli':
     from tesslabel.cli.service      import CommandLineService
     batchService = CommandLineService(
@@ -85,6 +85,14 @@ class CommandLineService(MultiService):
         log.warn("tesslabel {full_version}",full_version=FULL_VERSION_STRING)
         self.dbaseServ = self.parent.getServiceNamed(DatabaseService.NAME)
         self.dbaseServ.setTestMode(self._cmd_options['test'])
+        if self._cmd_options['export_changes'] or self._cmd_options['import_changes']:
+            super().startService() # so we can handle the 'running' attribute
+            reactor.callLater(0, self.syncChanges)
+            return
+        if self._cmd_options['export_batch']:
+            super().startService() # so we can handle the 'running' attribute
+            reactor.callLater(0, self.exportBatch)
+            return
         pub.subscribe(self.onPhotometerInfo, 'phot_info')
         pub.subscribe(self.onPhotometerOffline, 'phot_offline')
         self.photomServ = self.build()
@@ -104,6 +112,55 @@ class CommandLineService(MultiService):
         set_status_code(exit_code)
         yield self.parent.stopService()
 
+    @inlineCallbacks
+    def syncChanges(self):
+        dao = self.dbaseServ.dao
+        try:
+            if self._cmd_options['export_changes']:
+                if not self._cmd_options['remote']:
+                    raise ValueError("--remote database UUID is needed to export changes")
+                count = yield dao.exportChangeset(self._cmd_options['remote'], self._cmd_options['export_changes'], self._cmd_options['full'])
+                log.warn("Exported {n} changes to {path}", n=count, path=self._cmd_options['export_changes'])
+            else:
+                count = yield dao.importChangeset(self._cmd_options['import_changes'])
+                log.warn("Imported {n} changes from {path}", n=count, path=self._cmd_options['import_changes'])
+        except Exception as e:
+            log.failure("{e}", e=e)
+            yield self.quit(exit_code=1)
+        else:
+            yield self.quit(exit_code=0)
+
+    @inlineCallbacks
+    def exportBatch(self):
+        from tesslabel.export.engine import BatchExporter
+        dao = self.dbaseServ.dao
+        try:
+            latest = yield dao.batch.latest()
+            if latest['begin_tstamp'] is None:
+                raise ValueError("No batch to export")
+            if latest['end_tstamp'] is None:
+                raise ValueError("Must close batch first!")
+            exporter = BatchExporter(dao.pool)
+            exporter.configure(dict((yield dao.config.loadSection('export'))))
+            pub.subscribe(self.onExportProgress, 'export_progress')
+            count = yield exporter.export(latest['begin_tstamp'], latest['end_tstamp'], self._cmd_options['updated'],
+                self._cmd_options['export_batch'], samples_format=self._cmd_options['format'])
+            log.warn("Exported {n} calibrations to {path}", n=count, path=self._cmd_options['export_batch'])
+        except Exception as e:
+            log.failure("{e}", e=e)
+            yield self.quit(exit_code=1)
+        else:
+            yield self.quit(exit_code=0)
+
+    def onExportProgress(self, progress):
+        if progress['phase'] == 'encode' and progress['done']:
+            log.info("Export {phase} [{done}/{total}] {rps:.0f} rows/s, {nbytes} bytes, ETA {eta:.1f} s.",
+                phase=progress['phase'], done=progress['done'], total=progress['total'], rps=progress['rows_per_s'],
+                nbytes=progress['bytes'], eta=progress['eta'] or 0.0)
+        else:
+            log.info("Export {phase} after {elapsed:.2f} s., {nbytes} bytes", phase=progress['phase'],
+                elapsed=progress['elapsed'], nbytes=progress['bytes'])
+
     def onPhotometerOffline(self, role):
         set_status_code(1)
         reactor.callLater(1, self.parent.stopService)
@@ -118,6 +175,9 @@ class CommandLineService(MultiService):
             log.info("[{label}] Model        : {value}", label=label, value=info['model'])      
             log.info("[{label}] MAC          : {value}", label=label, value=info['mac'])
             log.info("[{label}] Firmware     : {value}", label=label, value=info['firmware'])
+            registered = yield self.dbaseServ.dao.lookupMac(info['mac'])
+            if registered:
+                log.warn("[{label}] Already registered as {prefix}{suffix}", label=label, prefix=registered[0], suffix=registered[1])
         if role == 'test' and self._cmd_options['dry_run']:
             log.info('Dry run. Will stop here ...') 
             set_status_code(0)
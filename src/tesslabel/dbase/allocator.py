@@ -0,0 +1,167 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+from twisted.internet import defer
+from twisted.internet.defer import inlineCallbacks
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'alloc'
+
+# Default number of suffixes reserved per database transaction
+BLOCK_SIZE = 50
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# --------------
+# Module Classes
+# --------------
+
+class SuffixAllocator:
+    '''
+    Hands out name suffixes (i.e. the NNNN in starsNNNN) for a given photometer model.
+    Suffixes are reserved in blocks by bumping the ('<model>', 'number')
+    seed in config_t in a single write transaction, and then handed out from memory.
+    The seed is never set below an already registered suffix in tess_t.
+
+    The seed is local to each database, so stations registering photometers
+    on their own databases (see ChangesetSync) must use disjoint suffixes:
+    with ('<model>', 'stations', N) and ('<model>', 'station', K) in config_t,
+    station K (0 <= K < N) only hands out suffixes S with S % N == K.
+    A single station (N = 1, K = 0) is assumed by default.
+    '''
+
+    def __init__(self, pool, config, model, block_size=BLOCK_SIZE, log_level='info'):
+        self._pool = pool
+        self._config = config
+        self._model = model
+        self._block_size = block_size
+        self._next = 0
+        self._end  = 0   # One past the last reserved suffix
+        self._station  = 0
+        self._stations = 1
+        self._lock = defer.DeferredLock()
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def allocate(self):
+        '''Returns a Deferred with a (prefix, suffix) tuple'''
+        section = yield self._config.loadSection(self._model)
+        prefix = section.get('prefix') if section else None
+        if not prefix:
+            raise ValueError(f"No name prefix for {self._model}, add ('{self._model}', 'prefix', <prefix>) to config_t")
+        station, stations = self._stride(section)
+        suffix = yield self._lock.run(self._allocate, prefix, station, stations)
+        return prefix, suffix
+
+    def release(self):
+        '''
+        Gives back the unused part of the current block, provided that no other
+        process has reserved a block after ours. Returns a Deferred
+        '''
+        return self._lock.run(self._release)
+
+    def remaining(self):
+        '''Suffixes still available in memory'''
+        return (self._end - self._next) // self._stations
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _stride(self, section):
+        '''(station, stations) from the model section'''
+        try:
+            station, stations = int(section.get('station', 0)), int(section.get('stations', 1))
+        except ValueError:
+            raise ValueError(f"Invalid ('{self._model}', 'station' | 'stations') values in config_t")
+        if not 0 <= station < stations:
+            raise ValueError(f"{self._model} station {station} must be between 0 and {stations - 1}")
+        return station, stations
+
+    @inlineCallbacks
+    def _allocate(self, prefix, station, stations):
+        if (station, stations) != (self._station, self._stations):
+            yield self._release()   # block reserved for another station setting
+        if self._next >= self._end:
+            first = yield self._pool.runInteraction(self._reserve, prefix, self._block_size, station, stations)
+            self._station, self._stations = station, stations
+            self._next, self._end = first, first + self._block_size * stations
+            self._config.refresh(self._model, 'number', str(self._end))
+            log.info("{model} reserved suffixes [{first}-{last}]", model=self._model, first=first, last=self._end-stations)
+        suffix = self._next
+        self._next += self._stations
+        return suffix
+
+    @inlineCallbacks
+    def _release(self):
+        if self._next >= self._end:
+            return False
+        released = yield self._pool.runInteraction(self._giveBack, self._next, self._end)
+        if released:
+            self._config.refresh(self._model, 'number', str(self._next))
+            log.info("{model} released suffixes [{first}-{last}]", model=self._model, first=self._next, last=self._end-self._stations)
+        else:
+            log.warn("{model} could not release suffixes [{first}-{last}]", model=self._model, first=self._next, last=self._end-self._stations)
+        self._end = self._next
+        return released
+
+    # -----------------
+    # Write interactions
+    # -----------------
+
+    def _reserve(self, txn, prefix, count, station, stations):
+        row = {'section': self._model, 'prefix': prefix}
+        txn.execute("SELECT CAST(value AS INTEGER) FROM config_t WHERE section = :section AND property = 'number'", row)
+        result = txn.fetchone()
+        first = result[0] if result and result[0] is not None else 0
+        txn.execute("SELECT MAX(suffix) FROM tess_t WHERE prefix = :prefix", row)
+        used = txn.fetchone()[0]
+        if used is not None:
+            first = max(first, used + 1)
+        first += (station - first) % stations     # first suffix of this station
+        row['value'] = str(first + count * stations)
+        txn.execute("INSERT OR REPLACE INTO config_t(section, property, value) VALUES (:section, 'number', :value)", row)
+        return first
+
+    def _giveBack(self, txn, next_suffix, end):
+        row = {'section': self._model, 'next': str(next_suffix), 'end': end}
+        txn.execute('''
+            UPDATE config_t SET value = :next
+            WHERE section = :section AND property = 'number' AND CAST(value AS INTEGER) = :end
+            ''', row)
+        return txn.rowcount == 1
+
+
+__all__ = [
+    "SuffixAllocator",
+]
@@ -0,0 +1,237 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import os
+import re
+import pathlib
+import sqlite3
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+from tesslabel.dbase.utils import apply_pragmas
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'archive'
+
+# Calibration tables moved into the archive and the column selecting a batch rows
+ARCHIVE_TABLES = {
+    'summary_t': 'session',
+    'rounds_t' : 'session',
+    'samples_t': 'session',
+}
+
+# The batch row itself is copied, not moved, so that the archive file is self describing
+BATCH_TABLE = 'batch_t'
+
+ARCHIVE_SCHEMA = 'archive'
+
+# SQLite default limit of attached databases per connection
+MAX_ATTACHED = 10
+
+# Archived batches overlapping a time range
+SQL_ARCHIVES = '''
+    SELECT path FROM archive_t
+    WHERE begin_tstamp <= :end_tstamp AND end_tstamp >= :begin_tstamp
+    ORDER BY begin_tstamp
+'''
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _present_tables(cursor, schema='main'):
+    cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+    return set(row[0] for row in cursor.fetchall())
+
+def _archive_ddl(cursor, table):
+    '''Table definition in main rewritten for the attached archive schema'''
+    cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = :name", {'name': table})
+    ddl = cursor.fetchone()[0]
+    return re.sub(r'^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?', f'CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.', ddl, flags=re.IGNORECASE)
+
+def attach_archives(cursor, paths):
+    '''
+    Attaches the archive databases read only and shadows every archived table
+    with a temporary view of the same name over the live and archived rows,
+    so that unqualified queries see the archived batches as if still live.
+    The views have no rowid.
+    '''
+    if len(paths) > MAX_ATTACHED:
+        raise ValueError(f"{len(paths)} archived batches in range, cannot query more than {MAX_ATTACHED} at once")
+    live = _present_tables(cursor)
+    sources = dict()
+    for i, path in enumerate(paths):
+        schema = f"{ARCHIVE_SCHEMA}{i}"
+        cursor.execute(f"ATTACH DATABASE :uri AS {schema}", {'uri': pathlib.Path(path).as_uri() + '?mode=ro'})
+        for table in _present_tables(cursor, schema) & live & set(ARCHIVE_TABLES):
+            sources.setdefault(table, [f"main.{table}"]).append(f"{schema}.{table}")
+    for table, tables in sources.items():
+        union = " UNION ALL ".join(f"SELECT * FROM {name}" for name in tables)
+        cursor.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return sorted(sources)
+
+# --------------
+# Module Classes
+# --------------
+
+class BatchArchiver:
+    '''
+    Moves a closed batch calibration data (summary, rounds and samples) into
+    a per batch archive database, so that the live database stays small.
+    The archive file is ATTACHed on demand, both for the move, done with
+    set based INSERT ... SELECT / DELETE in one transaction, and for queries
+    on archived data (see runArchiveInteraction).
+    Archiving the same batch again moves any rows added since then.
+    A batch without rows to move is not recorded in archive_t.
+    '''
+
+    def __init__(self, pool, archive_dir=None, log_level='info'):
+        self._pool = pool
+        if archive_dir is None:
+            archive_dir = os.path.join(os.path.dirname(os.path.abspath(pool.path)), 'archive')
+        self._archive_dir = archive_dir
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def archive(self, begin_tstamp, end_tstamp):
+        '''Moves the batch data into its archive database. Returns a Deferred with the rows moved'''
+        name = f"batch_{begin_tstamp}.db".replace('-','').replace(':','')
+        path = os.path.join(self._archive_dir, name)
+        nrows = yield self._pool.runOperation(self._move, begin_tstamp, end_tstamp, path)
+        if not nrows:
+            log.warn("Nothing to archive from batch {begin}", begin=begin_tstamp)
+            return nrows
+        log.info("Archived {n} rows from batch {begin} into {path}", n=nrows, begin=begin_tstamp, path=path)
+        return nrows
+
+    def archives(self):
+        '''Returns a Deferred with the list of archived batches as (begin_tstamp, end_tstamp, path, nrows, archived_at)'''
+        return self._pool.runReadInteraction(self._readArchives)
+
+    @inlineCallbacks
+    def runArchiveInteraction(self, begin_tstamp, interaction, *args, **kw):
+        '''
+        Runs interaction(cursor, *args, **kw) in a worker thread over a read only connection
+        with the batch archive database attached as 'archive'. For every archived table,
+        a temporary <table>_all view joins the live and archived rows.
+        Returns a Deferred
+        '''
+        path = yield self._pool.runReadInteraction(self._readPath, begin_tstamp)
+        if path is None:
+            raise KeyError(f"Batch {begin_tstamp} has not been archived")
+        result = yield deferToThread(self._attached, path, interaction, args, kw)
+        return result
+
+    # -----------------
+    # Read interactions
+    # -----------------
+
+    def _readArchives(self, txn):
+        txn.execute("SELECT begin_tstamp, end_tstamp, path, nrows, archived_at FROM archive_t ORDER BY begin_tstamp")
+        return txn.fetchall()
+
+    def _readPath(self, txn, begin_tstamp):
+        txn.execute("SELECT path FROM archive_t WHERE begin_tstamp = :begin", {'begin': begin_tstamp})
+        result = txn.fetchone()
+        return result[0] if result else None
+
+    def _attached(self, path, interaction, args, kw):
+        # Runs in a worker thread
+        connection = sqlite3.connect(self._pool.uri, uri=True)
+        try:
+            if self._pool.pragmas:
+                apply_pragmas(connection, self._pool.pragmas, read_only=True)
+            cursor = connection.cursor()
+            cursor.execute(f"ATTACH DATABASE :uri AS {ARCHIVE_SCHEMA}", {'uri': pathlib.Path(path).as_uri() + '?mode=ro'})
+            archived = _present_tables(cursor, ARCHIVE_SCHEMA)
+            for table in _present_tables(cursor) & archived & set(ARCHIVE_TABLES):
+                cursor.execute(f"CREATE TEMP VIEW {table}_all AS SELECT * FROM main.{table} UNION ALL SELECT * FROM {ARCHIVE_SCHEMA}.{table}")
+            return interaction(cursor, *args, **kw)
+        finally:
+            connection.close()
+
+    # ----------------------
+    # Write thread operation
+    # ----------------------
+
+    def _move(self, connection, begin_tstamp, end_tstamp, path):
+        # ATTACH cannot be executed inside a transaction, hence a writer operation
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        created = not os.path.exists(path)
+        row = {'begin': begin_tstamp, 'end': end_tstamp, 'path': path, 'nrows': 0}
+        cursor = connection.cursor()
+        cursor.execute(f"ATTACH DATABASE :path AS {ARCHIVE_SCHEMA}", row)
+        try:
+            tables = _present_tables(cursor) & (set(ARCHIVE_TABLES) | {BATCH_TABLE})
+            for table in sorted(tables):
+                cursor.execute(_archive_ddl(cursor, table))
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if BATCH_TABLE in tables:
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{BATCH_TABLE}
+                        SELECT * FROM main.{BATCH_TABLE} WHERE begin_tstamp = :begin
+                        ''', row)
+                for table in sorted(tables - {BATCH_TABLE}):
+                    condition = f"{ARCHIVE_TABLES[table]} BETWEEN :begin AND :end"
+                    cursor.execute(f"INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table} SELECT * FROM main.{table} WHERE {condition}", row)
+                    cursor.execute(f"DELETE FROM main.{table} WHERE {condition}", row)
+                    row['nrows'] += cursor.rowcount
+                # Missing or empty tables: no archive to record
+                if row['nrows']:
+                    cursor.execute('''
+                        INSERT INTO archive_t(begin_tstamp, end_tstamp, path, nrows, archived_at)
+                        VALUES (:begin, :end, :path, :nrows, datetime('now'))
+                        ON CONFLICT(begin_tstamp) DO UPDATE SET
+                            path = excluded.path, nrows = nrows + excluded.nrows, archived_at = excluded.archived_at
+                        ''', row)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        finally:
+            cursor.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+            cursor.close()
+        if not row['nrows'] and created and os.path.exists(path):
+            os.remove(path)
+        return row['nrows']
+
+
+__all__ = [
+    "ARCHIVE_TABLES",
+    "SQL_ARCHIVES",
+    "BatchArchiver",
+    "attach_archives",
+]
@@ -0,0 +1,126 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'batch_t'
+
+BATCH_COLUMNS = ('begin_tstamp', 'end_tstamp', 'email_sent', 'calibrations', 'comment')
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# --------------
+# Module Classes
+# --------------
+
+class BatchTable:
+    '''
+    Calibration batches (batch_t). A batch is open from its begin_tstamp
+    until closed with its end_tstamp and number of calibrations. At most
+    one batch is open at a time. Batches are returned as dictionaries
+    with BATCH_COLUMNS keys.
+    '''
+
+    def __init__(self, pool, log_level='info'):
+        self._pool = pool
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    def isOpen(self):
+        '''Returns a Deferred with True if there is an open batch'''
+        return self._pool.runReadInteraction(self._isOpen)
+
+    def open(self, tstamp):
+        '''Opens a new batch starting at tstamp. Returns a Deferred'''
+        return self._pool.runInteraction(self._open, {'begin_tstamp': tstamp})
+
+    def close(self, tstamp, calibrations):
+        '''Closes the open batch at tstamp with its number of calibrations. Returns a Deferred'''
+        return self._pool.runInteraction(self._close, {'end_tstamp': tstamp, 'calibrations': calibrations})
+
+    def purge(self):
+        '''Deletes the closed batches without calibrations. Returns a Deferred with the count'''
+        return self._pool.runInteraction(self._purge)
+
+    def latest(self):
+        '''
+        Returns a Deferred with the most recent batch,
+        all of its values being None if there is none
+        '''
+        return self._pool.runReadInteraction(self._latest)
+
+    # ------------
+    # Interactions
+    # ------------
+
+    def _isOpen(self, txn):
+        txn.execute("SELECT COUNT(*) FROM batch_t WHERE end_tstamp IS NULL")
+        return txn.fetchone()[0] > 0
+
+    def _open(self, txn, row):
+        log.debug("Opening batch at {tstamp}", tstamp=row['begin_tstamp'])
+        txn.execute("INSERT INTO batch_t(begin_tstamp) VALUES (:begin_tstamp)", row)
+
+    def _close(self, txn, row):
+        log.debug("Closing batch at {tstamp}", tstamp=row['end_tstamp'])
+        txn.execute("UPDATE batch_t SET end_tstamp = :end_tstamp, calibrations = :calibrations WHERE end_tstamp IS NULL", row)
+
+    def _purge(self, txn):
+        txn.execute("DELETE FROM batch_t WHERE end_tstamp IS NOT NULL AND calibrations = 0")
+        return txn.rowcount
+
+    def _latest(self, txn):
+        txn.execute(f"SELECT {', '.join(BATCH_COLUMNS)} FROM batch_t ORDER BY begin_tstamp DESC LIMIT 1")
+        row = txn.fetchone()
+        return dict(zip(BATCH_COLUMNS, row if row else (None,) * len(BATCH_COLUMNS)))
+
+
+class SummaryTable:
+    '''Read only access to the calibration summaries (summary_t)'''
+
+    def __init__(self, pool, log_level='info'):
+        self._pool = pool
+        setLogLevel(namespace='summary_t', levelStr=log_level)
+
+    def numSessions(self, begin_tstamp, end_tstamp):
+        '''Returns a Deferred with the number of calibrations between both timestamps'''
+        return self._pool.runReadInteraction(self._numSessions, {'begin_tstamp': begin_tstamp, 'end_tstamp': end_tstamp})
+
+    def _numSessions(self, txn, row):
+        txn.execute("SELECT COUNT(*) FROM summary_t WHERE role = 'test' AND session BETWEEN :begin_tstamp AND :end_tstamp", row)
+        return txn.fetchone()[0]
+
+
+__all__ = [
+    "BatchTable",
+    "SummaryTable",
+]
@@ -30,6 +30,14 @@ from tesslabel import SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR
 
 from tesslabel.logger import setLogLevel
 from tesslabel.dbase import tables
+from tesslabel.dbase.rows import ROW_RECORD
+from tesslabel.dbase.allocator import SuffixAllocator, BLOCK_SIZE
+from tesslabel.dbase.sync import ChangesetSync
+from tesslabel.dbase.macindex import MacIndex, BloomMacIndex, normalize_mac
+from tesslabel.dbase.archive import BatchArchiver
+from tesslabel.dbase.batch import BatchTable, SummaryTable
+from tesslabel.dbase.registry import Registry
+from tesslabel.dbase import timing
 
 # ----------------
 # Module constants
@@ -56,6 +64,7 @@ class DataAccesObject():
 
     def __init__(self, parent, pool, *args, **kargs):
         setLogLevel(namespace=NAMESPACE, levelStr='info')
+        setLogLevel(namespace=timing.NAMESPACE, levelStr='warn')
         self.parent = parent
         self.pool = pool
         self.start(*args)
@@ -71,18 +80,135 @@ class DataAccesObject():
         self.config = tables.ConfigTable(
             pool      = self.pool,
             log_level = 'info',
+            initial   = self.parent.getInitialConfig(),
         )
         
         self.tess = tables.Table(
             pool                = self.pool, 
-            table               = 'photometer',
+            table               = 'tess_t',
             id_column           = 'rowid',
             natural_key_columns = ('mac',), 
-            other_columns       = ('prefix','suffix','sensor','zero_point', 'freq_offset', 'interval','telnet_port','ssid','creation_date'),
+            other_columns       = ('prefix','suffix','sensor','zero_point', 'freq_offset', 'interval','telnet_port','broker','password_hash','ssid','creation_date'),
             insert_mode         = tables.INSERT,
+            row_factory         = ROW_RECORD,
             log_level           = 'info',
         )
-        
 
-        
-        
\ No newline at end of file
+        self.batch = BatchTable(
+            pool      = self.pool,
+            log_level = 'info',
+        )
+
+        self.summary = SummaryTable(
+            pool      = self.pool,
+            log_level = 'info',
+        )
+
+        self.sync = ChangesetSync(
+            pool      = self.pool,
+            log_level = 'info',
+        )
+
+        self.archive = BatchArchiver(
+            pool      = self.pool,
+            log_level = 'info',
+        )
+
+        self.registry = Registry(
+            pool      = self.pool,
+            log_level = 'info',
+        )
+
+        self._allocators = dict()
+
+        if self.parent.getInitialConfig('database').get('mac_index') == 'bloom':
+            self.macs = BloomMacIndex(self.pool)
+        else:
+            self.macs = MacIndex(self.pool)
+        self._macs_loaded = True
+        self.macs.load().addErrback(self._onMacIndexFailure)
+
+    @inlineCallbacks
+    def stop(self):
+        log.info('Stopping DAO')
+        for allocator in self._allocators.values():
+            yield allocator.release()
+        for (table, operation), phases in sorted(self.statistics().items()):
+            log.debug("{table}.{op}: {n} calls, wait = {w:.1f} ms, execute = {e:.1f} ms, fetch = {f:.1f} ms",
+                table=table, op=operation, n=phases['execute']['count'],
+                w=phases['wait']['total'], e=phases['execute']['total'], f=phases['fetch']['total'])
+
+    # ---------------
+    # OPERATIONAL API
+    # ---------------
+
+    def allocator(self, model):
+        '''Returns the name suffix allocator for a given photometer model'''
+        if model not in self._allocators:
+            section = self.parent.getInitialConfig(model)
+            self._allocators[model] = SuffixAllocator(
+                pool       = self.pool,
+                config     = self.config,
+                model      = model,
+                block_size = int(section.get('block_size', BLOCK_SIZE)),
+            )
+        return self._allocators[model]
+
+    def statistics(self, reset=False):
+        '''
+        Timing totals per (table, operation) since startup or the last reset.
+        Each entry holds 'wait', 'execute' and 'fetch' phases with count, total, max, p50 and p99 in ms
+        '''
+        result = self.pool.timer.totals()
+        if reset:
+            self.pool.timer.reset()
+        return result
+
+    def lookupMac(self, mac):
+        '''Returns a Deferred with (prefix, suffix) if the MAC is already registered, None otherwise'''
+        if not self._macs_loaded:
+            return self.macs.query(mac)
+        return self.macs.lookup(mac)
+
+    @inlineCallbacks
+    def register(self, row, model=None):
+        '''
+        Saves a photometer into tess_t, with its MAC normalized, keeping the MAC index up to date.
+        A row without suffix is named by the suffix allocator of the given model.
+        Returns a Deferred with the (prefix, suffix) name
+        '''
+        row = dict(row, mac=normalize_mac(row['mac']))
+        if row.get('suffix') is None:
+            if model is None:
+                raise ValueError(f"No name nor model given to register {row['mac']}")
+            row['prefix'], row['suffix'] = yield self.allocator(model).allocate()
+        yield self.tess.save(row)
+        self.macs.add(row['mac'], row['prefix'], row['suffix'])
+        return row['prefix'], row['suffix']
+
+    @inlineCallbacks
+    def unregister(self, mac):
+        '''Deletes a photometer from tess_t keeping the MAC index up to date'''
+        yield self.tess.delete({'mac': normalize_mac(mac)})
+        self.macs.remove(mac)
+
+    def exportChangeset(self, remote_uuid, path, full=False):
+        '''Export changes not yet sent to the remote database. Returns a Deferred'''
+        return self.sync.exportChangeset(self.uuid, remote_uuid, path, full)
+
+    @inlineCallbacks
+    def importChangeset(self, path):
+        '''Apply a changeset exported by another database. Returns a Deferred'''
+        count = yield self.sync.importChangeset(self.uuid, path)
+        if count:
+            yield self.macs.load()
+            self._macs_loaded = True
+        return count
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _onMacIndexFailure(self, failure):
+        log.failure("MAC index not loaded, MACs are looked up in the database instead: {f}", failure=failure, f=failure.getErrorMessage())
+        self._macs_loaded = False
@@ -0,0 +1,243 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import re
+import math
+import hashlib
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.internet import defer
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.dbase import log
+from tesslabel.photometer.protocol.photinfo import format_mac
+
+# ----------------
+# Module constants
+# ----------------
+
+# Target false positive rate for the Bloom filter variant
+BLOOM_ERROR_RATE = 0.01
+
+# Minimun Bloom filter capacity, in MACs
+BLOOM_MIN_CAPACITY = 1024
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def normalize_mac(mac):
+    '''Normalizes MACs such as 'a:b:c:d:e:f', 'AA-BB-CC-DD-EE-FF' or 'aabbccddeeff' to 'AA:BB:CC:DD:EE:FF' '''
+    groups = re.split(r'[:\-]', mac.strip())
+    if len(groups) > 1:
+        mac = ''.join(group.zfill(2) for group in groups)
+    return format_mac(mac.upper())
+
+# --------------
+# Module Classes
+# --------------
+
+class BloomFilter:
+    '''Compact, probabilistic set. No false negatives, false positives at about error_rate'''
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self._m = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._k = max(1, round(self._m / capacity * math.log(2)))
+        self._bits = bytearray((self._m + 7) // 8)
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher double hashing from a single digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self._m for i in range(self._k))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._bits.__sizeof__()
+
+
+
+class MacIndex:
+    '''
+    In-memory index of registered MACs in tess_t: normalized MAC -> (prefix, suffix).
+    Loaded once at startup and updated incrementally on every registration,
+    so that discovered devices can be checked with no database queries.
+    Lookups made while loading wait for the load and fail if it fails.
+    Registrations made while loading are replayed over the loaded rows.
+    '''
+
+    SQL = "SELECT mac, prefix, suffix FROM tess_t WHERE mac IS NOT NULL"
+
+    # MACs are stored normalized, see DataAccesObject.register()
+    SQL_LOOKUP = "SELECT prefix, suffix FROM tess_t WHERE mac = :mac"
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._index = dict()
+        self._ready = None
+        self._loads = 0
+        self._waiting = list()  # (Deferred, mac) lookups waiting for the load
+        self._pending = list()  # (method, args) changes made while loading
+
+    def load(self):
+        '''(Re)loads the index from the database. Returns a Deferred'''
+        self._loads += 1
+        self._ready = self._pool.runReadInteraction(self._readAll)
+        self._ready.addCallbacks(self._install, self._failed, callbackArgs=(self._loads,), errbackArgs=(self._loads,))
+        return self._ready
+
+    def lookup(self, mac):
+        '''Returns a Deferred with (prefix, suffix) for a registered MAC or None'''
+        if self._ready is None:
+            self.load()
+        if self._ready.called:
+            return defer.succeed(self._get(normalize_mac(mac)))
+        d = defer.Deferred()
+        self._waiting.append((d, mac))
+        return d
+
+    def query(self, mac):
+        '''Same as lookup() but always querying the database. Returns a Deferred'''
+        return self._pool.runReadInteraction(self._confirm, normalize_mac(mac))
+
+    def add(self, mac, prefix, suffix):
+        self._record(self.add, mac, prefix, suffix)
+        self._index[normalize_mac(mac)] = (prefix, suffix)
+
+    def remove(self, mac):
+        self._record(self.remove, mac)
+        self._index.pop(normalize_mac(mac), None)
+
+    def __len__(self):
+        return len(self._index)
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _record(self, method, *args):
+        if self._ready is not None and not self._ready.called:
+            self._pending.append((method, args))
+
+    def _chain(self, d, mac):
+        d.callback(self._get(normalize_mac(mac)))
+
+    def _readAll(self, txn):
+        txn.execute(self.SQL)
+        return txn.fetchall()
+
+    def _install(self, rows, load):
+        if load != self._loads:
+            return None     # superseded by a newer load
+        self._build(rows)
+        pending, self._pending = self._pending, list()
+        for method, args in pending:
+            method(*args)
+        log.info("Loaded {n} MACs into {who}", n=len(rows), who=self.__class__.__name__)
+        waiting, self._waiting = self._waiting, list()
+        for d, mac in waiting:
+            self._chain(d, mac)
+        return None
+
+    def _failed(self, failure, load):
+        if load != self._loads:
+            return None     # superseded by a newer load
+        # The next lookup loads again
+        self._ready = None
+        self._pending = list()
+        waiting, self._waiting = self._waiting, list()
+        for d, mac in waiting:
+            d.errback(failure)
+        return failure
+
+    def _build(self, rows):
+        self._index = {normalize_mac(mac): (prefix, suffix) for mac, prefix, suffix in rows}
+
+    def _get(self, mac):
+        return self._index.get(mac)
+
+    def _confirm(self, txn, mac):
+        txn.execute(self.SQL_LOOKUP, {'mac': mac})
+        result = txn.fetchone()
+        return tuple(result) if result else None
+
+
+
+class BloomMacIndex(MacIndex):
+    '''
+    Bloom filter variant for very large catalogues.
+    Only MACs passing the filter (registered ones plus about BLOOM_ERROR_RATE of the rest)
+    are confirmed against the database.
+    '''
+
+    def __init__(self, pool):
+        super().__init__(pool)
+        self._index = BloomFilter(BLOOM_MIN_CAPACITY)
+        self._count = 0
+
+    def add(self, mac, prefix, suffix):
+        self._record(self.add, mac, prefix, suffix)
+        self._index.add(normalize_mac(mac))
+        self._count += 1
+        if self._count > self._index.capacity and (self._ready is None or self._ready.called):
+            self.load() # Rebuild with a larger capacity, meanwhile false positives rise
+
+    def remove(self, mac):
+        pass    # Bloom filters cannot remove keys. This just becomes a false positive
+
+    def __len__(self):
+        return self._count
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _chain(self, d, mac):
+        self._get(normalize_mac(mac)).chainDeferred(d)
+
+    def lookup(self, mac):
+        if self._ready is not None and self._ready.called:
+            return self._get(normalize_mac(mac))
+        return super().lookup(mac)
+
+    def _build(self, rows):
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * len(rows)))
+        for mac, prefix, suffix in rows:
+            bloom.add(normalize_mac(mac))
+        self._index = bloom
+        self._count = len(rows)
+
+    def _get(self, mac):
+        if mac not in self._index:
+            return defer.succeed(None)
+        return self._pool.runReadInteraction(self._confirm, mac)
+
+
+__all__ = [
+    "normalize_mac",
+    "BloomFilter",
+    "MacIndex",
+    "BloomMacIndex",
+]
@@ -0,0 +1,221 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import time
+import sqlite3
+import datetime
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+from twisted.internet import task
+from twisted.application.service import Service
+from twisted.internet.defer import inlineCallbacks
+
+# -------------------
+# Third party imports
+# -------------------
+
+from pubsub import pub
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+from tesslabel.dbase.service import DatabaseService
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'maint'
+
+SECTION = 'maintenance'
+
+# Defaults, overriden by the 'maintenance' section in config_t
+PERIOD        = 600      # seconds between idle checks
+BUDGET        = 2.0      # seconds the writer connection may be used per run
+ANALYZE_EVERY = 86400    # seconds between full ANALYZE runs
+
+# Pages freed per incremental vacuum step
+VACUUM_STEP = 256
+
+# Rows sampled per index by ANALYZE
+ANALYSIS_LIMIT = 1000
+
+# SQLite VM instructions between progress handler calls
+PROGRESS_STEPS = 10000
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+# --------------
+# Module Classes
+# --------------
+
+class MaintenanceService(Service):
+    '''
+    Periodically runs PRAGMA optimize / ANALYZE, incremental vacuum and a WAL
+    checkpoint on the writer connection, but only when the application is idle:
+    no calibration or export in progress and no pending writes.
+    Every run is bounded by a time budget and its outcome recorded in config_t.
+    Calibrations are tracked through their own events, other long running
+    activities send 'maintenance_hold' and 'maintenance_release' with a reason.
+    '''
+
+    NAME = 'Maintenance Service'
+
+    def __init__(self, *args, **kargs):
+        super().__init__(*args, **kargs)
+        self._holds = set()
+        self._task = task.LoopingCall(self.maintain)
+        setLogLevel(namespace=NAMESPACE, levelStr='info')
+
+    # -----------
+    # Service API
+    # -----------
+
+    def startService(self):
+        log.info('Starting {name}', name=self.name)
+        self.dbaseService = self.parent.getServiceNamed(DatabaseService.NAME)
+        config = self.dbaseService.getInitialConfig(SECTION)
+        self.period        = int(config.get('period', PERIOD))
+        self.budget        = float(config.get('budget', BUDGET))
+        self.analyze_every = int(config.get('analyze_every', ANALYZE_EVERY))
+        last_analyze = config.get('last_analyze')
+        self._last_analyze = datetime.datetime.fromisoformat(last_analyze) if last_analyze else None
+        pub.subscribe(self.onCalibrationStart, 'start_calibration_req')
+        pub.subscribe(self.onCalibrationStop, 'stop_calibration_req')
+        pub.subscribe(self.onCalibrationEnd, 'calib_end')
+        pub.subscribe(self.onHold, 'maintenance_hold')
+        pub.subscribe(self.onRelease, 'maintenance_release')
+        super().startService()
+        self._task.start(self.period, now=False)
+
+    def stopService(self):
+        log.info('Stopping {name}', name=self.name)
+        if self._task.running:
+            self._task.stop()
+        return super().stopService()
+
+    # --------------
+    # Event handlers
+    # --------------
+
+    def onCalibrationStart(self):
+        self.onHold('calibration')
+
+    def onCalibrationStop(self):
+        self.onRelease('calibration')
+
+    def onCalibrationEnd(self, session):
+        self.onRelease('calibration')
+
+    def onHold(self, reason):
+        log.debug("Maintenance on hold by {reason}", reason=reason)
+        self._holds.add(reason)
+
+    def onRelease(self, reason):
+        log.debug("Maintenance released by {reason}", reason=reason)
+        self._holds.discard(reason)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def maintain(self):
+        '''Runs the maintenance operations if idle. Returns a Deferred'''
+        pool = self.dbaseService.pool
+        if self._holds or pool is None or pool.writer.pending():
+            log.debug("Maintenance deferred, busy with {holds}", holds=sorted(self._holds))
+            return
+        now = _utcnow()
+        analyze = self._last_analyze is None or (now - self._last_analyze).total_seconds() >= self.analyze_every
+        try:
+            results = yield pool.runOperation(self._maintain, self.budget, analyze)
+        except Exception as e:
+            log.failure('{e}', e=e)
+            return
+        summary = " ".join(f"{key}={value}" for key, value in results.items())
+        log.info("Database maintenance: {summary}", summary=summary)
+        record = {'last_run': now.isoformat(), 'last_result': summary}
+        if results.get('analyze', 'over-budget') != 'over-budget':
+            self._last_analyze = now
+            record['last_analyze'] = now.isoformat()
+        yield self.dbaseService.dao.config.saveSection(SECTION, record)
+
+    # ----------------------
+    # Write thread operation
+    # ----------------------
+
+    def _maintain(self, connection, budget, analyze):
+        # Runs in the writer thread, outside any transaction.
+        # A progress handler aborts any statement overrunning the time budget
+        deadline = time.monotonic() + budget
+        connection.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_STEPS)
+        results = dict()
+        try:
+            connection.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}").fetchall()
+            self._timed(results, 'analyze' if analyze else 'optimize', connection,
+                "ANALYZE" if analyze else "PRAGMA optimize")
+            mode = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode == 2:   # INCREMENTAL
+                pages = 0
+                while time.monotonic() < deadline:
+                    free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+                    if not free:
+                        break
+                    step = min(free, VACUUM_STEP)
+                    try:
+                        # executescript() steps the pragma to completion, execute() frees a single page
+                        connection.executescript(f"PRAGMA incremental_vacuum({step});")
+                    except sqlite3.OperationalError as e:
+                        if 'interrupted' not in str(e):
+                            raise
+                        break
+                    pages += step
+                results['vacuum'] = f"{pages}pages"
+            journal = connection.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal == 'wal' and time.monotonic() < deadline:
+                self._timed(results, 'checkpoint', connection, "PRAGMA wal_checkpoint(PASSIVE)")
+        finally:
+            connection.set_progress_handler(None, PROGRESS_STEPS)
+        return results
+
+    def _timed(self, results, name, connection, sql):
+        t0 = time.monotonic()
+        try:
+            connection.execute(sql).fetchall()
+        except sqlite3.OperationalError as e:
+            if 'interrupted' not in str(e):
+                raise
+            results[name] = 'over-budget'
+        else:
+            results[name] = f"{1000*(time.monotonic()-t0):.0f}ms"
+
+
+__all__ = [
+    "MaintenanceService",
+]
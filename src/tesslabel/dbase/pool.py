@@ -0,0 +1,239 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import time
+import queue
+import pathlib
+import sqlite3
+import functools
+import threading
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.enterprise import adbapi
+from twisted.internet import reactor, defer
+from twisted.python.failure import Failure
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.dbase.utils import apply_pragmas
+from tesslabel.dbase.stream import RowStream, CHUNK_SIZE
+from tesslabel.dbase.timing import StatementTimer, SLOW_QUERY_MS
+
+# ----------------
+# Module constants
+# ----------------
+
+# Maximun number of queued write interactions committed in a single transaction
+WRITER_BATCH_SIZE = 64
+
+# Number of read only connections
+READER_POOL_SIZE = 3
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _deliver(d, result):
+    if isinstance(result, Failure):
+        d.errback(result)
+    else:
+        d.callback(result)
+
+# --------------
+# Module Classes
+# --------------
+
+class WriterThread:
+    '''
+    Owns the only read/write connection to the database in a dedicated thread.
+    Write interactions are executed strictly in submission order.
+    Interactions queued together are committed in a single transaction,
+    each one isolated by a savepoint so that a failing interaction does not
+    roll back the others.
+    '''
+
+    def __init__(self, path, pragmas=None, batch_size=WRITER_BATCH_SIZE, timer=None):
+        self._path = path
+        self._pragmas = pragmas
+        self._batch_size = batch_size
+        self._timer = timer
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='dbase-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''Executes all pending interactions and closes the connection'''
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def runInteraction(self, interaction, *args, **kw):
+        '''
+        Run interaction(cursor, *args, **kw) in the writer thread.
+        Returns a Deferred that fires after the enclosing transaction is committed.
+        '''
+        if self._thread is None:
+            return defer.fail(RuntimeError("Database writer thread is not running"))
+        d = defer.Deferred()
+        if self._timer is not None:
+            interaction = self._timer.timed(interaction, time.perf_counter())
+        self._queue.put((interaction, args, kw, d, True))
+        return d
+
+    def pending(self):
+        '''Approximate number of queued interactions and operations'''
+        return self._queue.qsize()
+
+    def runOperation(self, operation, *args, **kw):
+        '''
+        Run operation(connection, *args, **kw) in the writer thread, outside any transaction,
+        after the interactions already queued. Meant for statements that cannot run
+        inside a transaction (ATTACH, VACUUM, ...). The operation handles its own transactions.
+        Returns a Deferred.
+        '''
+        if self._thread is None:
+            return defer.fail(RuntimeError("Database writer thread is not running"))
+        d = defer.Deferred()
+        self._queue.put((operation, args, kw, d, False))
+        return d
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _run(self):
+        # isolation_level = None so that we fully control the transactions
+        connection = sqlite3.connect(self._path, isolation_level=None, check_same_thread=False)
+        if self._pragmas:
+            apply_pragmas(connection, self._pragmas)
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = list()
+            while job is not None:
+                if not job[4]:
+                    # Non transactional operations run alone, after the batch so far
+                    self._execute(connection, batch)
+                    batch = list()
+                    self._operate(connection, job)
+                else:
+                    batch.append(job)
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+            self._execute(connection, batch)
+        connection.close()
+
+    def _operate(self, connection, job):
+        operation, args, kw, d, _ = job
+        try:
+            result = operation(connection, *args, **kw)
+        except Exception:
+            result = Failure()
+        if connection.in_transaction:
+            connection.rollback()
+        reactor.callFromThread(_deliver, d, result)
+
+    def _execute(self, connection, batch):
+        if not batch:
+            return
+        cursor = connection.cursor()
+        results = list()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for interaction, args, kw, d, _ in batch:
+                cursor.execute("SAVEPOINT interaction")
+                try:
+                    result = interaction(cursor, *args, **kw)
+                except Exception:
+                    result = Failure()
+                    cursor.execute("ROLLBACK TO interaction")
+                cursor.execute("RELEASE interaction")
+                results.append((d, result))
+            cursor.execute("COMMIT")
+        except Exception:
+            failure = Failure()
+            if connection.in_transaction:
+                connection.rollback()
+            results = [(job[3], failure) for job in batch]
+        finally:
+            cursor.close()
+        for d, result in results:
+            reactor.callFromThread(_deliver, d, result)
+
+
+
+class DatabasePool:
+    '''
+    Single writer thread plus a pool of read only connections.
+    Tables use runInteraction() for writes and runReadInteraction() for queries,
+    so that long running queries never delay the write queue.
+    '''
+
+    def __init__(self, path, pragmas=None, readers=READER_POOL_SIZE, batch_size=WRITER_BATCH_SIZE, slow_ms=SLOW_QUERY_MS):
+        self.path = path
+        self.pragmas = pragmas
+        self.timer = StatementTimer(slow_ms)
+        self.writer = WriterThread(path, pragmas, batch_size, self.timer)
+        self.writer.start()
+        self.uri = uri = pathlib.Path(path).resolve().as_uri() + '?mode=ro'
+        kargs = dict(uri=True, check_same_thread=False, cp_min=1, cp_max=readers)
+        if pragmas:
+            kargs['cp_openfun'] = functools.partial(apply_pragmas, pragmas=pragmas, read_only=True)
+        self.readers = adbapi.ConnectionPool("sqlite3", uri, **kargs)
+
+    def runInteraction(self, interaction, *args, **kw):
+        '''Write interaction, executed in order by the writer thread. Returns a Deferred'''
+        return self.writer.runInteraction(interaction, *args, **kw)
+
+    def runOperation(self, operation, *args, **kw):
+        '''Non transactional operation on the writer connection. Returns a Deferred'''
+        return self.writer.runOperation(operation, *args, **kw)
+
+    def runReadInteraction(self, interaction, *args, **kw):
+        '''Read only interaction, executed in the reader pool. Returns a Deferred'''
+        interaction = self.timer.timed(interaction, time.perf_counter())
+        return self.readers.runInteraction(interaction, *args, **kw)
+
+    def stream(self, sql, params=None, chunk_size=CHUNK_SIZE, transform=None):
+        '''Read only query whose rows are fetched in chunks on demand. Returns a RowStream'''
+        return RowStream(self.uri, sql, params, chunk_size, self.pragmas, transform)
+
+    def close(self):
+        self.writer.stop()
+        self.readers.close()
+
+
+__all__ = [
+    "WriterThread",
+    "DatabasePool",
+]
@@ -0,0 +1,213 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import re
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'registry'
+
+# Browsing orders and filters. Each one is served by an index:
+# UNIQUE(prefix, suffix), PRIMARY KEY(mac) and tess_creation_i
+KIND_NAME = 'name'
+KIND_MAC  = 'mac'
+KIND_DATE = 'date'
+
+KEYS = {
+    KIND_NAME: ('prefix', 'suffix'),
+    KIND_MAC : ('mac',),
+    KIND_DATE: ('creation_date', 'mac'),
+}
+
+KINDS = tuple(KEYS)
+
+COLUMNS = ('prefix', 'suffix', 'mac', 'sensor', 'zero_point', 'freq_offset', 'creation_date')
+
+# Rows per page and rows between two consecutive directory keys
+PAGE_SIZE      = 50
+DIRECTORY_STEP = 64
+
+# Longest name suffix searched by a name filter
+MAX_SUFFIX_DIGITS = 9
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _prefix_range(text):
+    '''[low, high) range of the strings starting with text'''
+    return text, text[:-1] + chr(ord(text[-1]) + 1)
+
+
+def _suffix_ranges(digits):
+    '''[low, high] ranges of the integers whose decimal representation starts with digits'''
+    if len(digits) > 1 and digits.startswith('0'):
+        return []
+    first = int(digits)
+    ranges = [(first, first)]
+    for n in range(1, MAX_SUFFIX_DIGITS - len(digits) + 1):
+        low = first * 10**n
+        if low == 0:
+            break
+        ranges.append((low, low + 10**n - 1))
+    return ranges
+
+
+def normalize_mac(text):
+    '''Partial MAC in the XX:YY:ZZ:TT:UU:VV format, whatever the separators typed'''
+    text = re.sub(r'[^0-9A-Fa-f]', '', text).upper()
+    return ':'.join(text[i:i+2] for i in range(0, len(text), 2))
+
+
+def segments(kind, text):
+    '''
+    Rows matching the text typed, as a list of ordered, disjoint key ranges.
+    Each range is a (low, high) pair of key prefixes, low inclusive and high
+    exclusive, None meaning unbounded. Every range is an index range scan.
+    '''
+    text = text.strip()
+    if kind not in KEYS:
+        raise ValueError(f"Unknown registry filter: {kind}, choose from {', '.join(KINDS)}")
+    if not text:
+        return [(None, None)]
+    if kind == KIND_NAME:
+        prefix, digits = re.match(r'^(.*?)(\d*)$', text).groups()
+        if not digits:
+            low, high = _prefix_range(prefix)
+            return [((low,), (high,))]
+        return [((prefix, low), (prefix, high + 1)) for low, high in _suffix_ranges(digits)]
+    if kind == KIND_MAC:
+        text = normalize_mac(text)
+        if not text:
+            return []
+    low, high = _prefix_range(text)
+    return [((low,), (high,))]
+
+
+def key(kind, row):
+    '''Keyset pagination key of a row as returned by page()'''
+    return tuple(row[COLUMNS.index(column)] for column in KEYS[kind])
+
+# --------------
+# Module Classes
+# --------------
+
+class Registry:
+    '''
+    Paged, filtered access to the registered photometers (tess_t) for browsing.
+    Pages are read with keyset pagination, i.e. the rows following the key of a
+    given row in the browsing order, so that reading a page costs the same
+    whatever its position. scan() returns the number of matching rows and a
+    directory with the key of every DIRECTORY_STEP-th row, so that seek() can
+    reach any position by reading less than DIRECTORY_STEP extra rows.
+    Rows with NULL key columns are not listed.
+    '''
+
+    def __init__(self, pool, log_level='info'):
+        self._pool = pool
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    def scan(self, kind, text, step=DIRECTORY_STEP):
+        '''Returns a Deferred with (row count, directory) for the filter'''
+        return self._pool.runReadInteraction(self._scan, kind, text, step)
+
+    def page(self, kind, text, after=None, limit=PAGE_SIZE):
+        '''Returns a Deferred with up to limit rows (see COLUMNS) following the after key'''
+        return self._pool.runReadInteraction(self._page, kind, text, after, False, 0, limit)
+
+    def seek(self, kind, text, directory, offset, limit=PAGE_SIZE, step=DIRECTORY_STEP):
+        '''Returns a Deferred with up to limit rows starting at offset, using a directory from scan()'''
+        if not directory:
+            return self.page(kind, text, None, limit)
+        anchor = directory[min(offset // step, len(directory) - 1)]
+        skip = offset - step * min(offset // step, len(directory) - 1)
+        return self._pool.runReadInteraction(self._page, kind, text, anchor, True, skip, limit)
+
+    # -----------------
+    # Read interactions
+    # -----------------
+
+    def _select(self, txn, kind, low, high, columns, anchor=None, inclusive=True, limit=None):
+        '''Executes a SELECT of one key range, starting at the anchor key if given'''
+        keys = KEYS[kind]
+        operator = '>='
+        if anchor is not None and (low is None or anchor >= low):
+            low, operator = anchor, '>=' if inclusive else '>'
+        conditions = [f"{column} IS NOT NULL" for column in keys]
+        params = dict()
+        for name, bound, op in (('low', low, operator), ('high', high, '<')):
+            if bound is None:
+                continue
+            placeholders = ', '.join(f':{name}{i}' for i in range(len(bound)))
+            conditions.append(f"({', '.join(keys[:len(bound)])}) {op} ({placeholders})")
+            params.update({f'{name}{i}': value for i, value in enumerate(bound)})
+        sql = f"SELECT {', '.join(columns)} FROM tess_t WHERE {' AND '.join(conditions)} ORDER BY {', '.join(keys)}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        txn.execute(sql, params)
+
+    def _scan(self, txn, kind, text, step):
+        directory = list()
+        count = 0
+        for low, high in segments(kind, text):
+            self._select(txn, kind, low, high, KEYS[kind])
+            for row in txn:
+                if count % step == 0:
+                    directory.append(tuple(row))
+                count += 1
+        log.debug("Registry scan by {kind} '{text}': {count} rows", kind=kind, text=text, count=count)
+        return count, directory
+
+    def _page(self, txn, kind, text, anchor, inclusive, skip, limit):
+        rows = list()
+        for low, high in segments(kind, text):
+            if anchor is not None and high is not None and anchor >= high:
+                continue
+            self._select(txn, kind, low, high, COLUMNS, anchor, inclusive, skip + limit - len(rows))
+            rows.extend(txn.fetchall())
+            if len(rows) >= skip + limit:
+                break
+        return rows[skip:skip+limit]
+
+
+__all__ = [
+    "KINDS",
+    "COLUMNS",
+    "PAGE_SIZE",
+    "Registry",
+    "normalize_mac",
+    "segments",
+    "key",
+]
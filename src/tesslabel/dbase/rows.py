@@ -0,0 +1,98 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import collections
+
+# ----------------
+# Module constants
+# ----------------
+
+# Row representations returned by Table read methods
+ROW_TUPLE      = 'tuple'       # plain tuples as returned by sqlite3, no per row overhead
+ROW_RECORD     = 'record'      # instances of a generated class with __slots__, attribute access
+ROW_NAMEDTUPLE = 'namedtuple'  # namedtuple built once from the column list
+ROW_DICT       = 'dict'        # legacy dictionaries, column name -> value
+
+ROW_FACTORIES = (ROW_TUPLE, ROW_RECORD, ROW_NAMEDTUPLE, ROW_DICT)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _asdict(self):
+    return {column: getattr(self, column) for column in self.__slots__}
+
+def _astuple(self):
+    return tuple(getattr(self, column) for column in self.__slots__)
+
+def _repr(self):
+    values = ", ".join(f"{column}={getattr(self, column)!r}" for column in self.__slots__)
+    return f"{self.__class__.__name__}({values})"
+
+def _eq(self, other):
+    if type(other) is not type(self):
+        return NotImplemented
+    return _astuple(self) == _astuple(other)
+
+
+def record_class(name, columns):
+    '''
+    Generates a class with __slots__ for the given columns.
+    Instances are built positionally, in column order, and offer
+    _asdict() and _astuple() for callers needing other representations.
+    '''
+    columns = tuple(columns)
+    arguments = ", ".join(columns)
+    body = "\n".join(f"    self.{column} = {column}" for column in columns) or "    pass"
+    namespace = dict()
+    # Same technique as collections.namedtuple: a compiled __init__ is much faster than setattr() loops
+    exec(f"def __init__(self, {arguments}):\n{body}\n", namespace)
+    return type(name, (), {
+        '__slots__': columns,
+        '__init__' : namespace['__init__'],
+        '__repr__' : _repr,
+        '__eq__'   : _eq,
+        '__hash__' : None,
+        '_fields'  : columns,
+        '_asdict'  : _asdict,
+        '_astuple' : _astuple,
+    })
+
+
+def make_row_factory(kind, columns, name='Row'):
+    '''
+    Returns a function converting a list of result tuples
+    into a list of rows of the given kind.
+    The namedtuple or record class is built only once, here.
+    '''
+    columns = tuple(columns)
+    if kind == ROW_TUPLE:
+        return list
+    if kind == ROW_DICT:
+        return lambda rows: [dict(zip(columns, row)) for row in rows]
+    if kind == ROW_NAMEDTUPLE:
+        make = collections.namedtuple(name, columns)._make
+        return lambda rows: list(map(make, rows))
+    if kind == ROW_RECORD:
+        cls = record_class(name, columns)
+        return lambda rows: [cls(*row) for row in rows]
+    raise ValueError(f"Unknown row factory {kind}, should be one of {ROW_FACTORIES}")
+
+
+__all__ = [
+    "ROW_TUPLE",
+    "ROW_RECORD",
+    "ROW_NAMEDTUPLE",
+    "ROW_DICT",
+    "ROW_FACTORIES",
+    "record_class",
+    "make_row_factory",
+]
@@ -22,7 +22,6 @@ import sqlite3
 
 from twisted.application.service import Service
 from twisted.logger import Logger
-from twisted.enterprise import adbapi
 
 
 from twisted.internet import reactor, task, defer
@@ -42,16 +41,16 @@ from pubsub import pub
 from tesslabel import SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR, TSTAMP_FORMAT, TSTAMP_SESSION_FMT
 from tesslabel.logger import setLogLevel
 from tesslabel.dbase import NAMESPACE, log 
-from tesslabel.dbase.utils import create_database, create_schema
+from tesslabel.dbase.utils import create_database, create_schema, read_configuration, check_migrations
+from tesslabel.dbase.utils import make_pragmas, apply_pragmas
 from tesslabel.dbase.dao import DataAccesObject
+from tesslabel.dbase.pool import DatabasePool
+from tesslabel.dbase.timing import SLOW_QUERY_MS
 
 # ----------------
 # Module constants
 # ----------------
 
-SQL_TEST_STRING = "SELECT COUNT(*) FROM config_t"
-
-
 # ------------------------
 # Module Utility Functions
 # ------------------------
@@ -63,26 +62,18 @@ def timestamp_adapter(tstamp):
 
 sqlite3.register_adapter(datetime.datetime, timestamp_adapter)
 
-def getPool(*args, **kargs):
-    '''Get connetion pool for sqlite3 driver (Twisted only)'''
-    kargs['check_same_thread'] = False
-    return adbapi.ConnectionPool("sqlite3", *args, **kargs)
+def getPool(path, pragmas=None, **kargs):
+    '''Get a single writer, multiple readers connection pool for sqlite3 driver (Twisted only)'''
+    return DatabasePool(path, pragmas=pragmas, **kargs)
 
 
-def read_database_version(connection):
-    cursor = connection.cursor()
-    query = 'SELECT value FROM config_t WHERE section = "database" AND property = "version";'
-    cursor.execute(query)
-    version = cursor.fetchone()[0]
-    return version
-
 def write_database_uuid(connection):
     guid = str(uuid.uuid4())
     cursor = connection.cursor()
     param = {'section': 'database','property':'uuid','value': guid}
     cursor.execute(
         '''
-        INSERT INTO config_t(section,property,value) 
+        INSERT OR REPLACE INTO config_t(section,property,value) 
         VALUES(:section,:property,:value)
         ''',
         param
@@ -90,28 +81,18 @@ def write_database_uuid(connection):
     connection.commit()
     return guid
 
-def make_database_uuid(connection):
-    cursor = connection.cursor()
-    query = 'SELECT value FROM config_t WHERE section = "database" AND property = "uuid";'
-    cursor.execute(query)
-    guid = cursor.fetchone()
+def make_database_uuid(connection, configuration):
+    guid = configuration['database'].get('uuid')
     if guid:
         try:
-            uuid.UUID(guid[0])  # Validate UUID
+            uuid.UUID(guid)  # Validate UUID
         except ValueError:
             guid = write_database_uuid(connection)
-        else:
-            guid = guid[0]
     else:
         guid = write_database_uuid(connection)
+    configuration['database']['uuid'] = guid
     return guid
 
-
-def read_configuration(connection):
-     cursor = connection.cursor()
-     cursor.execute("SELECT section, property, value FROM config_t ORDER BY section")
-     return cursor.fetchall()
-
 # --------------
 # Module Classes
 # --------------
@@ -126,6 +107,8 @@ class DatabaseService(Service):
         self.path = path
         self.getPoolFunc = getPool
         self.create_only = create_only
+        self.pragmas = None
+        self.pool = None
 
     #------------
     # Service API
@@ -138,16 +121,26 @@ class DatabaseService(Service):
         connection, new_database = create_database(self.path)
         if new_database:
             log.warn("Created new database file at {f}",f=self.path)
-        just_created, file_list = create_schema(connection, SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR, SQL_TEST_STRING)
+        # Single query fast path when the data model is current
+        configuration = read_configuration(connection)
+        just_created, file_list = create_schema(connection, SQL_SCHEMA, SQL_INITIAL_DATA_DIR, SQL_UPDATES_DATA_DIR, configuration)
         if just_created:
             for sql_file in file_list:
                 log.warn("Populating data model from {f}", f=os.path.basename(sql_file))
         else:
             for sql_file in file_list:
                 log.warn("Applying updates to data model from {f}", f=os.path.basename(sql_file))
+        if just_created or file_list:
+            configuration = read_configuration(connection)
+        # Update files are only read on the first start after an upgrade
+        for name in check_migrations(connection, SQL_UPDATES_DATA_DIR, configuration):
+            log.warn("Update {f} has changed since it was applied", f=name)
+        self.pragmas = make_pragmas(configuration['database'])
+        apply_pragmas(connection, self.pragmas)
+        log.info("Database pragmas: {pragmas}", pragmas=self.pragmas)
         #levels  = read_debug_levels(connection)
-        version = read_database_version(connection)
-        guid    = make_database_uuid(connection)
+        version = configuration['database']['version']
+        guid    = make_database_uuid(connection, configuration)
         log.warn("Starting {service} on {database}, version = {version}, UUID = {uuid}", 
             database = self.path, 
             version  = version,
@@ -157,8 +150,7 @@ class DatabaseService(Service):
     
         # Remainder Service initialization
         super().startService() # se we can handle the 'running' attribute
-        self._initial_config = read_configuration(connection)
-        connection.commit()
+        self._initial_config = configuration
         connection.close()
         if self.create_only:
             self.quit(exit_code=0)
@@ -172,6 +164,8 @@ class DatabaseService(Service):
     @inlineCallbacks
     def stopService(self):
         log.info("Stopping {name}", name=self.name)
+        if self.pool:
+            yield self.dao.stop()   # Release unused reservations while the pool is still open
         self.closePool()
         try:
             reactor.stop()
@@ -187,10 +181,11 @@ class DatabaseService(Service):
     def setTestMode(self, test_mode):
         self.test_mode   = test_mode
     
-    def getInitialConfig(self, section):
+    def getInitialConfig(self, section=None):
         '''For service startup, avoiding async code'''
-        g = filter(lambda i: True if i[0] == section else False, self._initial_config)
-        return dict(map(lambda i: (i[1], i[2]) ,g))
+        if section is None:
+            return {section: dict(properties) for section, properties in self._initial_config.items()}
+        return dict(self._initial_config.get(section, {}))
 
     # --------------
     # Event handlers
@@ -216,9 +211,10 @@ class DatabaseService(Service):
     # ==============
 
     def openPool(self):
-        # setup the connection pool for asynchronouws adbapi
+        # setup the writer thread and the read only connection pool
         log.debug("Opening a DB Connection to {conn!s}", conn=self.path)
-        self.pool  = self.getPoolFunc(self.path)
+        slow_ms = float(self._initial_config['database'].get('slow_query_ms', SLOW_QUERY_MS))
+        self.pool  = self.getPoolFunc(self.path, pragmas=self.pragmas, slow_ms=slow_ms)
         log.debug("Opened a DB Connection to {conn!s}", conn=self.path)
 
 
@@ -8,7 +8,34 @@ BEGIN TRANSACTION;
 -----------------
 
 INSERT INTO config_t(section, property, value) 
-VALUES ('database', 'version', '01');
+VALUES ('database', 'version', '11');
+
+-- SQLite performance profile: 'safe', 'balanced' or 'fast' (see dbase/utils.py)
+-- Individual pragmas may be overriden by adding rows such as ('database', 'synchronous', 'FULL')
+-- Statements slower than ('database', 'slow_query_ms', <ms>) are logged in the 'slowq' namespace (200 ms by default)
+-- Very large catalogues may switch the in-memory MAC index with ('database', 'mac_index', 'bloom')
+-- ('database', 'updates_digest') is maintained by the application: SQL update files are checked
+-- against their applied checksums only on the first start with a different set of packaged files
+INSERT INTO config_t(section, property, value) 
+VALUES ('database', 'profile', 'balanced');
+
+-- Batch exports encode up to ('export', 'parallelism', <N>) session groups concurrently
+-- (by default the number of CPUs, up to 4)
+-- Their entries are compressed with ('export', 'compression', 'stored'|'deflate'|'bzip2'|'lzma')
+-- 'deflate' by default, at level ('export', 'compression_level', <0-9>), 6 by default.
+-- Beware that LZMA entries cannot be extracted by Info-ZIP unzip 6.0, although 7-Zip can
+
+-- Batch reports are emailed through ('smtp', 'host' | 'port' | 'sender' | 'receivers' | 'password')
+-- with STARTTLS unless ('smtp', 'starttls', '0'), and no login if the password is empty.
+-- Failed deliveries are retried up to ('outbox', 'max_attempts', <N>) times (10), the first retry
+-- after ('outbox', 'retry_delay', <seconds>) (60), doubling every time, up to 6 hours
+
+-- Photometer name suffixes are allocated from ('<model>', 'number') on, reserving a block at a time.
+-- Stations syncing their registrations must use disjoint suffixes: out of ('<model>', 'stations', <N>),
+-- station ('<model>', 'station', <K>) only allocates suffixes equal to K modulo N (N = 1, K = 0 by default)
+
+-- Photometer statistics are redrawn at most every ('gui', 'refresh_ms', <ms>) milliseconds (100)
+-- Live plots show the last ('gui', 'plot_span', <s>) seconds (600) from up to ('gui', 'plot_capacity', <n>) samples per photometer (100000)
 
 -----------------------
 -- Device communication
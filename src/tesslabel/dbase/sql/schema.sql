@@ -34,3 +34,185 @@ CREATE TABLE IF NOT EXISTS tess_t
     PRIMARY KEY(mac)
 );
 
+
+-- Ledger of SQL update scripts applied to this database
+CREATE TABLE IF NOT EXISTS migrations_t
+(
+    name            TEXT,       -- SQL update file name
+    checksum        TEXT,       -- SHA256 of the SQL update file contents
+    applied_at      TIMESTAMP,  -- UTC timestamp when it was applied or recorded
+
+    PRIMARY KEY(name)
+);
+
+-- Change log and high water marks for changeset sync between labelling stations
+CREATE TABLE IF NOT EXISTS changelog_t
+(
+    seq             INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name      TEXT,    -- Changed table
+    row_key         TEXT,    -- Natural key of the changed row
+    origin          TEXT     -- UUID of the database the change was imported from. NULL if local
+);
+
+CREATE INDEX IF NOT EXISTS changelog_key_i ON changelog_t(table_name, row_key);
+
+CREATE TABLE IF NOT EXISTS sync_t
+(
+    remote_uuid     TEXT,    -- Remote database UUID
+    sent            INTEGER, -- Last local changelog_t seq exported to the remote database
+    received        INTEGER, -- Last remote changelog_t seq imported from the remote database
+
+    PRIMARY KEY(remote_uuid)
+);
+
+CREATE TRIGGER IF NOT EXISTS tess_insert_tr AFTER INSERT ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', NEW.mac);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tess_update_tr AFTER UPDATE ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) SELECT 'tess_t', OLD.mac WHERE OLD.mac IS NOT NEW.mac;
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', NEW.mac);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tess_delete_tr AFTER DELETE ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', OLD.mac);
+END;
+
+-- Batches whose calibration data was moved to an archive database, see dbase/archive.py
+CREATE TABLE IF NOT EXISTS archive_t
+(
+    begin_tstamp    TIMESTAMP,  -- Archived batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Archived batch end timestamp
+    path            TEXT,       -- Archive database file path
+    nrows           INTEGER,    -- Rows moved into the archive database
+    archived_at     TIMESTAMP,  -- UTC timestamp of the archival
+
+    PRIMARY KEY(begin_tstamp)
+);
+
+-- Exported batch artifacts per session, see export/engine.py
+CREATE TABLE IF NOT EXISTS export_manifest_t
+(
+    session         TIMESTAMP,  -- Calibration session
+    format          TEXT,       -- Samples export format ('csv', 'columnar')
+    position        INTEGER,    -- Entry order within the session (0 = rounds, 1 = samples)
+    entry           TEXT,       -- ZIP entry name
+    sha256          TEXT,       -- Entry contents SHA-256, also its cache file name
+    size            INTEGER,    -- Entry contents size in bytes
+    fingerprint     TEXT,       -- Session data fingerprint when exported
+    high_water      INTEGER,    -- Highest samples_t rowid of the session when exported
+    exported_at     TIMESTAMP,  -- UTC timestamp of the export
+
+    PRIMARY KEY(session, format, position)
+);
+
+-- Persistent email outbox, see mail/service.py
+CREATE TABLE IF NOT EXISTS outbox_t
+(
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch           TIMESTAMP,  -- Begin timestamp of the batch reported, if any
+    subject         TEXT,       -- Message subject
+    body            TEXT,       -- Message plain text body
+    attachment      TEXT,       -- Attached file path, if any
+    status          TEXT,       -- 'pending', 'sent' or 'failed'
+    attempts        INTEGER,    -- Delivery attempts so far
+    next_attempt    TIMESTAMP,  -- UTC timestamp of the next delivery attempt
+    last_error      TEXT,       -- Last delivery error message
+    created_at      TIMESTAMP,  -- UTC timestamp when queued
+    sent_at         TIMESTAMP   -- UTC timestamp when delivered
+);
+
+CREATE INDEX IF NOT EXISTS outbox_status_i ON outbox_t(status, next_attempt);
+
+-- Batch export timings, see export/engine.py
+CREATE TABLE IF NOT EXISTS export_log_t
+(
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    begin_tstamp    TIMESTAMP,  -- Exported batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Exported batch end timestamp
+    started_at      TIMESTAMP,  -- UTC timestamp of the export start
+    format          TEXT,       -- Samples export format
+    codec           TEXT,       -- ZIP compression codec
+    parallelism     INTEGER,    -- Concurrent session groups
+    sessions        INTEGER,    -- Sessions exported
+    cached          INTEGER,    -- Sessions taken from the export cache
+    nrows           INTEGER,    -- Rounds and samples rows encoded
+    nbytes          INTEGER,    -- Bytes written into the ZIP file
+    plan_ms         REAL,       -- Summary and change detection phase
+    encode_ms       REAL,       -- Sessions encoding, compression and writing phase
+    finish_ms       REAL,       -- ZIP file closing and manifest update phase
+    total_ms        REAL        -- Whole export
+);
+
+-- Registered photometers browsing by creation date, see dbase/registry.py
+CREATE INDEX IF NOT EXISTS tess_creation_i ON tess_t(creation_date, mac);
+
+-- Calibration batches and their calibration data, see dbase/batch.py
+CREATE TABLE IF NOT EXISTS batch_t
+(
+    begin_tstamp    TIMESTAMP,  -- Batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Batch end timestamp, NULL while open
+    email_sent      INTEGER,    -- 1 if emailed, 0 if the email failed, NULL if never tried
+    calibrations    INTEGER,    -- Calibrations done within the batch
+    comment         TEXT,       -- Optional comment
+
+    PRIMARY KEY(begin_tstamp)
+);
+
+CREATE TABLE IF NOT EXISTS summary_t
+(
+    model           TEXT,       -- Photometer model
+    name            TEXT,       -- Photometer name
+    mac             TEXT,       -- Photometer MAC
+    firmware        TEXT,       -- Photometer firmware version
+    prev_zp         REAL,       -- Zero point before the calibration
+    author          TEXT,       -- Calibration author
+    session         TIMESTAMP,  -- Calibration session
+    role            TEXT,       -- 'test' or 'ref'
+    calibration     TEXT,       -- 'MANUAL' or 'AUTO'
+    calversion      TEXT,       -- Calibration software version
+    zero_point      REAL,       -- Final zero point
+    zero_point_method TEXT,     -- Statistic over the rounds zero points
+    freq            REAL,       -- Final frequency
+    freq_method     TEXT,       -- Statistic over the rounds frequencies
+    mag             REAL,       -- Final magnitude
+    offset          REAL,       -- Extra zero point offset
+    upd_flag        INTEGER,    -- 1 if the zero point was written to the photometer
+    nrounds         INTEGER,    -- Calibration rounds
+
+    PRIMARY KEY(session, role)
+);
+
+CREATE TABLE IF NOT EXISTS rounds_t
+(
+    session         TIMESTAMP,  -- Calibration session
+    round           INTEGER,    -- Round number, from 1
+    role            TEXT,       -- 'test' or 'ref'
+    begin_tstamp    TIMESTAMP,  -- First sample of the round
+    end_tstamp      TIMESTAMP,  -- Last sample of the round
+    central         TEXT,       -- Central tendency statistic
+    freq            REAL,       -- Round frequency
+    stddev          REAL,       -- Round frequency standard deviation
+    mag             REAL,       -- Round magnitude
+    zp_fict         REAL,       -- Ficticious zero point used to compute mag
+    zero_point      REAL,       -- Round zero point
+    nsamples        INTEGER,    -- Samples in the round
+    duration        REAL,       -- Round duration in seconds
+
+    PRIMARY KEY(session, round, role)
+);
+
+CREATE TABLE IF NOT EXISTS samples_t
+(
+    tstamp          TIMESTAMP,  -- Sample timestamp
+    role            TEXT,       -- 'test' or 'ref'
+    session         TIMESTAMP,  -- Calibration session
+    freq            REAL,       -- Frequency in Hz
+    seq             INTEGER,    -- Photometer message sequence number
+    temp_box        REAL,       -- Box temperature
+
+    PRIMARY KEY(role, tstamp)
+);
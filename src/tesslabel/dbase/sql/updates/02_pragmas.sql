@@ -0,0 +1,13 @@
+BEGIN TRANSACTION;
+--------------------------------------------------------
+-- SQLite performance profile (see dbase/utils.py)
+-- Individual pragmas may be overriden by adding rows
+-- such as ('database', 'synchronous', 'FULL')
+--------------------------------------------------------
+
+INSERT OR IGNORE INTO config_t(section, property, value) 
+VALUES ('database', 'profile', 'balanced');
+
+UPDATE config_t SET value = '02' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
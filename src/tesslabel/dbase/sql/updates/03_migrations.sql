@@ -0,0 +1,17 @@
+BEGIN TRANSACTION;
+--------------------------------------------------------
+-- Ledger of SQL update scripts applied to this database
+--------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS migrations_t
+(
+    name            TEXT,       -- SQL update file name
+    checksum        TEXT,       -- SHA256 of the SQL update file contents
+    applied_at      TIMESTAMP,  -- UTC timestamp when it was applied or recorded
+
+    PRIMARY KEY(name)
+);
+
+UPDATE config_t SET value = '03' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
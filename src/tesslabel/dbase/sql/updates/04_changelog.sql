@@ -0,0 +1,47 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Change log and high water marks for changeset sync
+-- between labelling stations databases (see dbase/sync.py)
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS changelog_t
+(
+    seq             INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name      TEXT,    -- Changed table
+    row_key         TEXT,    -- Natural key of the changed row
+    origin          TEXT     -- UUID of the database the change was imported from. NULL if local
+);
+
+CREATE INDEX IF NOT EXISTS changelog_key_i ON changelog_t(table_name, row_key);
+
+CREATE TABLE IF NOT EXISTS sync_t
+(
+    remote_uuid     TEXT,    -- Remote database UUID
+    sent            INTEGER, -- Last local changelog_t seq exported to the remote database
+    received        INTEGER, -- Last remote changelog_t seq imported from the remote database
+
+    PRIMARY KEY(remote_uuid)
+);
+
+CREATE TRIGGER IF NOT EXISTS tess_insert_tr AFTER INSERT ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', NEW.mac);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tess_update_tr AFTER UPDATE ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) SELECT 'tess_t', OLD.mac WHERE OLD.mac IS NOT NEW.mac;
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', NEW.mac);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tess_delete_tr AFTER DELETE ON tess_t
+BEGIN
+    INSERT INTO changelog_t(table_name, row_key) VALUES ('tess_t', OLD.mac);
+END;
+
+-- Existing rows are logged so that the first sync ships them
+INSERT INTO changelog_t(table_name, row_key) SELECT 'tess_t', mac FROM tess_t;
+
+UPDATE config_t SET value = '04' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
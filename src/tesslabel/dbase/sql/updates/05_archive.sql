@@ -0,0 +1,20 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Batches whose calibration data was moved to an archive
+-- database, see dbase/archive.py
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS archive_t
+(
+    begin_tstamp    TIMESTAMP,  -- Archived batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Archived batch end timestamp
+    path            TEXT,       -- Archive database file path
+    nrows           INTEGER,    -- Rows moved into the archive database
+    archived_at     TIMESTAMP,  -- UTC timestamp of the archival
+
+    PRIMARY KEY(begin_tstamp)
+);
+
+UPDATE config_t SET value = '05' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,25 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Exported batch artifacts per session, so that re-exports
+-- only regenerate the sessions whose data changed,
+-- see export/engine.py
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS export_manifest_t
+(
+    session         TIMESTAMP,  -- Calibration session
+    format          TEXT,       -- Samples export format ('csv', 'columnar')
+    position        INTEGER,    -- Entry order within the session (0 = rounds, 1 = samples)
+    entry           TEXT,       -- ZIP entry name
+    sha256          TEXT,       -- Entry contents SHA-256, also its cache file name
+    size            INTEGER,    -- Entry contents size in bytes
+    fingerprint     TEXT,       -- Session data fingerprint when exported
+    high_water      INTEGER,    -- Highest samples_t rowid of the session when exported
+    exported_at     TIMESTAMP,  -- UTC timestamp of the export
+
+    PRIMARY KEY(session, format, position)
+);
+
+UPDATE config_t SET value = '06' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,25 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Persistent email outbox, see mail/service.py
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS outbox_t
+(
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch           TIMESTAMP,  -- Begin timestamp of the batch reported, if any
+    subject         TEXT,       -- Message subject
+    body            TEXT,       -- Message plain text body
+    attachment      TEXT,       -- Attached file path, if any
+    status          TEXT,       -- 'pending', 'sent' or 'failed'
+    attempts        INTEGER,    -- Delivery attempts so far
+    next_attempt    TIMESTAMP,  -- UTC timestamp of the next delivery attempt
+    last_error      TEXT,       -- Last delivery error message
+    created_at      TIMESTAMP,  -- UTC timestamp when queued
+    sent_at         TIMESTAMP   -- UTC timestamp when delivered
+);
+
+CREATE INDEX IF NOT EXISTS outbox_status_i ON outbox_t(status, next_attempt);
+
+UPDATE config_t SET value = '07' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,28 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Batch export timings, to track export performance over
+-- time, see export/engine.py
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS export_log_t
+(
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    begin_tstamp    TIMESTAMP,  -- Exported batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Exported batch end timestamp
+    started_at      TIMESTAMP,  -- UTC timestamp of the export start
+    format          TEXT,       -- Samples export format
+    codec           TEXT,       -- ZIP compression codec
+    parallelism     INTEGER,    -- Concurrent session groups
+    sessions        INTEGER,    -- Sessions exported
+    cached          INTEGER,    -- Sessions taken from the export cache
+    nrows           INTEGER,    -- Rounds and samples rows encoded
+    nbytes          INTEGER,    -- Bytes written into the ZIP file
+    plan_ms         REAL,       -- Summary and change detection phase
+    encode_ms       REAL,       -- Sessions encoding, compression and writing phase
+    finish_ms       REAL,       -- ZIP file closing and manifest update phase
+    total_ms        REAL        -- Whole export
+);
+
+UPDATE config_t SET value = '08' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,12 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Registered photometers browsing by creation date, see
+-- dbase/registry.py. Browsing by name and MAC already
+-- uses the UNIQUE(prefix, suffix) and PRIMARY KEY indexes
+----------------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS tess_creation_i ON tess_t(creation_date, mac);
+
+UPDATE config_t SET value = '09' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,76 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Calibration batches and their calibration data, as
+-- exported and archived by export/engine.py and
+-- dbase/archive.py, see dbase/batch.py
+----------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS batch_t
+(
+    begin_tstamp    TIMESTAMP,  -- Batch begin timestamp
+    end_tstamp      TIMESTAMP,  -- Batch end timestamp, NULL while open
+    email_sent      INTEGER,    -- 1 if emailed, 0 if the email failed, NULL if never tried
+    calibrations    INTEGER,    -- Calibrations done within the batch
+    comment         TEXT,       -- Optional comment
+
+    PRIMARY KEY(begin_tstamp)
+);
+
+CREATE TABLE IF NOT EXISTS summary_t
+(
+    model           TEXT,       -- Photometer model
+    name            TEXT,       -- Photometer name
+    mac             TEXT,       -- Photometer MAC
+    firmware        TEXT,       -- Photometer firmware version
+    prev_zp         REAL,       -- Zero point before the calibration
+    author          TEXT,       -- Calibration author
+    session         TIMESTAMP,  -- Calibration session
+    role            TEXT,       -- 'test' or 'ref'
+    calibration     TEXT,       -- 'MANUAL' or 'AUTO'
+    calversion      TEXT,       -- Calibration software version
+    zero_point      REAL,       -- Final zero point
+    zero_point_method TEXT,     -- Statistic over the rounds zero points
+    freq            REAL,       -- Final frequency
+    freq_method     TEXT,       -- Statistic over the rounds frequencies
+    mag             REAL,       -- Final magnitude
+    offset          REAL,       -- Extra zero point offset
+    upd_flag        INTEGER,    -- 1 if the zero point was written to the photometer
+    nrounds         INTEGER,    -- Calibration rounds
+
+    PRIMARY KEY(session, role)
+);
+
+CREATE TABLE IF NOT EXISTS rounds_t
+(
+    session         TIMESTAMP,  -- Calibration session
+    round           INTEGER,    -- Round number, from 1
+    role            TEXT,       -- 'test' or 'ref'
+    begin_tstamp    TIMESTAMP,  -- First sample of the round
+    end_tstamp      TIMESTAMP,  -- Last sample of the round
+    central         TEXT,       -- Central tendency statistic
+    freq            REAL,       -- Round frequency
+    stddev          REAL,       -- Round frequency standard deviation
+    mag             REAL,       -- Round magnitude
+    zp_fict         REAL,       -- Ficticious zero point used to compute mag
+    zero_point      REAL,       -- Round zero point
+    nsamples        INTEGER,    -- Samples in the round
+    duration        REAL,       -- Round duration in seconds
+
+    PRIMARY KEY(session, round, role)
+);
+
+CREATE TABLE IF NOT EXISTS samples_t
+(
+    tstamp          TIMESTAMP,  -- Sample timestamp
+    role            TEXT,       -- 'test' or 'ref'
+    session         TIMESTAMP,  -- Calibration session
+    freq            REAL,       -- Frequency in Hz
+    seq             INTEGER,    -- Photometer message sequence number
+    temp_box        REAL,       -- Box temperature
+
+    PRIMARY KEY(role, tstamp)
+);
+
+UPDATE config_t SET value = '10' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
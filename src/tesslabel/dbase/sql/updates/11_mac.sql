@@ -0,0 +1,18 @@
+BEGIN TRANSACTION;
+----------------------------------------------------------
+-- Registered MACs in the XX:YY:ZZ:TT:UU:VV format, as
+-- written from now on and looked up by dbase/macindex.py.
+-- Rows whose normalized MAC is already registered are
+-- left as they are.
+----------------------------------------------------------
+
+UPDATE OR IGNORE tess_t SET mac = upper(replace(mac, '-', ':'))
+WHERE mac IS NOT NULL AND mac != upper(replace(mac, '-', ':'));
+
+UPDATE OR IGNORE tess_t SET mac = substr(mac, 1, 2) || ':' || substr(mac, 3, 2) || ':' || substr(mac, 5, 2) || ':' ||
+    substr(mac, 7, 2) || ':' || substr(mac, 9, 2) || ':' || substr(mac, 11, 2)
+WHERE length(mac) = 12 AND instr(mac, ':') = 0;
+
+UPDATE config_t SET value = '11' WHERE section = 'database' AND property = 'version';
+
+COMMIT;
@@ -0,0 +1,152 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import sqlite3
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.internet import defer
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.dbase import log
+from tesslabel.dbase.utils import apply_pragmas
+
+# ----------------
+# Module constants
+# ----------------
+
+# Default number of rows fetched per chunk
+CHUNK_SIZE = 1000
+
+# --------------
+# Module Classes
+# --------------
+
+class RowStream:
+    '''
+    Pull based, read only query cursor over its own database connection.
+    Rows are fetched from a worker thread in chunks of chunk_size, and the next
+    chunk is not fetched until the consumer asks for it, so memory stays
+    bounded no matter how many rows the query returns.
+
+    Usage from inlineCallbacks:
+        chunk = yield stream.next()   # [] when exhausted
+    or with a callback that may return a Deferred (backpressure):
+        total = yield stream.forEach(callback)
+    or from a coroutine under defer.ensureDeferred():
+        async for chunk in stream: ...
+
+    The optional transform(rows) is applied to every chunk in the worker thread.
+    The connection is closed when the rows are exhausted, on error or on close().
+    '''
+
+    def __init__(self, uri, sql, params=None, chunk_size=CHUNK_SIZE, pragmas=None, transform=None):
+        self._uri = uri
+        self._sql = sql
+        self._params = params if params is not None else {}
+        self._chunk_size = chunk_size
+        self._pragmas = pragmas
+        self._transform = transform
+        self._connection = None
+        self._cursor = None
+        self._exhausted = False
+        self._lock = defer.DeferredLock()
+        self.rows = 0
+
+    # ----------
+    # Public API
+    # ----------
+
+    def next(self):
+        '''Returns a Deferred with the next chunk of rows, an empty list when exhausted'''
+        return self._lock.run(self._next)
+
+    @inlineCallbacks
+    def forEach(self, callback, *args, **kw):
+        '''
+        Calls callback(chunk, *args, **kw) for every chunk. The next chunk is not
+        fetched until the Deferred returned by the callback (if any) fires.
+        Returns a Deferred with the total number of rows.
+        '''
+        try:
+            while True:
+                chunk = yield self.next()
+                if not chunk and self._exhausted:
+                    break
+                yield defer.maybeDeferred(callback, chunk, *args, **kw)
+        finally:
+            yield self.close()
+        return self.rows
+
+    def close(self):
+        '''Closes the stream after any pending fetch. Returns a Deferred'''
+        return self._lock.run(self._close)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.next()
+        if not chunk and self._exhausted:
+            raise StopAsyncIteration
+        return chunk
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _close(self):
+        self._exhausted = True
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._cursor = None
+
+    @inlineCallbacks
+    def _next(self):
+        if self._exhausted:
+            return []
+        try:
+            fetched, chunk = yield deferToThread(self._fetch)
+        except Exception:
+            self._close()
+            raise
+        if fetched < self._chunk_size:
+            self._close()
+        self.rows += fetched
+        return chunk
+
+    def _fetch(self):
+        # Runs in a worker thread, one chunk at a time
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            if self._pragmas:
+                apply_pragmas(self._connection, self._pragmas, read_only=True)
+            log.debug("{sql} {data}", sql=self._sql, data=self._params)
+            self._cursor = self._connection.execute(self._sql, self._params)
+        chunk = self._cursor.fetchmany(self._chunk_size)
+        fetched = len(chunk)
+        if self._transform is not None:
+            chunk = self._transform(chunk)
+        return fetched, chunk
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "RowStream",
+]
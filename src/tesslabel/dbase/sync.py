@@ -0,0 +1,259 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import gzip
+import json
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'sync'
+
+CHANGESET_FORMAT = 1
+
+# Tables shipped in changesets: natural key column first, then the remaining columns
+SYNC_TABLES = {
+    'tess_t': ('mac', 'prefix', 'suffix', 'sensor', 'zero_point', 'freq_offset', 'interval',
+        'telnet_port', 'broker', 'password_hash', 'ssid', 'creation_date'),
+}
+
+# Other unique keys of the synchronized tables, checked before applying a changeset
+SYNC_UNIQUE = {
+    'tess_t': (('prefix', 'suffix'),),
+}
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# -----------------------
+# Module Exception Classes
+# -----------------------
+
+class SyncConflictError(ValueError):
+    '''
+    A changeset row would take the unique key of a different local row.
+    conflicts is a list of (table, columns, values, local key, incoming key).
+    Rows exchanging their unique keys within the same changeset, such as two
+    photometers swapping names, are not conflicts.
+    '''
+
+    def __init__(self, source, conflicts):
+        self.source = source
+        self.conflicts = conflicts
+        details = '; '.join(f"{table}({','.join(columns)}) = ({','.join(map(str, values))}) is {local} here but {incoming} in {source}"
+            for table, columns, values, local, incoming in conflicts)
+        super().__init__(f"Changeset from {source} not applied, {len(conflicts)} conflicting rows: {details}")
+
+# --------------
+# Module Classes
+# --------------
+
+class ChangesetSync:
+    '''
+    Incremental changeset export/import between labelling stations databases.
+    Triggers record the natural key of every changed row in changelog_t.
+    A changeset holds the current state of the rows changed since the last export
+    to a given remote database (or a delete marker if the row no longer exists),
+    so its size depends on the changes, not on the database size.
+    The file is gzipped JSON, with column names written once per table.
+    A changeset is applied as a whole or not at all: a row that would take the
+    unique key of a different local row (i.e. the same name registered to
+    another MAC at each station) raises SyncConflictError.
+    '''
+
+    def __init__(self, pool, log_level='info'):
+        self._pool = pool
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def exportChangeset(self, local_uuid, remote_uuid, path, full=False):
+        '''
+        Writes the changes not yet sent to remote_uuid into path.
+        Changes imported from remote_uuid itself are not sent back.
+        full = True ignores the high water mark.
+        Returns a Deferred with the number of rows exported.
+        '''
+        since = 0 if full else (yield self._pool.runReadInteraction(self._highWater, remote_uuid, 'sent'))
+        changeset = yield self._pool.runReadInteraction(self._readChanges, remote_uuid, since)
+        changeset['source'] = local_uuid
+        changeset['target'] = remote_uuid
+        count = sum(len(t['upserts']) + len(t['deletes']) for t in changeset['tables'].values())
+        yield deferToThread(self._dump, changeset, path)
+        yield self._pool.runInteraction(self._saveHighWater, remote_uuid, 'sent', changeset['until'])
+        log.info("Exported {n} changes [{since}-{until}] for {remote} to {path}",
+            n=count, since=since, until=changeset['until'], remote=remote_uuid, path=path)
+        return count
+
+    @inlineCallbacks
+    def importChangeset(self, local_uuid, path):
+        '''
+        Applies a changeset file in a single transaction.
+        Returns a Deferred with the number of rows applied (0 if already applied),
+        failing with SyncConflictError and nothing applied on unique key conflicts.
+        '''
+        changeset = yield deferToThread(self._load, path)
+        if changeset.get('format') != CHANGESET_FORMAT:
+            raise ValueError(f"Unsupported changeset format {changeset.get('format')}")
+        if changeset['source'] == local_uuid:
+            raise ValueError("Changeset was exported by this very same database")
+        count = yield self._pool.runInteraction(self._applyChanges, changeset)
+        log.info("Imported {n} changes [{since}-{until}] from {remote}",
+            n=count, since=changeset['since'], until=changeset['until'], remote=changeset['source'])
+        return count
+
+    # -----------------
+    # Read interactions
+    # -----------------
+
+    def _highWater(self, txn, remote_uuid, column):
+        txn.execute(f"SELECT {column} FROM sync_t WHERE remote_uuid = :remote", {'remote': remote_uuid})
+        result = txn.fetchone()
+        return result[0] if result and result[0] is not None else 0
+
+    def _readChanges(self, txn, remote_uuid, since):
+        txn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog_t")
+        until = txn.fetchone()[0]
+        row = {'remote': remote_uuid, 'since': since, 'until': until}
+        tables = dict()
+        for table, columns in SYNC_TABLES.items():
+            key = columns[0]
+            selected = ",".join(f"t.{column}" for column in columns)
+            row['table'] = table
+            txn.execute(f'''
+                SELECT c.row_key, {selected}
+                FROM (SELECT DISTINCT row_key FROM changelog_t
+                      WHERE table_name = :table AND seq > :since AND seq <= :until
+                      AND (origin IS NULL OR origin != :remote)) AS c
+                LEFT JOIN {table} AS t ON t.{key} = c.row_key
+                ''', row)
+            upserts = list()
+            deletes = list()
+            for result in txn.fetchall():
+                if result[1] is None:
+                    deletes.append(result[0])
+                else:
+                    upserts.append(result[1:])
+            tables[table] = {'columns': columns, 'upserts': upserts, 'deletes': deletes}
+        return {'format': CHANGESET_FORMAT, 'since': since, 'until': until, 'tables': tables}
+
+    # ----------------
+    # File I/O helpers
+    # ----------------
+
+    def _dump(self, changeset, path):
+        with gzip.open(path, 'wt', encoding='utf-8') as fd:
+            json.dump(changeset, fd, separators=(',',':'))
+
+    def _load(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as fd:
+            return json.load(fd)
+
+    # ------------------
+    # Write interactions
+    # ------------------
+
+    def _saveHighWater(self, txn, remote_uuid, column, value):
+        row = {'remote': remote_uuid, 'value': value}
+        txn.execute("INSERT OR IGNORE INTO sync_t(remote_uuid, sent, received) VALUES (:remote, 0, 0)", row)
+        txn.execute(f"UPDATE sync_t SET {column} = :value WHERE remote_uuid = :remote", row)
+
+    def _applyChanges(self, txn, changeset):
+        source = changeset['source']
+        received = self._highWater(txn, source, 'received')
+        if changeset['until'] <= received:
+            log.warn("Changeset [{since}-{until}] from {remote} already applied",
+                since=changeset['since'], until=changeset['until'], remote=source)
+            return 0
+        if changeset['since'] > received:
+            raise ValueError(f"Missing changes from {source} between {received} and {changeset['since']}")
+        for table, data in changeset['tables'].items():
+            if table not in SYNC_TABLES:
+                raise ValueError(f"Table {table} cannot be synchronized")
+            columns = data['columns']
+            if columns[0] != SYNC_TABLES[table][0] or not set(columns) <= set(SYNC_TABLES[table]):
+                raise ValueError(f"Unexpected columns {columns} for table {table}")
+        conflicts = self._conflicts(txn, changeset)
+        if conflicts:
+            raise SyncConflictError(source, conflicts)
+        txn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog_t")
+        before = txn.fetchone()[0]
+        count = 0
+        for table, data in changeset['tables'].items():
+            columns = data['columns']
+            key = columns[0]
+            placeholders = ",".join("?" * len(columns))
+            updates = ",".join(f"{column}=excluded.{column}" for column in columns[1:])
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            txn.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(k,) for k in data['deletes']])
+            parked = [column for unique in SYNC_UNIQUE.get(table, ()) if set(unique) <= set(columns) for column in unique]
+            if parked:
+                # Two phases, so that rows swapping their unique values (i.e. names) do not collide halfway
+                assignments = ",".join(f"{column}=NULL" for column in parked)
+                txn.executemany(f"UPDATE {table} SET {assignments} WHERE {key} = ?", [(row[0],) for row in data['upserts']])
+            txn.executemany(f"INSERT INTO {table}({','.join(columns)}) VALUES ({placeholders}) ON CONFLICT({key}) {action}", data['upserts'])
+            count += len(data['upserts']) + len(data['deletes'])
+        # Tag the change log entries made by the triggers so they are not sent back
+        txn.execute("UPDATE changelog_t SET origin = :source WHERE seq > :before", {'source': source, 'before': before})
+        self._saveHighWater(txn, source, 'received', changeset['until'])
+        return count
+
+    def _conflicts(self, txn, changeset):
+        '''
+        Incoming rows whose other unique keys belong to a different local row
+        that the changeset neither deletes nor updates
+        '''
+        conflicts = list()
+        for table, data in changeset['tables'].items():
+            columns = data['columns']
+            key = columns[0]
+            replaced = set(data['deletes']) | set(row[0] for row in data['upserts'])
+            for unique in SYNC_UNIQUE.get(table, ()):
+                if not set(unique) <= set(columns):
+                    continue
+                positions = [columns.index(column) for column in unique]
+                condition = " AND ".join(f"{column} = ?" for column in unique)
+                for row in data['upserts']:
+                    values = tuple(row[i] for i in positions)
+                    if None in values:
+                        continue  # NULLs never collide
+                    txn.execute(f"SELECT {key} FROM {table} WHERE {condition} AND {key} != ?", values + (row[0],))
+                    for (local,) in txn.fetchall():
+                        if local not in replaced:
+                            conflicts.append((table, unique, values, local, row[0]))
+        return conflicts
+
+
+__all__ = [
+    "ChangesetSync",
+    "SyncConflictError",
+]
@@ -18,12 +18,15 @@ import datetime
 
 from twisted.logger import Logger
 from twisted.enterprise import adbapi
+from twisted.internet import defer
 
 #--------------
 # local imports
 # -------------
 
 from tesslabel.logger import setLogLevel
+from tesslabel.dbase.stream import CHUNK_SIZE
+from tesslabel.dbase.rows import make_row_factory, ROW_DICT
 
 # ----------------
 # Module constants
@@ -46,7 +49,7 @@ class Table:
 
     def __init__(self, pool, table, id_column, 
         natural_key_columns, other_columns,
-        insert_mode=QUERY_INSERT_OR_REPLACE, log_level='info'):
+        insert_mode=QUERY_INSERT_OR_REPLACE, row_factory=ROW_DICT, log_level='info'):
         self.log = Logger(namespace=table)
         self._pool = pool
         self._table = table
@@ -54,6 +57,9 @@ class Table:
         self._natural_key_columns = natural_key_columns
         self._other_columns = other_columns
         self._insert_mode =  insert_mode
+        # Row converters built once per table. See dbase/rows.py, hot tables may opt into ROW_RECORD
+        self._rows = make_row_factory(row_factory, natural_key_columns + other_columns, f"{table}_row")
+        self._nk_rows = make_row_factory(row_factory, natural_key_columns, f"{table}_nk")
         setLogLevel(namespace=table, levelStr=log_level)
 
     # ----------
@@ -66,40 +72,56 @@ class Table:
         nk_dict is a dictionary containing at least the values for the natural key columns
         Returns a Deferred
         '''
-        return self._pool.runInteraction( self._readId, nk_dict)
+        return self._pool.runReadInteraction(self._readId, nk_dict)
 
 
     def load(self, nk_dict):
         '''
-        Read a row returning a dictionary with both the natural key columns and other columns
+        Read a row (see row_factory) with both the natural key columns and other columns
         nk_dict is a dictionary containing at least the values for the natural key columns
         Returns a Deferred
         '''
-        return self._pool.runInteraction(self._readEntry, nk_dict)
+        return self._pool.runReadInteraction(self._readEntry, nk_dict)
 
     def loadById(self, id_dict):
         '''
-        Read a row returning a dictionary with both the natural key columns and other columns
+        Read a row (see row_factory) with both the natural key columns and other columns
         id_dict is a dictionary containing at least the value for the column_id
         Returns a Deferred
         '''
-        return self._pool.runInteraction(self._readEntryById, id_dict)
+        return self._pool.runReadInteraction(self._readEntryById, id_dict)
 
 
     def loadAll(self):
         ''' 
-        Read all rows in the table returning a dictionary with both the natural key columns and other columns
+        Read all rows in the table (see row_factory) with both the natural key columns and other columns
         Returns a Deferred
         '''
-        return self._pool.runInteraction(self._readEntries)
+        return self._pool.runReadInteraction(self._readEntries)
 
 
     def loadAllNK(self):
         '''
-        Read all rows in the table returning a dictionary with the natural key columns
+        Read all rows in the table (see row_factory) with the natural key columns
         Returns a Deferred
         '''
-        return self._pool.runInteraction(self._readNaturalKeys)
+        return self._pool.runReadInteraction(self._readNaturalKeys)
+
+
+    def stream(self, chunk_size=CHUNK_SIZE):
+        '''
+        Same rows as loadAll() but fetched in chunks of chunk_size on demand
+        Returns a RowStream
+        '''
+        return self._pool.stream(self._sqlReadEntries(), chunk_size=chunk_size, transform=self._rows)
+
+
+    def streamNK(self, chunk_size=CHUNK_SIZE):
+        '''
+        Same rows as loadAllNK() but fetched in chunks of chunk_size on demand
+        Returns a RowStream
+        '''
+        return self._pool.stream(self._sqlNaturalKeys(), chunk_size=chunk_size, transform=self._nk_rows)
 
 
     def save(self, all_dict):
@@ -176,12 +198,11 @@ class Table:
 
     def _readEntry(self, txn, nk_dict):
         query_sql = self._sqlReadEntry()
-        all_columns = self._natural_key_columns + self._other_columns
         self.log.debug("{sql} {data}", sql=query_sql, data=nk_dict)
         txn.execute(query_sql, nk_dict)
         result = txn.fetchone()
         if result:
-            result = dict(zip(all_columns,result))
+            result = self._rows((result,))[0]
         return result
 
     # ------------------------------------------------------------------------------------------------
@@ -196,12 +217,11 @@ class Table:
 
     def _readEntryById(self, txn, id_dict):
         query_sql = self._sqlReadEntryById()
-        all_columns = self._natural_key_columns + self._other_columns
         self.log.debug("{sql} {data}", sql=query_sql, data=id_dict)
         txn.execute(query_sql, id_dict)
         result = txn.fetchone()
         if result:
-            result = dict(zip(all_columns,result))
+            result = self._rows((result,))[0]
         return result
 
     # ------------------------------------------------------------------------------------------------
@@ -216,12 +236,11 @@ class Table:
 
     def _readEntries(self, txn):
         query_sql = self._sqlReadEntries()
-        all_columns = self._natural_key_columns + self._other_columns
         self.log.debug("{sql}", sql=query_sql)
         txn.execute(query_sql)
         result = txn.fetchall()
         if result:
-            result = [dict(zip(all_columns, row)) for row in result]
+            result = self._rows(result)
         return result
 
 
@@ -237,12 +256,11 @@ class Table:
 
     def _readNaturalKeys(self, txn):
         query_sql = self._sqlNaturalKeys()
-        all_columns = self._natural_key_columns
         self.log.debug("{sql}", sql=query_sql)
         txn.execute(query_sql)
         result = txn.fetchall()
         if result:
-            result = [dict(zip(all_columns, row)) for row in result]
+            result = self._nk_rows(result)
         return result
 
     # ------------------------------------------------------------------------------------------------
@@ -536,42 +554,126 @@ class VersionedTable(Table):
 
 
 
+def _as_text(value):
+    '''Mimics the TEXT affinity conversions done by SQLite on config_t values'''
+    if value is None or isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value)
+
+
 class ConfigTable:
+    '''
+    config_t access with a write-through, section indexed in-memory mirror.
+    Once the mirror is loaded, reads return already fired Deferreds
+    and only writes reach the database.
+    '''
 
-    def __init__(self, pool, log_level='info'):
+    def __init__(self, pool, log_level='info', initial=None):
         self._pool = pool
         self.log = Logger(namespace='config_t')
         setLogLevel(namespace='config_t', levelStr=log_level)
+        self._generation = 0
+        self._mirror = None
+        if initial is not None:
+            self._mirror = {section: dict(properties) for section, properties in initial.items()}
 
     def load(self, section, property):
         '''Returns a Deferred'''
-        row = {'section': section, 'property': property}
-        return self._pool.runInteraction(self._read, row)
+        return self._loadMirror().addCallback(self._getProperty, section, property)
 
     def loadSection(self, section):
         '''Returns a Deferred'''
-        row= {'section': section}
-        return self._pool.runInteraction(self._readSection, row)
+        return self._loadMirror().addCallback(self._getSection, section)
 
     def save(self, section, property, value):
         '''Returns a Deferred'''
         rows = [{'section': section, 'property': property, 'value': value}]
-        return self._pool.runInteraction(self._write, rows)
+        return self._writeThrough(self._write, rows)
 
     def saveSection(self, section, prop_dict):
         '''Returns a Deferred'''
         rows = [{'section': section, 'property': key, 'value': value} for key,value in prop_dict.items()]
-        return self._pool.runInteraction(self._write, rows)
+        return self._writeThrough(self._write, rows)
 
     def delete(self, section, property):
         '''Returns a Deferred'''
-        rows = [{'section': section, 'property': property, 'value': value}]
-        return self._pool.runInteraction(self._delete, rows)
+        rows = [{'section': section, 'property': property}]
+        return self._writeThrough(self._delete, rows)
 
     def deleteSection(self, section, prop_dict):
         '''Returns a Deferred'''
         rows = [{'section': section, 'property': key} for key,value in prop_dict.items()]
-        return self._pool.runInteraction(self._delete, rows)
+        return self._writeThrough(self._delete, rows)
+
+    def refresh(self, section, property, value):
+        '''Updates the in-memory mirror after a config_t write made by another interaction'''
+        if self._mirror is None:
+            self._generation += 1
+        else:
+            self._mirror.setdefault(section, {})[property] = _as_text(value)
+
+    # --------------
+    # Mirror helpers
+    # --------------
+
+    def _loadMirror(self):
+        if self._mirror is not None:
+            return defer.succeed(self._mirror)
+        generation = self._generation
+        d = self._pool.runReadInteraction(self._readAll)
+        d.addCallback(self._installMirror, generation)
+        return d
+
+    def _installMirror(self, mirror, generation):
+        # A write issued while loading may not be seen by the reader connection
+        if generation == self._generation:
+            self._mirror = mirror
+        return mirror
+
+    def _invalidate(self, failure):
+        self._generation += 1
+        self._mirror = None
+        return failure
+
+    def _getProperty(self, mirror, section, property):
+        properties = mirror.get(section, {})
+        if property not in properties:
+            return []   # Same as an empty SQL result set
+        return {property: properties[property]}
+
+    def _getSection(self, mirror, section):
+        properties = mirror.get(section)
+        return dict(properties) if properties else []
+
+    def _writeThrough(self, interaction, rows):
+        if self._mirror is None:
+            self._generation += 1
+        elif interaction == self._write:
+            for row in rows:
+                self._mirror.setdefault(row['section'], {})[row['property']] = _as_text(row['value'])
+        else:
+            for row in rows:
+                properties = self._mirror.get(row['section'], {})
+                if row['property'] in properties:
+                    properties[row['property']] = None
+        d = self._pool.runInteraction(interaction, rows)
+        d.addErrback(self._invalidate)   # Reload from the database on next read
+        return d
+
+    # ----------------------
+    # Private helper methods
+    # ----------------------
+
+    def _readAll(self, txn):
+        sql = "SELECT section, property, value FROM config_t;"
+        self.log.debug("{sql}", sql=sql)
+        txn.execute(sql)
+        mirror = dict()
+        for section, property, value in txn.fetchall():
+            mirror.setdefault(section, {})[property] = value
+        return mirror
 
     def _read(self, txn, row):
         sql = "SELECT property, value FROM config_t WHERE section = :section AND property = :property;"
@@ -0,0 +1,205 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import time
+import sqlite3
+import threading
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+
+# ----------------
+# Module constants
+# ----------------
+
+# Slow query log namespace, so that it can be enabled or silenced on its own
+NAMESPACE = 'slowq'
+
+# Default slow statement threshold in milliseconds
+SLOW_QUERY_MS = 200
+
+PHASES = ('wait', 'execute', 'fetch')
+
+# Histogram buckets are powers of two in microseconds: <1us, <2us, <4us ...
+NBUCKETS = 32
+
+# Rows fetched at a time when iterating over a TimedCursor
+FETCH_CHUNK = 256
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def interaction_key(interaction):
+    '''(table, operation) key of an interaction, i.e. ('tess_t', '_readEntry')'''
+    interaction = getattr(interaction, 'func', interaction)   # functools.partial
+    owner = getattr(interaction, '__self__', None)
+    table = getattr(owner, '_table', None) or (owner.__class__.__name__ if owner is not None else getattr(interaction, '__module__', None))
+    return (str(table), getattr(interaction, '__name__', interaction.__class__.__name__))
+
+# --------------
+# Module Classes
+# --------------
+
+class Histogram:
+    '''Log2 bucketed latency histogram'''
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * NBUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[min(int(seconds * 1e6).bit_length(), NBUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        '''Upper bound in seconds of the bucket holding the p-th percentile'''
+        target = p * self.count / 100
+        accumulated = 0
+        for i, n in enumerate(self.buckets):
+            accumulated += n
+            if n and accumulated >= target:
+                return (1 << i) / 1e6
+        return 0.0
+
+
+
+class StatementTimer:
+    '''
+    Thread safe collection of interaction timings, keyed by (table, operation),
+    with one histogram per phase: time waiting in the queue, executing
+    statements and fetching results. Statements above the slow threshold
+    are logged in the 'slowq' namespace.
+    '''
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow = slow_ms / 1000
+        self._lock = threading.Lock()
+        self._histograms = dict()
+
+    def record(self, key, wait, execute, fetch):
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = tuple(Histogram() for phase in PHASES)
+            for histogram, value in zip(histograms, (wait, execute, fetch)):
+                histogram.add(value)
+
+    def statement(self, key, sql, elapsed):
+        if elapsed >= self.slow:
+            log.warn("{ms:.1f} ms {table}.{op}: {sql}", ms=1000*elapsed, table=key[0], op=key[1], sql=" ".join(sql.split())[:200])
+
+    def totals(self):
+        '''Returns {(table, operation): {phase: {count, total, max, p50, p99}}} with times in milliseconds'''
+        with self._lock:
+            return {key: {phase: {
+                    'count': h.count,
+                    'total': 1000 * h.total,
+                    'max'  : 1000 * h.max,
+                    'p50'  : 1000 * h.percentile(50),
+                    'p99'  : 1000 * h.percentile(99),
+                } for phase, h in zip(PHASES, histograms)}
+                for key, histograms in self._histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = dict()
+
+    def timed(self, interaction, queued):
+        '''Wraps interaction(cursor, *args, **kw) so that it runs over a TimedCursor'''
+        def wrapper(cursor, *args, **kw):
+            wait = time.perf_counter() - queued
+            key = interaction_key(interaction)
+            timed = TimedCursor(cursor, self, key)
+            try:
+                return interaction(timed, *args, **kw)
+            finally:
+                self.record(key, wait, timed.execute_time, timed.fetch_time)
+        return wrapper
+
+
+
+class TimedCursor:
+    '''
+    Cursor or adbapi Transaction proxy accounting execute and fetch times.
+    execute() returns the proxy itself when the wrapped call returns a cursor,
+    so that chained fetches are timed, and iterating over it fetches
+    FETCH_CHUNK rows at a time as they are consumed.
+    '''
+
+    def __init__(self, cursor, timer, key):
+        self._cursor = cursor
+        self._timer = timer
+        self._key = key
+        self.execute_time = 0.0
+        self.fetch_time = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(FETCH_CHUNK)
+            if not rows:
+                return
+            yield from rows
+
+    def _execute(self, method, sql, *args):
+        t0 = time.perf_counter()
+        result = method(sql, *args)
+        elapsed = time.perf_counter() - t0
+        self.execute_time += elapsed
+        self._timer.statement(self._key, sql, elapsed)
+        # adbapi Transactions return their underlying sqlite3 cursor
+        return self if result is self._cursor or isinstance(result, sqlite3.Cursor) else result
+
+    def execute(self, sql, *args):
+        return self._execute(self._cursor.execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._execute(self._cursor.executemany, sql, *args)
+
+    def _fetch(self, method, *args):
+        t0 = time.perf_counter()
+        result = method(*args)
+        self.fetch_time += time.perf_counter() - t0
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+
+__all__ = [
+    "SLOW_QUERY_MS",
+    "StatementTimer",
+    "TimedCursor",
+]
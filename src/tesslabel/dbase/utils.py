@@ -11,7 +11,9 @@
 
 import os
 import os.path
+import re
 import glob
+import hashlib
 import sqlite3
 
 # -------------------
@@ -26,7 +28,60 @@ import sqlite3
 # Module constants
 # ----------------
 
-VERSION_QUERY = "SELECT value from config_t WHERE section ='database' AND property = 'version'"
+# Current data model version. Must match the last script in the sql/updates directory
+DATABASE_VERSION = '11'
+
+# updates_digest() of the packaged sql/updates directory. Must be updated along with DATABASE_VERSION:
+# python -c "from tesslabel import SQL_UPDATES_DATA_DIR as d; from tesslabel.dbase.utils import updates_digest; print(updates_digest(d))"
+UPDATES_DIGEST = 'b2251510daaa23e686f326eb75d5babf00daf621d70ca11bf65486296785fa84'
+
+CONFIG_QUERY = "SELECT section, property, value FROM config_t"
+
+LEDGER_QUERY = "SELECT name, checksum FROM migrations_t"
+
+LEDGER_INSERT = "INSERT OR REPLACE INTO migrations_t(name, checksum, applied_at) VALUES (:name, :checksum, datetime('now'))"
+
+DIGEST_INSERT = "INSERT OR REPLACE INTO config_t(section, property, value) VALUES ('database', 'updates_digest', :digest)"
+
+# SQLite pragmas handled by the performance profiles, in the order they are applied.
+PRAGMA_NAMES = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+# Named performance profiles, selected by the ('database', 'profile') entry in config_t.
+# Any single pragma can be overriden by a non NULL ('database', <pragma name>) entry in config_t.
+# cache_size is given in KiB when negative, mmap_size in bytes and busy_timeout in milliseconds.
+PRAGMA_PROFILES = {
+    # SQLite defaults. Rollback journal with full syncs.
+    'safe': {
+        'journal_mode': 'DELETE',
+        'synchronous' : 'FULL',
+        'cache_size'  : -2000,
+        'mmap_size'   : 0,
+        'temp_store'  : 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    # WAL journal. Concurrent readers and cheap commits, still durable across application crashes.
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous' : 'NORMAL',
+        'cache_size'  : -16000,
+        'mmap_size'   : 67108864,
+        'temp_store'  : 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # WAL journal without syncs. Last transactions may be lost on power failure.
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous' : 'OFF',
+        'cache_size'  : -64000,
+        'mmap_size'   : 268435456,
+        'temp_store'  : 'MEMORY',
+        'busy_timeout': 10000,
+    },
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
 
 # -----------------------
 # Module global variables
@@ -36,20 +91,57 @@ VERSION_QUERY = "SELECT value from config_t WHERE section ='database' AND proper
 # Module Utility Functions
 # ------------------------
 
-def _filter_factory(connection):
-    cursor = connection.cursor()
-    cursor.execute(VERSION_QUERY)
-    result = cursor.fetchone()
-    if not result:
-        raise NotImplementedError(VERSION_QUERY)
-    version = int(result[0])
-    return lambda path: int(os.path.basename(path)[:2]) > version
+def _read_script(path):
+    with open(path) as f:
+        script = f.read()
+    return script, hashlib.sha256(script.encode('utf-8')).hexdigest()
+
+
+def _read_ledger(connection):
+    try:
+        rows = connection.execute(LEDGER_QUERY).fetchall()
+    except sqlite3.OperationalError:
+        rows = list()   # Databases prior to the ledger
+    return dict(rows)
+
+
+def _script_version(path):
+    return int(os.path.basename(path)[:2])
 
 
 # -------------------------
 # Module exported functions
 # -------------------------
 
+def make_pragmas(config):
+    '''Build the pragmas dictionary from the 'database' section properties'''
+    profile = config.get('profile') or DEFAULT_PROFILE
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'")
+    pragmas = dict(PRAGMA_PROFILES[profile])
+    pragmas.update({name: config[name] for name in PRAGMA_NAMES if config.get(name) is not None})
+    return pragmas
+
+
+def apply_pragmas(connection, pragmas, read_only=False):
+    '''
+    Apply the performance pragmas to a connection.
+    Suitable as adbapi's cp_openfun through functools.partial()
+    journal_mode is skipped for read only connections, as it is a persistent database setting.
+    '''
+    if connection.in_transaction:
+        connection.commit() # journal mode cannot be changed inside a transaction
+    cursor = connection.cursor()
+    for name in PRAGMA_NAMES:
+        value = pragmas.get(name)
+        if value is None or (read_only and name == 'journal_mode'):
+            continue
+        value = str(value)
+        if not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"Invalid value '{value}' for PRAGMA {name}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
 
 def create_database(dbase_path):
     '''Creates a Database file if not exists and returns a connection'''
@@ -62,44 +154,113 @@ def create_database(dbase_path):
         with open(dbase_path, 'w') as f:
             pass
         new_database = True
-    return sqlite3.connect(dbase_path), new_database
+    connection = sqlite3.connect(dbase_path)
+    if new_database:
+        # Must be set before any table is created. Lets maintenance give back free pages in small steps
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    return connection, new_database
 
 
-def create_schema(connection, schema_path, initial_data_dir_path, updates_data_dir, query=VERSION_QUERY):
-    created = True
-    cursor = connection.cursor()
+def read_configuration(connection):
+    '''
+    Returns the whole configuration indexed by section 
+    or None if the data model has not been created yet.
+    '''
     try:
-        cursor.execute(query)
-    except Exception:
-        created = False
-    if not created:
-        with open(schema_path) as f: 
-            lines = f.readlines() 
-        script = ''.join(lines)
+        rows = connection.execute(CONFIG_QUERY).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    configuration = dict()
+    for section, property, value in rows:
+        configuration.setdefault(section, {})[property] = value
+    return configuration
+
+
+def create_schema(connection, schema_path, initial_data_dir_path, updates_data_dir, configuration):
+    '''
+    Creates the data model or brings it up to DATABASE_VERSION.
+    configuration is the result of read_configuration(). When the database
+    is already current, this does not touch either the database or the file system.
+    Returns a tuple (just created flag, list of SQL files executed)
+    '''
+    if configuration is not None:
+        version = int(configuration['database']['version'])
+        if version >= int(DATABASE_VERSION):
+            return False, []
+    updates = sorted(glob.glob(os.path.join(updates_data_dir, '*.sql')))
+    if configuration is None:
+        script, _ = _read_script(schema_path)
         connection.executescript(script)
-        #log.info("Created data model from {0}".format(os.path.basename(schema_path)))
-        file_list = glob.glob(os.path.join(initial_data_dir_path, '*.sql'))
+        file_list = sorted(glob.glob(os.path.join(initial_data_dir_path, '*.sql')))
         for sql_file in file_list:
-            #log.info("Populating data model from {0}".format(os.path.basename(sql_file)))
-            with open(sql_file) as f: 
-                lines = f.readlines() 
-            script = ''.join(lines)
+            script, _ = _read_script(sql_file)
             connection.executescript(script)
+        # The updates are already part of the schema and initial data
+        ledger = [{'name': os.path.basename(path), 'checksum': _read_script(path)[1]} for path in updates]
     else:
-        filter_func = _filter_factory(connection)
-        file_list = sorted(glob.glob(os.path.join(updates_data_dir, '*.sql')))
-        file_list = list(filter(filter_func,file_list))
-        for sql_file in file_list:
-            #log.info("Applying updates to data model from {0}".format(os.path.basename(sql_file)))
-            with open(sql_file) as f: 
-                lines = f.readlines() 
-            script = ''.join(lines)
-            connection.executescript(script)
+        applied = _read_ledger(connection)
+        file_list = list()
+        ledger = list()
+        for sql_file in updates:
+            name = os.path.basename(sql_file)
+            if name in applied:
+                continue
+            script, checksum = _read_script(sql_file)
+            if _script_version(sql_file) > version:
+                connection.executescript(script)
+                file_list.append(sql_file)
+            ledger.append({'name': name, 'checksum': checksum}) # either applied now or before the ledger existed
+    connection.executemany(LEDGER_INSERT, ledger)
     connection.commit()
-    return not created, file_list
+    return configuration is None, file_list
+
+
+def verify_migrations(connection, updates_data_dir):
+    '''Returns the names of applied SQL update files whose contents changed since they were applied'''
+    applied = _read_ledger(connection)
+    changed = list()
+    for sql_file in sorted(glob.glob(os.path.join(updates_data_dir, '*.sql'))):
+        name = os.path.basename(sql_file)
+        if name in applied and applied[name] != _read_script(sql_file)[1]:
+            changed.append(name)
+    return changed
+
+
+def updates_digest(updates_data_dir):
+    '''Digest of the SQL update files names and checksums, as in the migrations ledger'''
+    digest = hashlib.sha256()
+    for sql_file in sorted(glob.glob(os.path.join(updates_data_dir, '*.sql'))):
+        digest.update(f"{os.path.basename(sql_file)}:{_read_script(sql_file)[1]};".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def check_migrations(connection, updates_data_dir, configuration):
+    '''
+    verify_migrations() only when UPDATES_DIGEST, the digest of the packaged
+    update files, differs from ('database', 'updates_digest') in config_t,
+    that is, on the first start after an upgrade. Otherwise neither the
+    database nor the file system are touched.
+    Returns the names of the changed files.
+    '''
+    if configuration['database'].get('updates_digest') == UPDATES_DIGEST:
+        return []
+    changed = verify_migrations(connection, updates_data_dir)
+    if not changed and updates_digest(updates_data_dir) == UPDATES_DIGEST:
+        # Changed files, or files not matching a stale UPDATES_DIGEST, are checked on every start
+        connection.execute(DIGEST_INSERT, {'digest': UPDATES_DIGEST})
+        connection.commit()
+    return changed
 
   
 __all__ = [
+    "DATABASE_VERSION",
     "create_database",
+    "read_configuration",
     "create_schema",
+    "verify_migrations",
+    "UPDATES_DIGEST",
+    "updates_digest",
+    "check_migrations",
+    "make_pragmas",
+    "apply_pragmas",
 ]
@@ -0,0 +1,250 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+ZIP entries compressed ahead of time.
+
+zipfile compresses entries while they are written, one at a time, since a
+ZipFile accepts a single writer. Here entries are compressed by compress()
+in any worker thread (zlib, bz2 and lzma release the GIL) and the ready made
+payloads are then appended to the archive by append(), which only copies
+bytes. The resulting archives are regular ZIP files, the payloads being
+produced by the very same zipfile compressors.
+
+zipfile has no public API to append a compressed payload, so this relies
+on its internals. RAW_VERSIONS only lists the Python versions on which
+bench/check_zip.py verified that the resulting archives pass testzip()
+and are byte identical to the ones written by writestr(). Elsewhere, or
+if any of those internals is missing, compress() leaves the data as is
+and append() writes it with ZipFile.writestr(), which then compresses it
+in the appending thread. Stored entries always go through
+writestr().
+
+Large entries are written through an EntryStream instead, which compresses
+its contents as they are written into a file (usually a spooled temporary
+file), so that neither the entry contents nor its payload are ever held
+in memory as a whole. append() then copies the payload from that file.
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import io
+import sys
+import zlib
+import hashlib
+import zipfile
+import datetime
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel import TSTAMP_SESSION_FMT
+
+# ----------------
+# Module constants
+# ----------------
+
+CODEC_STORED  = 'stored'
+CODEC_DEFLATE = 'deflate'
+CODEC_BZIP2   = 'bzip2'
+CODEC_LZMA    = 'lzma'
+
+CODECS = {
+    CODEC_STORED : zipfile.ZIP_STORED,
+    CODEC_DEFLATE: zipfile.ZIP_DEFLATED,
+    CODEC_BZIP2  : zipfile.ZIP_BZIP2,
+    CODEC_LZMA   : zipfile.ZIP_LZMA,
+}
+
+DEFAULT_CODEC = CODEC_DEFLATE
+
+# Valid compression levels per codec, None meaning the codec default
+LEVELS = {
+    CODEC_STORED : (),
+    CODEC_DEFLATE: tuple(range(0, 10)),
+    CODEC_BZIP2  : tuple(range(1, 10)),
+    CODEC_LZMA   : (),
+}
+
+# Entries already compressed by their own format are always stored
+COMPRESSED_EXTENSIONS = ('.parquet', '.tsc', '.zip', '.gz')
+
+# Earliest date_time a ZIP entry can hold, also used when none is given
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Bytes copied at a time by append() from a payload file
+COPY_SIZE = 1024 * 1024
+
+# General purpose flag bit 1, as zipfile sets it for LZMA entries
+_MASK_COMPRESS_OPTION_1 = 0x02
+
+# Python versions verified with bench/check_zip.py: [first, last)
+RAW_VERSIONS = ((3, 11), (3, 12))
+
+# Whether the zipfile internals append() relies on are there at all
+_INTERNALS = hasattr(zipfile, '_get_compressor') and \
+    hasattr(zipfile.ZipInfo, 'FileHeader') and \
+    hasattr(zipfile.ZipFile, '_writecheck')
+
+# Whether entries can be compressed ahead of time
+RAW = _INTERNALS and RAW_VERSIONS[0] <= sys.version_info[:2] < RAW_VERSIONS[1]
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def check(codec, level=None):
+    '''Validates a codec name and level, raising ValueError otherwise'''
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec}, choose from {', '.join(CODECS)}")
+    if level is not None and level not in LEVELS[codec]:
+        raise ValueError(f"Invalid compression level {level} for {codec}")
+
+
+def date_time(tstamp):
+    '''ZIP entry date_time of a timestamp such as a batch end_tstamp'''
+    value = datetime.datetime.strptime(tstamp[:19], TSTAMP_SESSION_FMT)
+    return max(value.timetuple()[:6], ZIP_EPOCH)
+
+
+def _info(name, codec, date_time):
+    '''ZipInfo of an entry, with no sizes nor CRC yet'''
+    if name.endswith(COMPRESSED_EXTENSIONS):
+        codec = CODEC_STORED
+    info = zipfile.ZipInfo(name, date_time=date_time)
+    info.compress_type = CODECS[codec]
+    info.external_attr = 0o600 << 16
+    if info.compress_type == zipfile.ZIP_LZMA:
+        # Compressed data includes an end-of-stream (EOS) marker
+        info.flag_bits |= _MASK_COMPRESS_OPTION_1
+    return info
+
+
+def _compressor(info, level):
+    '''Ahead of time compressor of an entry, None if append() compresses it'''
+    if info.compress_type == zipfile.ZIP_STORED or not RAW:
+        return None
+    return zipfile._get_compressor(info.compress_type, level)
+
+
+def compress(name, data, codec=DEFAULT_CODEC, level=None, date_time=ZIP_EPOCH):
+    '''
+    Compresses data as the ZIP entry name, dated date_time. Thread safe.
+    Returns (ZipInfo, payload) to be given to append(). Without RAW support,
+    the payload is the data itself, to be compressed by append()
+    '''
+    info = _info(name, codec, date_time)
+    info.file_size = len(data)
+    info.CRC = zlib.crc32(data)
+    compressor = _compressor(info, level)
+    if compressor is None:
+        payload = bytes(data)
+    else:
+        payload = compressor.compress(data) + compressor.flush()
+    info.compress_size = len(payload)
+    return info, payload
+
+
+def append(archive, info, payload):
+    '''
+    Appends an entry compressed by compress() or an EntryStream to an archive
+    opened for writing. payload is either bytes or a binary file positioned
+    at the start of the payload, copied COPY_SIZE bytes at a time.
+    Not thread safe: an archive must be appended to by one thread at a time.
+    Returns the number of bytes written for the entry.
+    Without RAW support, entries are compressed with the archive compresslevel.
+    '''
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = io.BytesIO(payload)
+    if info.compress_type == zipfile.ZIP_STORED or not RAW:
+        # Same as ZipFile.writestr(), but without the whole data in memory
+        info._compresslevel = archive.compresslevel
+        with archive.open(info, 'w') as entry:
+            _copy(payload, entry, info.file_size)
+        return info.compress_size
+    if archive._writing:
+        raise ValueError("Can't write to the ZIP file while there is another write handle open on it")
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+    if zip64 and not archive._allowZip64:
+        raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+    archive._writecheck(info)
+    archive._didModify = True
+    archive.fp.seek(archive.start_dir)
+    info.header_offset = archive.fp.tell()
+    archive.fp.write(info.FileHeader(zip64))
+    _copy(payload, archive.fp, info.compress_size)
+    archive.start_dir = archive.fp.tell()
+    archive.filelist.append(info)
+    archive.NameToInfo[info.filename] = info
+    return info.compress_size
+
+
+def _copy(source, destination, size):
+    while size > 0:
+        data = source.read(min(size, COPY_SIZE))
+        if not data:
+            raise EOFError(f"ZIP entry payload is {size} bytes short")
+        destination.write(data)
+        size -= len(data)
+
+# --------------
+# Module Classes
+# --------------
+
+class EntryStream(io.RawIOBase):
+    '''
+    Write only binary stream of a ZIP entry contents, compressed ahead of
+    time like compress() does and written to fd as they arrive. The payload
+    starts at offset in fd. Contents are copied to mirror too, if given.
+    Once closed, info is complete and sha256 holds the contents digest,
+    and both are given to append() with fd positioned at offset.
+    '''
+
+    def __init__(self, fd, name, codec=DEFAULT_CODEC, level=None, date_time=ZIP_EPOCH, mirror=None):
+        super().__init__()
+        self.info = _info(name, codec, date_time)
+        self.info.file_size = 0
+        self.info.CRC = 0
+        self.offset = fd.tell()
+        self.sha256 = hashlib.sha256()
+        self._fd = fd
+        self._mirror = mirror
+        self._compressor = _compressor(self.info, level)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.info.file_size += len(data)
+        self.info.CRC = zlib.crc32(data, self.info.CRC)
+        self.sha256.update(data)
+        if self._mirror is not None:
+            self._mirror.write(data)
+        self._fd.write(data if self._compressor is None else self._compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed and self._compressor is not None:
+            self._fd.write(self._compressor.flush())
+        if not self.closed:
+            self.info.compress_size = self._fd.tell() - self.offset
+        super().close()
+
+
+__all__ = [
+    "RAW",
+    "CODECS",
+    "DEFAULT_CODEC",
+    "check",
+    "date_time",
+    "compress",
+    "append",
+    "EntryStream",
+]
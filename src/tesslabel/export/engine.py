@@ -0,0 +1,606 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import io
+import os
+import csv
+import time
+import shutil
+import hashlib
+import sqlite3
+import zipfile
+import tempfile
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.python.failure import Failure
+from twisted.internet.defer import Deferred, DeferredSemaphore, inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+from tesslabel.dbase.utils import apply_pragmas
+from tesslabel.dbase.stream import CHUNK_SIZE
+from tesslabel.dbase.archive import SQL_ARCHIVES, attach_archives
+from tesslabel.export import NAMESPACE, log
+from tesslabel.export import columnar, compress
+from tesslabel.export.compress import DEFAULT_CODEC, COPY_SIZE, EntryStream
+from tesslabel.export.progress import ExportProgress, PHASE_PLAN, PHASE_ENCODE, PHASE_FINISH
+from tesslabel.export.columnar import FORMAT_CSV, FORMAT_COLUMNAR
+
+# ----------------
+# Module constants
+# ----------------
+
+SUMMARY_HEADERS = ("Model","Name","Timestamp","Magnitud TESS.","Frecuencia","Magnitud Referencia",
+                    "Frec Ref","MagDiff vs stars3","ZP (raw)", "Extra offset", "Final ZP", "Station MAC","OLD ZP",
+                    "Author","Firmware","Updated")
+
+ROUNDS_HEADERS = ("Model", "Name", "MAC", "Session (UTC)", "Role", "Round", "Freq (Hz)", "σ (Hz)", "Mag", "ZP", "# Samples","Δ T (s.)")
+
+SAMPLES_HEADERS = ("Model", "Name", "MAC", "Session (UTC)", "Role", "Round", "Timestamp", "Frequency", "Box Temperature", "Sequence #")
+
+# Index of the 'Updated' flag, exported as True/False
+UPDATED_COLUMN = SUMMARY_HEADERS.index("Updated")
+
+SQL_SUMMARY = '''
+    SELECT t.model, t.name, t.session, t.mag, t.freq, r.mag, r.freq, r.mag - t.mag,
+           t.zero_point - t.offset, t.offset, t.zero_point, t.mac, t.prev_zp, t.author, t.firmware, t.upd_flag
+    FROM summary_t AS t
+    JOIN summary_t AS r ON r.session = t.session AND r.role = 'ref'
+    WHERE t.role = 'test' AND t.session BETWEEN :begin_tstamp AND :end_tstamp
+    {updated}
+    ORDER BY t.session
+'''
+
+SQL_SESSIONS = '''
+    SELECT session, name
+    FROM summary_t
+    WHERE role = 'test' AND session BETWEEN :begin_tstamp AND :end_tstamp
+    {updated}
+    ORDER BY session
+'''
+
+# Set based queries for a whole batch, ordered so that they can be split by
+# session while streaming. Within a session the order matches the historical
+# per session exports: test rounds then reference rounds, and for each round
+# test samples followed by reference samples
+
+SQL_BATCH_SESSIONS = '''
+    SELECT session FROM summary_t
+    WHERE role = 'test' AND session BETWEEN :begin_tstamp AND :end_tstamp
+    {updated}
+'''
+
+SQL_ROUNDS = '''
+    SELECT s.model, s.name, s.mac, r.session, r.role, r.round, r.freq, r.stddev, r.mag, r.zero_point, r.nsamples, r.duration
+    FROM rounds_t AS r
+    JOIN summary_t AS s USING(session, role)
+    WHERE r.session IN ({sessions})
+    ORDER BY r.session, r.role DESC, r.round
+'''
+
+SQL_SAMPLES = '''
+    SELECT s.model, s.name, s.mac, r.session, r.role, r.round, u.tstamp, u.freq, u.temp_box, u.seq
+    FROM rounds_t  AS r
+    JOIN summary_t AS t ON t.session = r.session AND t.role = 'test' AND r.round <= t.nrounds
+    JOIN summary_t AS s ON s.session = r.session AND s.role = r.role
+    JOIN samples_t AS u ON u.role = r.role AND u.session = r.session AND u.tstamp BETWEEN r.begin_tstamp AND r.end_tstamp
+    WHERE r.session IN ({sessions})
+    ORDER BY r.session, r.round, r.role DESC, u.tstamp
+'''
+
+# Session column in rounds and samples rows
+SESSION_COLUMN = 3
+
+# Per session data fingerprints, used to tell which sessions changed since
+# their last export. Rounds are few and fingerprinted in full, samples
+# through aggregates plus their highest rowid (the high-water mark),
+# NULL for archived batches as their views have no rowid
+
+SQL_FINGERPRINT_SUMMARY = '''
+    SELECT session, * FROM summary_t
+    WHERE session BETWEEN :begin_tstamp AND :end_tstamp
+    ORDER BY session, role
+'''
+
+SQL_FINGERPRINT_ROUNDS = '''
+    SELECT session, group_concat(quote(role) || quote(round) || quote(begin_tstamp) || quote(end_tstamp) ||
+        quote(freq) || quote(stddev) || quote(mag) || quote(zero_point) || quote(nsamples) || quote(duration), '|')
+    FROM (SELECT * FROM rounds_t WHERE session BETWEEN :begin_tstamp AND :end_tstamp ORDER BY session, role, round)
+    GROUP BY session
+'''
+
+SQL_FINGERPRINT_SAMPLES = '''
+    SELECT session, max(rowid), count(*), total(freq), total(temp_box), total(seq), min(tstamp), max(tstamp)
+    FROM samples_t
+    WHERE session BETWEEN :begin_tstamp AND :end_tstamp
+    GROUP BY session
+'''
+
+SQL_MANIFEST = '''
+    SELECT session, entry, sha256, size, fingerprint
+    FROM export_manifest_t
+    WHERE format = :format AND session BETWEEN :begin_tstamp AND :end_tstamp
+    ORDER BY session, position
+'''
+
+UPDATED_FILTER = "AND {alias}upd_flag = 1"
+
+# Default number of work units encoded concurrently
+PARALLELISM = min(4, os.cpu_count() or 1)
+
+# Sessions per work unit. Units have a fixed size, whatever the batch size,
+# so that the memory taken by an export does not grow with the batch
+SESSIONS_PER_UNIT = 8
+
+# Bytes of a work unit compressed entries kept in memory, the rest being
+# spilled to a temporary file
+SPOOL_SIZE = 4 * 1024 * 1024
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def condensed(text):
+    '''Timestamps without '-' and ':' for file names'''
+    return text.replace('-','').replace(':','')
+
+def archive_name(begin_tstamp, end_tstamp):
+    return condensed(f"from_{begin_tstamp}_to_{end_tstamp}") + '.zip'
+
+def summary_name(begin_tstamp, end_tstamp):
+    return condensed(f"summary_from_{begin_tstamp}_to_{end_tstamp}.csv")
+
+def rounds_name(name, session):
+    return condensed(f"{name}_rounds_{session}.csv")
+
+def samples_name(name, session, extension='.csv'):
+    return condensed(f"{name}_samples_{session}{extension}")
+
+def chunks(items, size):
+    '''Splits items in contiguous groups of size items, the last one possibly shorter'''
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+# --------------
+# Module Classes
+# --------------
+
+class SessionSplitter:
+    '''
+    Splits a stream of rows ordered by session into per session streams,
+    keeping a single row of lookahead. Sessions must be requested in order.
+    count holds the number of rows taken so far.
+    '''
+
+    def __init__(self, rows, column=SESSION_COLUMN):
+        self._rows = iter(rows)
+        self._column = column
+        self._next = next(self._rows, None)
+        self.count = 0
+
+    def take(self, session):
+        '''Yields the rows of session, skipping those of previous sessions'''
+        while self._next is not None and self._next[self._column] < session:
+            self._next = next(self._rows, None)
+        while self._next is not None and self._next[self._column] == session:
+            self.count += 1
+            yield self._next
+            self._next = next(self._rows, None)
+
+
+class BatchExporter:
+    '''
+    Exports a batch calibration data (summary, rounds and samples CSV files)
+    into a ZIP archive. Sessions are split into work units of
+    SESSIONS_PER_UNIT consecutive sessions, encoded and compressed
+    concurrently in worker threads, each unit over its own read only
+    connection, at most 'parallelism' units at a time (DeferredSemaphore).
+    Rows are fetched chunk by chunk and every entry is compressed as it is
+    written into the unit spooled temporary file, which keeps at most
+    SPOOL_SIZE bytes in memory. Encoded units are appended to the archive
+    strictly in session order, so the output does not depend on the
+    parallelism. A unit keeps its semaphore slot until written, so the
+    memory taken by an export is bounded by parallelism * SPOOL_SIZE (plus
+    one session samples when exported as columnar files), whatever the
+    batch size.
+    The archive is written under a temporary name and renamed when complete,
+    so a failed export never leaves a truncated ZIP behind.
+
+    Exports are incremental: export_manifest_t records, per session, the
+    entries SHA-256 and a fingerprint of the session data, while the entries
+    themselves are kept in a content addressed cache directory. Sessions whose
+    fingerprint did not change are copied from the cache instead of being
+    queried and encoded again.
+
+    Batches moved to archive databases (see BatchArchiver) are exported
+    too: every connection attaches the archives overlapping the exported
+    range, whose rows then show up through the live table names.
+
+    Progress is published as 'export_progress' events (see ExportProgress)
+    and the timings of every successful export are logged in export_log_t.
+    '''
+
+    def __init__(self, pool, parallelism=PARALLELISM, codec=DEFAULT_CODEC, level=None, cache_dir=None, chunk_size=CHUNK_SIZE, log_level='info'):
+        self._pool = pool
+        self._chunk_size = chunk_size
+        self.parallelism = parallelism
+        self.codec = codec
+        self.level = level
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(pool.path)), 'export_cache')
+        self._cache_dir = cache_dir
+        setLogLevel(namespace=NAMESPACE, levelStr=log_level)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def export(self, begin_tstamp, end_tstamp, updated, zip_path, samples_format=FORMAT_CSV, full=False):
+        '''
+        Exports sessions between begin_tstamp and end_tstamp, only those
+        whose zero point was written to the photometer if updated is True.
+        Samples are written as CSV or columnar files depending on samples_format.
+        Unchanged sessions are taken from the export cache unless full is True.
+        Entries are compressed with the exporter codec and level attributes
+        and dated end_tstamp.
+        Returns a Deferred with the number of sessions exported.
+        '''
+        tmp_path = zip_path + '.part'
+        log.info("Creating ZIP File: '{name}'", name=os.path.basename(zip_path))
+        if samples_format not in columnar.FORMATS:
+            raise ValueError(f"Unknown samples format: {samples_format}")
+        compress.check(self.codec, self.level)
+        # Every entry is dated at the end of the exported range, so that
+        # exporting the same data again gives the same archive
+        compression = (self.codec, self.level, compress.date_time(end_tstamp))
+        progress = ExportProgress()
+        progress.start(PHASE_PLAN)
+        try:
+            archive, sessions, plan, progress.bytes, archives = yield deferToThread(self._open, begin_tstamp, end_tstamp, updated, samples_format, compression, full, tmp_path)
+        except BaseException:
+            progress.end(failed=True)
+            raise
+        manifest = list()
+        try:
+            progress.total = len(sessions)
+            progress.start(PHASE_ENCODE)
+            units = chunks(sessions, SESSIONS_PER_UNIT)
+            semaphore = DeferredSemaphore(max(1, self.parallelism))
+            turns = [Deferred() for i in range(len(units) + 1)]
+            turns[0].callback(0)
+            for i, unit in enumerate(units):
+                semaphore.run(self._unit, archive, archives, unit, updated, samples_format, compression, plan, manifest, turns[i], turns[i+1], progress)
+            yield turns[-1]
+            progress.start(PHASE_FINISH)
+            yield deferToThread(self._close, archive, tmp_path, zip_path)
+        except BaseException:
+            progress.end(failed=True)
+            yield deferToThread(self._abort, archive, tmp_path)
+            raise
+        cached = len(sessions) - len(set(row['session'] for row in manifest))
+        if manifest:
+            yield self._pool.runInteraction(self._writeManifest, manifest)
+            obsolete = set(entry[1] for session in set(row['session'] for row in manifest) for entry in plan[session][2])
+            obsolete -= set(row['sha256'] for row in manifest)
+            if obsolete:
+                yield deferToThread(self._prune, obsolete)
+        progress.end()
+        log.info("Exported {n} sessions ({cached} from the export cache), {rows} rows, {nbytes} bytes in {elapsed:.2f} s.",
+            n=len(sessions), cached=cached, rows=progress.rows, nbytes=progress.bytes, elapsed=progress.elapsed())
+        yield self._pool.runInteraction(self._writeLog, {
+            'begin_tstamp': begin_tstamp, 'end_tstamp': end_tstamp,
+            'started_at'  : progress.started_at.strftime('%Y-%m-%dT%H:%M:%S'),
+            'format'      : samples_format, 'codec': self.codec, 'parallelism': self.parallelism,
+            'sessions'    : len(sessions), 'cached': cached, 'nrows': progress.rows, 'nbytes': progress.bytes,
+            'plan_ms'     : 1000 * progress.timings[PHASE_PLAN],
+            'encode_ms'   : 1000 * progress.timings[PHASE_ENCODE],
+            'finish_ms'   : 1000 * progress.timings[PHASE_FINISH],
+            'total_ms'    : 1000 * progress.elapsed(),
+        })
+        return len(sessions)
+
+    def configure(self, section):
+        '''Sets parallelism, codec and level from the ('export', ...) config_t properties'''
+        self.parallelism = int(section.get('parallelism') or PARALLELISM)
+        self.codec = section.get('compression') or DEFAULT_CODEC
+        level = section.get('compression_level')
+        self.level = int(level) if level is not None else None
+
+    def history(self, limit=20):
+        '''Returns a Deferred with the latest export timings as dictionaries, newest first'''
+        return self._pool.runReadInteraction(self._readLog, limit)
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    @inlineCallbacks
+    def _unit(self, archive, archives, sessions, updated, samples_format, compression, plan, manifest, turn, following, progress):
+        # Never fails: any failure is passed along the chain of turns,
+        # but only after the previous units have been written
+        failure = None
+        spool = None
+        try:
+            spool, entries, rows, nrows = yield deferToThread(self._encode, archives, sessions, updated, samples_format, compression, plan)
+            manifest.extend(rows)
+        except Exception:
+            failure = Failure()
+        try:
+            done = yield turn
+        except Exception:
+            failure = failure or Failure()
+        if failure is None:
+            try:
+                nbytes = yield deferToThread(self._append, archive, spool, entries)
+            except Exception:
+                failure = Failure()
+        if spool is not None:
+            spool.close()
+        if failure is not None:
+            following.errback(failure)
+            return
+        progress.advance(len(sessions), nrows, nbytes)
+        status = progress.snapshot()
+        log.debug("Calibrations exported [{done}/{total}] {rps:.0f} rows/s, {nbytes} bytes, ETA {eta:.1f} s.",
+            done=status['done'], total=status['total'], rps=status['rows_per_s'], nbytes=status['bytes'], eta=status['eta'] or 0.0)
+        following.callback(status['done'])
+
+    def _connect(self, archives=()):
+        connection = sqlite3.connect(self._pool.uri, uri=True)
+        if self._pool.pragmas:
+            apply_pragmas(connection, self._pool.pragmas, read_only=True)
+        if archives:
+            attach_archives(connection.cursor(), archives)
+        return connection
+
+    def _open(self, begin_tstamp, end_tstamp, updated, samples_format, compression, full, tmp_path):
+        # Runs in a worker thread
+        params = {'begin_tstamp': begin_tstamp, 'end_tstamp': end_tstamp, 'format': samples_format}
+        connection = self._connect()
+        # The compression level only applies here without compress.RAW
+        archive = zipfile.ZipFile(tmp_path, 'w', compresslevel=compression[1])
+        try:
+            archives = [path for (path,) in connection.execute(SQL_ARCHIVES, params)]
+            if archives:
+                log.info("Exporting {n} archived batches too", n=len(archives))
+                attach_archives(connection.cursor(), archives)
+            rows = self._query(connection, SQL_SUMMARY.format(updated=self._updated(updated, 't.')), params)
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+                with EntryStream(spool, summary_name(begin_tstamp, end_tstamp), *compression) as stream:
+                    self._csv(stream, SUMMARY_HEADERS, self._summary(rows))
+                nbytes = self._append(archive, spool, [(stream.info, stream.offset)])
+            sessions = connection.execute(SQL_SESSIONS.format(updated=self._updated(updated)), params).fetchall()
+            plan = self._plan(connection, params, full)
+        except BaseException:
+            self._abort(archive, tmp_path)
+            raise
+        finally:
+            connection.close()
+        return archive, sessions, plan, nbytes, archives
+
+    def _plan(self, connection, params, full):
+        '''Returns {session: (fingerprint, high_water, [(entry, sha256, size), ...], unchanged)}'''
+        hashes = dict()
+        for row in connection.execute(SQL_FINGERPRINT_SUMMARY, params):
+            hashes.setdefault(row[0], hashlib.sha256()).update(repr(row).encode('utf-8'))
+        for session, rounds in connection.execute(SQL_FINGERPRINT_ROUNDS, params):
+            hashes.setdefault(session, hashlib.sha256()).update(repr(rounds).encode('utf-8'))
+        high_water = dict()
+        for row in connection.execute(SQL_FINGERPRINT_SAMPLES, params):
+            hashes.setdefault(row[0], hashlib.sha256()).update(repr(row[1:]).encode('utf-8'))
+            high_water[row[0]] = row[1]
+        exported = dict()
+        for session, entry, sha256, size, fingerprint in connection.execute(SQL_MANIFEST, params):
+            exported.setdefault(session, (fingerprint, list()))[1].append((entry, sha256, size))
+        plan = dict()
+        for session, h in hashes.items():
+            fingerprint = h.hexdigest()
+            previous, entries = exported.get(session, (None, []))
+            plan[session] = (fingerprint, high_water.get(session), entries, not full and previous == fingerprint)
+        return plan
+
+    def _encode(self, archives, sessions, updated, samples_format, compression, plan):
+        # Runs in a worker thread. Writes the rounds and samples files of a
+        # unit of consecutive sessions, compressed, into a spooled temporary
+        # file, copying the unchanged sessions from the cache. Returns the
+        # spool, the entries as [(ZipInfo, offset in the spool), ...], the
+        # manifest rows of the sessions encoded again and the number of
+        # rounds and samples rows encoded
+        extension = columnar.extension() if samples_format == FORMAT_COLUMNAR else '.csv'
+        reused = set()
+        for session, name in sessions:
+            fingerprint, high_water, cached, unchanged = plan[session]
+            names = [rounds_name(name, session), samples_name(name, session, extension)]
+            if unchanged and [entry[0] for entry in cached] == names and self._cached(cached):
+                reused.add(session)
+        missing = [(session, name) for session, name in sessions if session not in reused]
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        entries = list()
+        manifest = list()
+        nrows = 0
+        connection = None
+        try:
+            if missing:
+                params = {'begin_tstamp': missing[0][0], 'end_tstamp': missing[-1][0]}
+                selected = SQL_BATCH_SESSIONS.format(updated=self._updated(updated))
+                connection = self._connect(archives)
+                rounds = SessionSplitter(self._query(connection, SQL_ROUNDS.format(sessions=selected), params))
+                samples = SessionSplitter(self._query(connection, SQL_SAMPLES.format(sessions=selected), params))
+            for session, name in sessions:
+                if session in reused:
+                    streams = [self._entry(spool, entry, compression, self._copy, sha256) for entry, sha256, size in plan[session][2]]
+                else:
+                    streams = [self._entry(spool, rounds_name(name, session), compression, self._csv, ROUNDS_HEADERS, rounds.take(session), cache=True)]
+                    if samples_format == FORMAT_COLUMNAR:
+                        data = columnar.encode_samples(session, samples.take(session))
+                        streams.append(self._entry(spool, samples_name(name, session, extension), compression, EntryStream.write, data, cache=True))
+                    else:
+                        streams.append(self._entry(spool, samples_name(name, session), compression, self._csv, SAMPLES_HEADERS, samples.take(session), cache=True))
+                    manifest.extend(self._manifest(session, samples_format, plan[session], streams))
+                entries.extend((stream.info, stream.offset) for stream in streams)
+            if missing:
+                nrows = rounds.count + samples.count
+        except BaseException:
+            spool.close()
+            raise
+        finally:
+            if connection is not None:
+                connection.close()
+        return spool, entries, manifest, nrows
+
+    def _entry(self, spool, name, compression, write, *args, cache=False):
+        '''
+        Writes an entry into the spool through write(stream, *args), and
+        into the cache too if cache is True. Returns its closed EntryStream
+        '''
+        if not cache:
+            with EntryStream(spool, name, *compression) as stream:
+                write(stream, *args)
+            return stream
+        os.makedirs(self._cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self._cache_dir)
+        try:
+            with open(fd, 'wb') as mirror, EntryStream(spool, name, *compression, mirror=mirror) as stream:
+                write(stream, *args)
+            path = os.path.join(self._cache_dir, stream.sha256.hexdigest())
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return stream
+
+    def _copy(self, stream, sha256):
+        '''Copies a cache file into a stream'''
+        with open(os.path.join(self._cache_dir, sha256), 'rb') as fd:
+            shutil.copyfileobj(fd, stream, COPY_SIZE)
+
+    def _cached(self, cached):
+        '''Whether every cached entry is present and sound, read chunk by chunk'''
+        for name, sha256, size in cached:
+            digest = hashlib.sha256()
+            nbytes = 0
+            try:
+                with open(os.path.join(self._cache_dir, sha256), 'rb') as fd:
+                    for data in iter(lambda: fd.read(COPY_SIZE), b''):
+                        digest.update(data)
+                        nbytes += len(data)
+            except OSError:
+                return False
+            if nbytes != size or digest.hexdigest() != sha256:
+                log.warn("Export cache entry {name} is corrupt", name=name)
+                return False
+        return True
+
+    def _manifest(self, session, samples_format, plan, streams):
+        '''Manifest rows of a session entries, as written to the cache'''
+        fingerprint, high_water, _, _ = plan
+        exported_at = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
+        return [{'session': session, 'format': samples_format, 'position': position, 'entry': stream.info.filename,
+            'sha256': stream.sha256.hexdigest(), 'size': stream.info.file_size, 'fingerprint': fingerprint,
+            'high_water': high_water, 'exported_at': exported_at} for position, stream in enumerate(streams)]
+
+    def _writeManifest(self, txn, rows):
+        txn.executemany("DELETE FROM export_manifest_t WHERE session = :session AND format = :format", rows)
+        txn.executemany('''
+            INSERT INTO export_manifest_t(session, format, position, entry, sha256, size, fingerprint, high_water, exported_at)
+            VALUES (:session, :format, :position, :entry, :sha256, :size, :fingerprint, :high_water, :exported_at)
+            ''', rows)
+
+    def _writeLog(self, txn, row):
+        txn.execute('''
+            INSERT INTO export_log_t(begin_tstamp, end_tstamp, started_at, format, codec, parallelism,
+                sessions, cached, nrows, nbytes, plan_ms, encode_ms, finish_ms, total_ms)
+            VALUES (:begin_tstamp, :end_tstamp, :started_at, :format, :codec, :parallelism,
+                :sessions, :cached, :nrows, :nbytes, :plan_ms, :encode_ms, :finish_ms, :total_ms)
+            ''', row)
+
+    def _readLog(self, txn, limit):
+        txn.execute("SELECT * FROM export_log_t ORDER BY id DESC LIMIT :limit", {'limit': limit})
+        columns = [description[0] for description in txn.description]
+        return [dict(zip(columns, row)) for row in txn.fetchall()]
+
+    def _prune(self, obsolete):
+        # Runs in a worker thread. Removes cache files no longer in the manifest
+        connection = self._connect()
+        try:
+            for sha256 in obsolete:
+                if connection.execute("SELECT 1 FROM export_manifest_t WHERE sha256 = :sha256 LIMIT 1", {'sha256': sha256}).fetchone():
+                    continue
+                try:
+                    os.remove(os.path.join(self._cache_dir, sha256))
+                except FileNotFoundError:
+                    pass
+        finally:
+            connection.close()
+
+    def _append(self, archive, spool, entries):
+        # Runs in a worker thread, one unit at a time. Returns the bytes written
+        nbytes = 0
+        for info, offset in entries:
+            spool.seek(offset)
+            nbytes += compress.append(archive, info, spool)
+            log.debug("Written {name} into the ZIP file", name=info.filename)
+        return nbytes
+
+    def _close(self, archive, tmp_path, zip_path):
+        archive.close()
+        os.replace(tmp_path, zip_path)
+
+    def _abort(self, archive, tmp_path):
+        try:
+            archive.close()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _updated(self, updated, alias=''):
+        return UPDATED_FILTER.format(alias=alias) if updated else ''
+
+    def _query(self, connection, sql, params):
+        '''Yields the result rows, fetching them chunk by chunk'''
+        cursor = connection.execute(sql, params)
+        while True:
+            chunk = cursor.fetchmany(self._chunk_size)
+            if not chunk:
+                break
+            yield from chunk
+
+    def _summary(self, rows):
+        for row in rows:
+            row = list(row)
+            row[UPDATED_COLUMN] = bool(row[UPDATED_COLUMN])
+            yield row
+
+    def _csv(self, stream, headers, rows):
+        '''Writes a CSV file into a binary stream, as UTF-8'''
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        writer = csv.writer(text, delimiter=';')
+        writer.writerow(headers)
+        writer.writerows(rows)
+        text.detach()
+
+
+__all__ = [
+    "PARALLELISM",
+    "BatchExporter",
+    "archive_name",
+]
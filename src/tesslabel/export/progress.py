@@ -0,0 +1,100 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import time
+import datetime
+
+# -------------------
+# Third party imports
+# -------------------
+
+from pubsub import pub
+
+# ----------------
+# Module constants
+# ----------------
+
+# Export phases, in order
+PHASE_PLAN   = 'plan'      # summary and change detection
+PHASE_ENCODE = 'encode'    # sessions encoding, compression and writing
+PHASE_FINISH = 'finish'    # ZIP file closing and manifest update
+PHASE_DONE   = 'done'
+PHASE_FAILED = 'failed'
+
+PHASES = (PHASE_PLAN, PHASE_ENCODE, PHASE_FINISH)
+
+# --------------
+# Module Classes
+# --------------
+
+class ExportProgress:
+    '''
+    Tracks an export phases, sessions, rows and bytes written. Every change
+    is published as an 'export_progress' event with a dictionary:
+    phase, done, total (sessions), rows, rows_per_s, bytes, elapsed and
+    eta (seconds, None while unknown). Must be used from the reactor thread.
+    '''
+
+    def __init__(self):
+        self.started_at = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None)
+        self.phase = None
+        self.total = 0
+        self.done = 0
+        self.rows = 0
+        self.bytes = 0
+        self.timings = {phase: 0.0 for phase in PHASES}
+        self._t0 = self._phase_t0 = time.monotonic()
+
+    def start(self, phase):
+        '''Ends the current phase, if any, and starts a new one'''
+        now = time.monotonic()
+        if self.phase in self.timings:
+            self.timings[self.phase] += now - self._phase_t0
+        self.phase, self._phase_t0 = phase, now
+        self.publish()
+
+    def advance(self, sessions, rows, nbytes):
+        self.done += sessions
+        self.rows += rows
+        self.bytes += nbytes
+        self.publish()
+
+    def end(self, failed=False):
+        self.start(PHASE_FAILED if failed else PHASE_DONE)
+
+    def elapsed(self):
+        return time.monotonic() - self._t0
+
+    def snapshot(self):
+        encoding = self.timings[PHASE_ENCODE]
+        if self.phase == PHASE_ENCODE:
+            encoding += time.monotonic() - self._phase_t0
+        eta = None
+        if self.phase == PHASE_ENCODE and self.done:
+            eta = encoding * (self.total - self.done) / self.done
+        return {
+            'phase'     : self.phase,
+            'done'      : self.done,
+            'total'     : self.total,
+            'rows'      : self.rows,
+            'rows_per_s': self.rows / encoding if encoding else 0.0,
+            'bytes'     : self.bytes,
+            'elapsed'   : self.elapsed(),
+            'eta'       : eta,
+        }
+
+    def publish(self):
+        pub.sendMessage('export_progress', progress=self.snapshot())
+
+
+__all__ = [
+    "ExportProgress",
+]
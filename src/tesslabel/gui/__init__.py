@@ -9,10 +9,8 @@
 # System wide imports
 # -------------------
 
-import os.path
-
-# Access SQL scripts withing the package
-from pkg_resources import resource_filename
+# Access resources withing the package
+from importlib.resources import files
 
 #--------------
 # local imports
@@ -23,19 +21,19 @@ from pkg_resources import resource_filename
 # ----------------
 
 # About Widget resources configuration
-ABOUT_DESC_TXT = resource_filename(__name__, os.path.join('resources', 'about', 'descr.txt'))
-ABOUT_ACK_TXT  = resource_filename(__name__, os.path.join('resources', 'about', 'ack.txt'))
-ABOUT_IMG      = resource_filename(__name__, os.path.join('resources', 'about', 'esfera192.png'))
+ABOUT_DESC_TXT = str(files(__name__).joinpath('resources/about/descr.txt'))
+ABOUT_ACK_TXT  = str(files(__name__).joinpath('resources/about/ack.txt'))
+ABOUT_IMG      = str(files(__name__).joinpath('resources/about/esfera192.png'))
 ABOUT_ICONS = (
-	('Universidad Complutense de Madrid', resource_filename(__name__, os.path.join('resources', 'about', 'ucm64.png'))),
-	('GUAIX', resource_filename(__name__, os.path.join('resources', 'about', 'guaix60.jpg'))),
-	('ACTION PROJECT EU', resource_filename(__name__, os.path.join('resources', 'about', 'stars4all64.png'))),
+	('Universidad Complutense de Madrid', str(files(__name__).joinpath('resources/about/ucm64.png'))),
+	('GUAIX', str(files(__name__).joinpath('resources/about/guaix60.jpg'))),
+	('ACTION PROJECT EU', str(files(__name__).joinpath('resources/about/stars4all64.png'))),
 )
 
-RED_ICON   = resource_filename(__name__, os.path.join('resources', 'photpanel', 'red64.png'))
-GRAY_ICON   = resource_filename(__name__, os.path.join('resources', 'photpanel', 'gray64.png'))
-YELLOW_ICON = resource_filename(__name__, os.path.join('resources', 'photpanel', 'yellow64.png'))
-GREEN_ICON  = resource_filename(__name__, os.path.join('resources', 'photpanel', 'green64.png'))
+RED_ICON   = str(files(__name__).joinpath('resources/photpanel/red64.png'))
+GRAY_ICON   = str(files(__name__).joinpath('resources/photpanel/gray64.png'))
+YELLOW_ICON = str(files(__name__).joinpath('resources/photpanel/yellow64.png'))
+GREEN_ICON  = str(files(__name__).joinpath('resources/photpanel/green64.png'))
 
 
 # Default falues for communication widgets
@@ -48,6 +48,7 @@ from tesslabel.gui.widgets.contrib import ToolTip
 from tesslabel.gui.widgets.mainpanel import PhotometerPanel, CalibrationPanel, BatchManagemetPanel
 from tesslabel.gui.widgets.about import AboutDialog
 from tesslabel.gui.widgets.writezp import WriteZeroPointDialog
+from tesslabel.gui.widgets.registry import RegistryDialog
 
 # ----------------
 # Module constants
@@ -143,6 +144,7 @@ class MenuBar(ttk.Frame):
         super().__init__(*args, **kwargs)
         self.build()
         self.preferences = None
+        self.registry = None
 
     def start(self):
         pass
@@ -172,6 +174,7 @@ class MenuBar(ttk.Frame):
         # Tools submenu
         tools_menu = tk.Menu(menu_bar, tearoff=False)
         tools_menu.add_command(label=_("Write Zero Point ..."), command=self.onMenuWriteZeroPoint)
+        tools_menu.add_command(label=_("Registered photometers ..."), command=self.onMenuRegistry)
         menu_bar.add_cascade(label=_("Tools"), menu=tools_menu)
       
         # About submenu
@@ -216,6 +219,12 @@ class MenuBar(ttk.Frame):
     def onMenuWriteZeroPoint(self):
         writezp = WriteZeroPointDialog()
 
+    def onMenuRegistry(self):
+        if self.registry is not None and self.registry.winfo_exists():
+            self.registry.lift()
+        else:
+            self.registry = RegistryDialog()
+
 
     
 
@@ -305,6 +314,16 @@ class StatusBar(ttk.Frame):
         widget.pack(side=tk.LEFT, fill=tk.X, padx=2, pady=2)
         ToolTip(widget, text=_("Was batch emailed?"))
 
+        self.activity = tk.StringVar()
+        widget = ttk.Label(self, textvariable=self.activity, justify=tk.LEFT, width=40, borderwidth=1, relief=tk.SUNKEN)
+        widget.pack(side=tk.LEFT, fill=tk.X, padx=2, pady=2)
+        ToolTip(widget, text=_("Batch export progress"))
+
+        self.outbox = tk.StringVar()
+        widget = ttk.Label(self, textvariable=self.outbox, justify=tk.LEFT, width=30, borderwidth=1, relief=tk.SUNKEN)
+        widget.pack(side=tk.LEFT, fill=tk.X, padx=2, pady=2)
+        ToolTip(widget, text=_("Email outbox: pending / sent / failed"))
+
     def clear(self):
         pass
 
@@ -314,3 +333,20 @@ class StatusBar(ttk.Frame):
         self.batch_end.set(f"Ended @ {batch_info['end_tstamp']}")
         self.batch_number.set(N if N else 0)
         self.emailed.set("Emailed" if batch_info['email_sent'] else "Not Emailed")
+
+    def setProgress(self, progress):
+        phase = progress['phase']
+        if phase == 'encode':
+            eta = f" ETA {progress['eta']:.0f}s" if progress['eta'] is not None else ''
+            text = f"Export {progress['done']}/{progress['total']} {progress['rows_per_s']/1000:.0f}k rows/s{eta}"
+        elif phase in ('done', 'failed'):
+            text = f"Export {phase} in {progress['elapsed']:.1f}s, {progress['bytes']/2**20:.1f} MiB"
+        else:
+            text = f"Export {phase}"
+        self.activity.set(text)
+
+    def setOutbox(self, status):
+        text = f"Outbox {status['pending']}/{status['sent']}/{status['failed']}"
+        if status['message']:
+            text = f"{text} {status['message']}"
+        self.outbox.set(text)
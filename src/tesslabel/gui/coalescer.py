@@ -0,0 +1,99 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger   import Logger
+from twisted.internet import reactor
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.gui import tkloop
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'ctrl'
+
+# Default minimum time between two passes, in milliseconds
+UPDATE_INTERVAL_MS = 100
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# --------------
+# Module Classes
+# --------------
+
+class UpdateCoalescer:
+    '''
+    Frame rate limiter for widget updates coming from reactor callbacks.
+    Updates are submitted under a key (i.e. (role, 'stats')) and only the
+    latest one per key is kept. Pending updates are applied in one pass,
+    in submission order, at most once every interval milliseconds,
+    so that bursts of events cost a single redraw.
+    '''
+
+    def __init__(self, interval=UPDATE_INTERVAL_MS, clock=reactor):
+        self.interval = interval / 1000
+        self._clock = clock
+        self._pending = dict()
+        self._call = None
+        self._last = float('-inf')
+        self.submitted = 0
+        self.applied = 0
+
+    def submit(self, key, function, *args, **kw):
+        '''Schedules function(*args, **kw), replacing any pending update with the same key'''
+        self._pending.pop(key, None)
+        self._pending[key] = (function, args, kw)
+        self.submitted += 1
+        if self._call is None:
+            delay = max(0.0, self._last + self.interval - self._clock.seconds())
+            self._call = self._clock.callLater(delay, self.flush)
+
+    def discard(self, *keys):
+        '''Drops pending updates, i.e. before clearing their widgets'''
+        for key in keys:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        '''Applies all pending updates now'''
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+        self._last = self._clock.seconds()
+        pending, self._pending = self._pending, dict()
+        for key, (function, args, kw) in pending.items():
+            try:
+                function(*args, **kw)
+            except Exception as e:
+                log.failure("Updating {key}: {e}", key=key, e=e)
+        self.applied += len(pending)
+        if pending:
+            tkloop.wakeup()
+
+    def stop(self):
+        '''Cancels the scheduled pass and drops all pending updates'''
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+        self._pending = dict()
+
+
+__all__ = [
+    "UPDATE_INTERVAL_MS",
+    "UpdateCoalescer",
+]
@@ -39,6 +39,8 @@ from tesslabel.logger  import startLogging, setLogLevel
 from tesslabel                    import set_status_code, REF, TEST
 from tesslabel.utils              import chop
 from tesslabel.photometer.service import PhotometerService
+from tesslabel.gui.coalescer      import UpdateCoalescer, UPDATE_INTERVAL_MS
+from tesslabel.gui.history        import PLOT_SPAN, PLOT_CAPACITY
 from tesslabel.calibration.service        import CalibrationService
 
 # ----------------
@@ -117,6 +119,8 @@ class PhotometerPanelController:
         self.messages = messages
         self._update_zp   = False
         self._write_to_db = False
+        # Statistics events may come faster than worth redrawing
+        self.updates = UpdateCoalescer()
 
         setLogLevel(namespace=NAMESPACE, levelStr='info')
         reactor.callLater(0, self.start)
@@ -137,6 +141,7 @@ class PhotometerPanelController:
         pub.subscribe(self.onPhotometerFirmware, 'phot_firmware')
         pub.subscribe(self.onPhotometerOffline, 'phot_offline')
         pub.subscribe(self.onPhotometerEnd, 'phot_end')
+        pub.subscribe(self.onPhotometerSample, 'phot_sample')
         pub.subscribe(self.onStatisticsProgress, 'stats_progress')
         pub.subscribe(self.onStatisticsInfo, 'stats_info')
         pub.subscribe(self.onCalibrationRound, 'calib_round_info')
@@ -158,6 +163,13 @@ class PhotometerPanelController:
             'ref':  None,
             'test': None,
         }
+        config = dict((yield self.model.config.loadSection('gui')))
+        self.updates.interval = int(config.get('refresh_ms', UPDATE_INTERVAL_MS)) / 1000
+        for role in ('test', 'ref'):
+            self.view.mainArea.photPanel[role].chart.setHistory(
+                span     = int(config.get('plot_span', PLOT_SPAN)),
+                capacity = int(config.get('plot_capacity', PLOT_CAPACITY)),
+            )
         result = yield self.model.config.load('test-device','endpoint')
         self.view.mainArea.photPanel['test'].setEndpoint(result['endpoint'])
         result = yield self.model.config.load('ref-device','endpoint')
@@ -213,6 +225,11 @@ class PhotometerPanelController:
         set_status_code(1)
         reactor.callLater(1, self.parent.parent.stopService)
 
+    def onPhotometerSample(self, role, sample):
+        panel = self.view.mainArea.photPanel[role]
+        panel.appendSample(sample)
+        self.updates.submit((role, 'plot'), panel.updatePlot)
+
     def onStatisticsProgress(self, role, stats_info):
         label = TEST if role == 'test' else REF
         log.info('[{label:4s}] {name:8s} waiting for enough samples, {pend} remaining', 
@@ -220,8 +237,9 @@ class PhotometerPanelController:
             name = stats_info['name'], 
             pend = stats_info['nsamples'] - stats_info['current'],
         )
-        self.view.mainArea.photPanel[role].yellow()
-        self.view.mainArea.photPanel[role].updatePhotStats(stats_info)
+        panel = self.view.mainArea.photPanel[role]
+        self.updates.submit((role, 'light'), panel.yellow)
+        self.updates.submit((role, 'stats'), panel.updatePhotStats, stats_info)
 
     def onStatisticsInfo(self, role, stats_info):
         label = TEST if role == 'test' else REF
@@ -238,11 +256,9 @@ class PhotometerPanelController:
             sFreq   = stats_info['stddev'],
             w       = stats_info['duration']
         )
-        if stats_info['stddev'] == 0.0:
-            self.view.mainArea.photPanel[role].red()
-        else:
-            self.view.mainArea.photPanel[role].green()
-        self.view.mainArea.photPanel[role].updatePhotStats(stats_info)
+        panel = self.view.mainArea.photPanel[role]
+        self.updates.submit((role, 'light'), panel.red if stats_info['stddev'] == 0.0 else panel.green)
+        self.updates.submit((role, 'stats'), panel.updatePhotStats, stats_info)
 
     def onPhotometerInfo(self, role, info):
         label = TEST if role == 'test' else REF
@@ -258,6 +274,15 @@ class PhotometerPanelController:
             log.info("[{label}] Offset Freq. : {value}", label=label, value=info['freq_offset'])
             log.info("[{label}] Firmware     : {value}", label=label, value=info['firmware'])
             self.view.mainArea.photPanel[role].updatePhotInfo(info)
+            d = self.model.lookupMac(info['mac'])
+            d.addCallbacks(self._onRegistered, self._onRegisteredFailure, callbackArgs=(label,), errbackArgs=(label,))
+
+    def _onRegistered(self, registered, label):
+        if registered:
+            log.warn("[{label}] Already registered as {prefix}{suffix}", label=label, prefix=registered[0], suffix=registered[1])
+
+    def _onRegisteredFailure(self, failure, label):
+        log.failure("[{label}] Could not check whether the MAC is already registered: {f}", failure=failure, label=label, f=failure.getErrorMessage())
       
     @inlineCallbacks
     def onStartPhotometerReq(self, role, alone):
@@ -285,6 +310,7 @@ class PhotometerPanelController:
                 self.view.mainArea.photPanel[role].enable()
             else:
                 yield self._stopChain(role)
+                self.updates.discard((role, 'light'), (role, 'stats'), (role, 'plot'))
                 self.view.mainArea.photPanel[role].clear()
         except Exception as e:
             log.failure('{e}',e=e)
@@ -0,0 +1,127 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import gettext
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger   import Logger
+from twisted.internet.defer import inlineCallbacks
+
+# -------------------
+# Third party imports
+# -------------------
+
+from pubsub import pub
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger  import setLogLevel
+
+# ----------------
+# Module constants
+# ----------------
+
+# Support for internationalization
+_ = gettext.gettext
+
+NAMESPACE = 'ctrl'
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# --------------
+# Module Classes
+# --------------
+
+class RegistryController:
+    '''
+    Feeds the registered photometers browser. A filter change scans the
+    matching rows once (count and keys directory); scrolling then reads
+    only the visible rows. While a page is being read, further page
+    requests replace each other, so that only the latest one is read next.
+    '''
+
+    NAME = NAMESPACE
+
+    def __init__(self, parent, view, model):
+        self.parent = parent
+        self.model = model
+        self.view = view
+        self._query = None
+        self._directory = list()
+        self._scans = 0
+        self._reading = False
+        self._next = None
+        setLogLevel(namespace=NAMESPACE, levelStr='info')
+        pub.subscribe(self.onScanReq, 'registry_scan_req')
+        pub.subscribe(self.onPageReq, 'registry_page_req')
+
+    # --------------
+    # Event handlers
+    # --------------
+
+    @inlineCallbacks
+    def onScanReq(self, kind, text):
+        try:
+            self._scans += 1
+            scan = self._scans
+            count, directory = yield self.model.registry.scan(kind, text)
+            if scan != self._scans:
+                return  # superseded by a newer filter
+            self._query = (kind, text)
+            self._directory = directory
+            self._next = None
+            dialog = self._dialog()
+            if dialog:
+                dialog.setTotal(count)
+        except Exception as e:
+            log.failure('{e}',e=e)
+            pub.sendMessage('quit', exit_code = 1)
+
+    @inlineCallbacks
+    def onPageReq(self, offset, limit):
+        self._next = (offset, limit)
+        if self._reading or self._query is None:
+            return
+        self._reading = True
+        try:
+            while self._next is not None:
+                offset, limit = self._next
+                self._next = None
+                kind, text = self._query
+                rows = yield self.model.registry.seek(kind, text, self._directory, offset, limit)
+                dialog = self._dialog()
+                if dialog:
+                    dialog.setPage(offset, rows)
+        except Exception as e:
+            log.failure('{e}',e=e)
+            pub.sendMessage('quit', exit_code = 1)
+        finally:
+            self._reading = False
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    def _dialog(self):
+        '''The browser window, None if already closed'''
+        dialog = self.view.menuBar.registry
+        if dialog is None or not dialog.winfo_exists():
+            return None
+        return dialog
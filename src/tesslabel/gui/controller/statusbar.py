@@ -72,6 +72,8 @@ class StatusBarController:
         self.view   = view
         setLogLevel(namespace=NAMESPACE, levelStr='info')
         pub.subscribe(self.onStatusBarRequest, 'status_bar_req')
+        pub.subscribe(self.onOutboxStatus, 'outbox_status')
+        pub.subscribe(self.onExportProgress, 'export_progress')
 
     # --------------
     # Event handlers
@@ -82,9 +84,16 @@ class StatusBarController:
         try:
             result = yield self.model.batch.latest()
             self.view.statusBar.set(result)
+            pub.sendMessage('outbox_status_req')
         except Exception as e:
             log.failure('{e}',e=e)
             pub.sendMessage('quit', exit_code = 1)
+
+    def onOutboxStatus(self, status):
+        self.view.statusBar.setOutbox(status)
+
+    def onExportProgress(self, progress):
+        self.view.statusBar.setProgress(progress)
      
     
 
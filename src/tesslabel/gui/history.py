@@ -0,0 +1,155 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Bounded sample history for the live plots.
+
+Samples are kept in a fixed capacity buffer and folded as they arrive into
+a min/max envelope with one bucket per pixel column, so that a redraw costs
+O(width) whatever the number of samples held. The envelopes are rebuilt
+from the buffer only when the plot width or time span change.
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import math
+import collections
+
+# ----------------
+# Module constants
+# ----------------
+
+# Plotted series
+FREQ = 'freq'
+MAG  = 'mag'
+
+SERIES = (FREQ, MAG)
+
+# Defaults, overriden by the 'gui' section in config_t
+PLOT_SPAN     = 600       # seconds shown
+PLOT_CAPACITY = 100000    # samples kept per photometer
+
+DEFAULT_WIDTH = 400       # pixel columns
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def magnitude(sample):
+    '''Magnitude reported by the photometer or derived from its zero point, None if unknown'''
+    mag = sample.get('mag')
+    if mag is not None:
+        return mag
+    freq = sample.get('freq')
+    zp = sample.get('zp', sample.get('ZP'))
+    if zp is None or not freq or freq <= 0:
+        return None
+    return zp - 2.5 * math.log10(freq)
+
+# --------------
+# Module Classes
+# --------------
+
+class Envelope:
+    '''
+    Min/max decimation of a time series into fixed duration buckets.
+    Each bucket keeps its first, minimum, maximum and last values, so that
+    the drawn line keeps every spike and the continuity between columns.
+    Only the latest nbuckets buckets are kept.
+    '''
+
+    def __init__(self, duration, nbuckets):
+        self.duration = duration
+        self.nbuckets = nbuckets
+        self.buckets = collections.deque()   # [index, first, low, high, last]
+
+    def add(self, t, value):
+        index = int(t // self.duration)
+        buckets = self.buckets
+        if buckets and index <= buckets[-1][0]:
+            # Same column (or a late sample): fold into the latest bucket
+            bucket = buckets[-1]
+            bucket[2] = min(bucket[2], value)
+            bucket[3] = max(bucket[3], value)
+            bucket[4] = value
+        else:
+            buckets.append([index, value, value, value, value])
+            while index - buckets[0][0] >= self.nbuckets:
+                buckets.popleft()
+
+    def limits(self):
+        '''(low, high) over all buckets, None if empty'''
+        if not self.buckets:
+            return None
+        return min(b[2] for b in self.buckets), max(b[3] for b in self.buckets)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+class SampleHistory:
+    '''
+    Latest samples of a photometer, up to capacity, with one envelope per
+    series sized to the plot width in pixels for the given time span.
+    '''
+
+    def __init__(self, capacity=PLOT_CAPACITY, span=PLOT_SPAN, width=DEFAULT_WIDTH):
+        self.samples = collections.deque(maxlen=capacity)
+        self.span = span
+        self.width = width
+        self.envelopes = {series: Envelope(span / width, width) for series in SERIES}
+
+    def __len__(self):
+        return len(self.samples)
+
+    def append(self, sample):
+        '''Adds a photometer sample (a dict with tstamp, freq and zp or mag keys)'''
+        freq = sample.get('freq')
+        if freq is None:
+            return
+        t = sample['tstamp'].timestamp()
+        mag = magnitude(sample)
+        self.samples.append((t, freq, mag))
+        self.envelopes[FREQ].add(t, freq)
+        if mag is not None:
+            self.envelopes[MAG].add(t, mag)
+
+    def resize(self, width, span=None):
+        '''Rebuilds the envelopes for a new plot width and optionally a new time span'''
+        span = self.span if span is None else span
+        if width == self.width and span == self.span:
+            return
+        self.width, self.span = width, span
+        self.envelopes = {series: Envelope(span / width, width) for series in SERIES}
+        if not self.samples:
+            return
+        oldest = self.samples[-1][0] - span
+        for t, freq, mag in self.samples:
+            if t < oldest:
+                continue
+            self.envelopes[FREQ].add(t, freq)
+            if mag is not None:
+                self.envelopes[MAG].add(t, mag)
+
+    def clear(self):
+        self.samples.clear()
+        for envelope in self.envelopes.values():
+            envelope.clear()
+
+
+__all__ = [
+    "FREQ",
+    "MAG",
+    "SERIES",
+    "PLOT_SPAN",
+    "PLOT_CAPACITY",
+    "Envelope",
+    "SampleHistory",
+    "magnitude",
+]
@@ -23,7 +23,7 @@ from pubsub import pub
 # ---------------
 
 from twisted.logger   import Logger
-from twisted.internet import  tksupport, reactor, defer, task
+from twisted.internet import  reactor, defer, task
 from twisted.application.service import Service
 from twisted.internet.defer import inlineCallbacks
 
@@ -36,12 +36,8 @@ from twisted.internet.defer import inlineCallbacks
 from tesslabel import set_status_code
 from tesslabel.logger  import setLogLevel
 from tesslabel.dbase.service   import DatabaseService
-from tesslabel.gui.application import Application
-from tesslabel.gui.controller.application import ApplicationController
-from tesslabel.gui.controller.preferences import PreferencesController
-from tesslabel.gui.controller.statusbar import StatusBarController
-from tesslabel.gui.controller.mainpanel import CalibrationSettingsController, PhotometerPanelController
-from tesslabel.gui.controller.batch import BatchController
+
+# Tk, the widgets and the controllers are imported by startService()
 
 
 # ----------------
@@ -86,6 +82,14 @@ class GraphicalService(Service):
     
     def startService(self):
         log.info('Starting {name}',name=self.name)
+        from tesslabel.gui import tkloop
+        from tesslabel.gui.application import Application
+        from tesslabel.gui.controller.application import ApplicationController
+        from tesslabel.gui.controller.preferences import PreferencesController
+        from tesslabel.gui.controller.statusbar import StatusBarController
+        from tesslabel.gui.controller.mainpanel import CalibrationSettingsController, PhotometerPanelController
+        from tesslabel.gui.controller.registry import RegistryController
+        from tesslabel.gui.controller.batch import BatchController
         
         self.application = Application()
         self.dbaseService = self.parent.getServiceNamed(DatabaseService.NAME)
@@ -116,10 +120,20 @@ class GraphicalService(Service):
                 model   = self.dbaseService.dao,
                 messages= self.options.messages
             ),
+            RegistryController(
+                parent  = self, 
+                view    = self.application, 
+                model   = self.dbaseService.dao,
+            ),
+            BatchController(
+                parent  = self, 
+                view    = self.application, 
+                model   = self.dbaseService.dao,
+            ),
 
         )
 
-        tksupport.install(self.application)
+        tkloop.install(self.application, self.options.loop)
         #self.task.start(3, now=False) # call every T seconds
         # Start application controller 
         pub.sendMessage('bootstrap_req')
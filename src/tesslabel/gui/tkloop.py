@@ -0,0 +1,149 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+'''
+Tk and Twisted event loops integration.
+
+The reactor owns the main loop and Tk events are pumped from it:
+
+- 'poll' (default) is Twisted's tksupport: root.update() every 10 ms, busy or not.
+- 'adaptive' pumps pending Tk events every MIN_INTERVAL_MS while there is
+  activity and doubles the interval up to MAX_INTERVAL_MS while idle.
+  Reactor side updates call wakeup() so that they reach the screen without
+  waiting for the idle interval to expire.
+'''
+
+#--------------------
+# System wide imports
+# -------------------
+
+import tkinter as tk
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger   import Logger
+from twisted.internet import tksupport, reactor
+
+# ----------------
+# Module constants
+# ----------------
+
+NAMESPACE = 'gui'
+
+MODE_POLL     = 'poll'
+MODE_ADAPTIVE = 'adaptive'
+
+MODES = (MODE_POLL, MODE_ADAPTIVE)
+
+# 'adaptive' adds up to MAX_INTERVAL_MS of input latency when idle and
+# stays opt-in until bench/bench_tkloop.py figures justify a switch
+DEFAULT_MODE = MODE_POLL
+
+# Adaptive pump intervals, in milliseconds
+MIN_INTERVAL_MS = 5
+MAX_INTERVAL_MS = 40
+
+# Maximum Tk events handled in a single pass, so that the reactor is not starved
+MAX_EVENTS = 200
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# The pump installed by install(), if any
+_pump = None
+
+# --------------
+# Module Classes
+# --------------
+
+class AdaptiveTkPump:
+    '''
+    Handles pending Tk events from the reactor at an adaptive rate.
+    The interval is reset to its minimum whenever a pass finds Tk events
+    or wakeup() is called, and doubled on every idle pass up to its maximum.
+    '''
+
+    def __init__(self, root, min_interval=MIN_INTERVAL_MS, max_interval=MAX_INTERVAL_MS, clock=reactor):
+        self._root = root
+        self.min_interval = min_interval / 1000
+        self.max_interval = max_interval / 1000
+        self.interval = self.min_interval
+        self._clock = clock
+        self._call = None
+        self.passes = 0
+        self.events = 0
+
+    def start(self):
+        if self._call is None:
+            self._call = self._clock.callLater(0, self._pump)
+
+    def stop(self):
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+
+    def wakeup(self):
+        '''Brings the next pass forward, i.e. after changing widgets from a reactor callback'''
+        self.interval = self.min_interval
+        if self._call is not None and self._call.active():
+            if self._call.getTime() - self._clock.seconds() > self.min_interval:
+                self._call.reset(self.min_interval)
+
+    def _pump(self):
+        self._call = None
+        self.passes += 1
+        n = 0
+        try:
+            while n < MAX_EVENTS and self._root.tk.dooneevent(tk._tkinter.DONT_WAIT):
+                n += 1
+        except tk.TclError as e:
+            # The application window has been destroyed
+            log.debug("Tk pump stopped: {e}", e=e)
+            return
+        self.events += n
+        if n:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, 2 * self.interval)
+        self._call = self._clock.callLater(self.interval, self._pump)
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def install(root, mode=DEFAULT_MODE):
+    '''Installs a Tk root window into the reactor with the given integration mode'''
+    global _pump
+    if mode not in MODES:
+        raise ValueError(f"Unknown Tk loop mode: {mode}, choose from {', '.join(MODES)}")
+    log.info("Tk event loop integration: {mode}", mode=mode)
+    if mode == MODE_POLL:
+        tksupport.install(root)
+    else:
+        _pump = AdaptiveTkPump(root)
+        _pump.start()
+    return _pump
+
+
+def wakeup():
+    '''Asks the installed pump, if any, for a prompt pass'''
+    if _pump is not None:
+        _pump.wakeup()
+
+
+__all__ = [
+    "MODES",
+    "DEFAULT_MODE",
+    "AdaptiveTkPump",
+    "install",
+    "wakeup",
+]
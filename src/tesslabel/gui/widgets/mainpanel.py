@@ -35,6 +35,7 @@ from twisted.logger import Logger
 from tesslabel.gui import YELLOW_ICON, GREEN_ICON, GRAY_ICON, RED_ICON
 from tesslabel.gui.widgets.contrib import ToolTip
 from tesslabel.gui.widgets.validators import float_validator
+from tesslabel.gui.widgets.plot import StripChart
 
 
 # ----------------
@@ -302,6 +303,8 @@ class PhotometerPanel(ttk.LabelFrame):
         self.progress.pack(side=tk.LEFT, fill=tk.X, padx=5, pady=2, ipadx=5, ipady=5,)
         self.stats = PhotometerStatsPanel(lower_frame)
         self.stats.pack(side=tk.LEFT, fill=tk.X, padx=5, pady=2, ipadx=5, ipady=5,)
+        self.chart = StripChart(self)
+        self.chart.pack(side=tk.TOP, fill=tk.X, expand=True, padx=10, pady=2)
         widget = ttk.Checkbutton(self, text= self._text, variable=self._enable, command=self.onEnablePanel)
         self.configure(labelwidget=widget)
        
@@ -309,6 +312,7 @@ class PhotometerPanel(ttk.LabelFrame):
         self.info.clear()
         self.progress.clear()
         self.stats.clear()
+        self.chart.clear()
         self._own_zp.set(False)
         self._semaphore.configure(image=self._gray)
 
@@ -319,6 +323,12 @@ class PhotometerPanel(ttk.LabelFrame):
         self.progress.set(stats_info)
         self.stats.set(stats_info)
 
+    def appendSample(self, sample):
+        self.chart.append(sample)
+
+    def updatePlot(self):
+        self.chart.redraw()
+
     def yellow(self):
          self._semaphore.configure(image=self._yellow)
 
@@ -586,7 +596,7 @@ class CalibrationPanel(ttk.LabelFrame):
 
 class BatchManagemetPanel(ttk.LabelFrame):
 
-    EVENTS = {'open': "open_batch_req", 'close': "close_batch_req", 'purge': "purge_batch_req", 'export': "export_batch_req"}
+    EVENTS = {'open': "open_batch_req", 'close': "close_batch_req", 'purge': "purge_batch_req", 'export': "export_batch_req", 'archive': "archive_batch_req"}
 
     def __init__(self, parent, *args, **kwargs):
         super().__init__(parent, *args, text=_("Batch Management"), borderwidth=4, **kwargs)
@@ -594,9 +604,11 @@ class BatchManagemetPanel(ttk.LabelFrame):
         self._email    = tk.BooleanVar()
         self._updated  = tk.BooleanVar()
         self._base_dir = tk.StringVar()
+        self._format   = tk.StringVar()
         self._email.set(True)
         self._updated.set(True)
         self._base_dir.set("/tmp/tesslabel")
+        self._format.set("csv")
         self.build()
 
     def start(self):
@@ -623,12 +635,23 @@ class BatchManagemetPanel(ttk.LabelFrame):
         widget.pack(side=tk.TOP, anchor=tk.W, padx=2, pady=2)
         widget = ttk.Radiobutton(cmd_panel, text=_("Export Batch"), variable=self._command, value="export")
         widget.pack(side=tk.TOP, anchor=tk.W, padx=2, pady=2)
+        widget = ttk.Radiobutton(cmd_panel, text=_("Archive Batch"), variable=self._command, value="archive")
+        widget.pack(side=tk.TOP, anchor=tk.W, padx=2, pady=2)
 
         # Export options
         widget = ttk.Checkbutton(export_panel, text= _("Email after export"),  variable=self._email)
         widget.pack(side=tk.TOP,  fill=tk.X,padx=6, pady=2)
         widget = ttk.Checkbutton(export_panel, text= _("Only ZP flashed to devices"),  variable=self._updated)
         widget.pack(side=tk.TOP,  fill=tk.X, padx=6, pady=2)
+        format_panel = ttk.Frame(export_panel)
+        format_panel.pack(side=tk.TOP, fill=tk.X, padx=6, pady=2)
+        widget = ttk.Label(format_panel, text=_("Samples"))
+        widget.pack(side=tk.LEFT, padx=0, pady=0)
+        widget = ttk.Radiobutton(format_panel, text=_("CSV"), variable=self._format, value="csv")
+        widget.pack(side=tk.LEFT, padx=2, pady=0)
+        widget = ttk.Radiobutton(format_panel, text=_("Columnar"), variable=self._format, value="columnar")
+        widget.pack(side=tk.LEFT, padx=2, pady=0)
+        ToolTip(widget, text=_("Compressed typed columns (Parquet if pyarrow is installed)"))
         widget = ttk.Button(export_panel, text=_("Choose folder"), command=self.onChooseFolder)
         widget.pack(side=tk.TOP,   anchor=tk.W, padx=6, pady=2)
         widget = ttk.Entry(export_panel, width=32, textvariable=self._base_dir)
@@ -645,7 +668,7 @@ class BatchManagemetPanel(ttk.LabelFrame):
 
     def onClickButton(self):
         cmd = self._command.get()
-        args = {'base_dir': self._base_dir.get(), 'email_flag': self._email.get(), 'update': self._updated.get()}
+        args = {'base_dir': self._base_dir.get(), 'email_flag': self._email.get(), 'update': self._updated.get(), 'format': self._format.get()}
         if cmd:
             pub.sendMessage(self.EVENTS[cmd], args=args)
 
@@ -0,0 +1,150 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import gettext
+import tkinter as tk
+from   tkinter import ttk
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+
+# -------------
+# Local imports
+# -------------
+
+from tesslabel.gui.history import SampleHistory, SERIES, FREQ, MAG
+
+# ----------------
+# Module constants
+# ----------------
+
+# Support for internationalization
+_ = gettext.gettext
+
+NAMESPACE = 'ctrl'
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = Logger(namespace=NAMESPACE)
+
+# ============================================================================
+#                              LIVE PLOT WIDGETS
+# ============================================================================
+
+class StripChart(ttk.LabelFrame):
+    '''
+    Live plot of a photometer frequency (upper strip) and magnitude (lower strip).
+    Samples are appended to a SampleHistory without drawing; redraw() updates
+    one canvas line per series from its pixel column envelope, so its cost
+    only depends on the canvas width.
+    '''
+
+    HEIGHT = 140    # pixels
+    MARGIN = 56     # left margin, in pixels, for the scale labels
+    PAD    = 6      # vertical padding of each strip, in pixels
+
+    STYLE = {
+        FREQ: (_("Freq. (Hz)"), '{0:.3f}', 'blue'),
+        MAG : (_("Mag."),       '{0:.2f}', 'dark red'),
+    }
+
+    def __init__(self, parent, history=None, *args, **kwargs):
+        super().__init__(parent, *args, text=_("Live plot"), **kwargs)
+        self.history = SampleHistory() if history is None else history
+        self._width  = 0
+        self._height = self.HEIGHT
+        self._items  = dict()
+        self.build()
+
+    def start(self):
+        pass
+
+    def build(self):
+        self._canvas = canvas = tk.Canvas(self, height=self.HEIGHT, background='white', highlightthickness=0)
+        canvas.pack(side=tk.TOP, fill=tk.X, expand=True, padx=2, pady=2)
+        self._separator = canvas.create_line(0, 0, 0, 0, fill='light gray')
+        for series in SERIES:
+            title, _fmt, colour = self.STYLE[series]
+            self._items[series] = (
+                canvas.create_line(0, 0, 0, 0, fill=colour, state=tk.HIDDEN),
+                canvas.create_text(2, 0, anchor=tk.NW, fill=colour, font='TkSmallCaptionFont'),
+                canvas.create_text(2, 0, anchor=tk.SW, fill=colour, font='TkSmallCaptionFont'),
+                canvas.create_text(2, 0, anchor=tk.W,  fill=colour, font='TkSmallCaptionFont', text=title),
+            )
+        canvas.bind('<Configure>', self.onConfigure)
+
+    def onConfigure(self, event):
+        self._width, self._height = event.width, event.height
+        self.history.resize(max(1, self._width - self.MARGIN))
+        half = self._height / 2
+        self._canvas.coords(self._separator, 0, half, self._width, half)
+        for i, series in enumerate(SERIES):
+            line, high, low, title = self._items[series]
+            self._canvas.coords(high, 2, i * half + 1)
+            self._canvas.coords(low, 2, (i + 1) * half - 1)
+            self._canvas.coords(title, 2, i * half + half / 2)
+        self.redraw()
+
+    def setHistory(self, span, capacity):
+        '''Replaces the history with an empty one for a new time span (seconds) and capacity (samples)'''
+        self.history = SampleHistory(capacity, span, self.history.width)
+        self.redraw()
+
+    def append(self, sample):
+        self.history.append(sample)
+
+    def redraw(self):
+        if not self._width:
+            return
+        half = self._height / 2
+        right = self.MARGIN + self.history.width - 1
+        for i, series in enumerate(SERIES):
+            title, fmt, colour = self.STYLE[series]
+            line, high, low, _title = self._items[series]
+            envelope = self.history.envelopes[series]
+            limits = envelope.limits()
+            if limits is None:
+                self._canvas.itemconfigure(line, state=tk.HIDDEN)
+                self._canvas.itemconfigure(high, text='')
+                self._canvas.itemconfigure(low, text='')
+                continue
+            lo, hi = limits
+            if hi - lo < 1e-6:
+                lo, hi = lo - 0.5, hi + 0.5
+            top, bottom = i * half + self.PAD, (i + 1) * half - self.PAD
+            scale = (bottom - top) / (hi - lo)
+            newest = envelope.buckets[-1][0]
+            coords = list()
+            for index, first, vmin, vmax, last in envelope.buckets:
+                x = right - (newest - index)
+                coords.extend((x, bottom - (first - lo) * scale))
+                if vmin != vmax:
+                    coords.extend((x, bottom - (vmin - lo) * scale, x, bottom - (vmax - lo) * scale, x, bottom - (last - lo) * scale))
+            if len(coords) == 2:
+                coords.extend((coords[0] + 1, coords[1]))
+            self._canvas.coords(line, *coords)
+            self._canvas.itemconfigure(line, state=tk.NORMAL)
+            self._canvas.itemconfigure(high, text=fmt.format(hi))
+            self._canvas.itemconfigure(low, text=fmt.format(lo))
+
+    def clear(self):
+        self.history.clear()
+        self.redraw()
+
+
+__all__ = [
+    "StripChart",
+]
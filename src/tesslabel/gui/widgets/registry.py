@@ -0,0 +1,187 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import gettext
+import tkinter as tk
+from   tkinter import ttk
+
+# ---------------
+# Twisted imports
+# ---------------
+
+from twisted.logger import Logger
+
+# -------------------
+# Third party imports
+# -------------------
+
+from pubsub import pub
+
+# -------------
+# local imports
+# -------------
+
+from tesslabel.gui.widgets.contrib import ToolTip
+
+# ----------------
+# Module constants
+# ----------------
+
+# Support for internationalization
+_ = gettext.gettext
+
+NAMESPACE = 'gui'
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log  = Logger(namespace=NAMESPACE)
+
+# -----------------
+# Application Class
+# -----------------
+
+class RegistryDialog(tk.Toplevel):
+    '''
+    Virtual list of the registered photometers. The tree view only holds
+    the visible rows; the scrollbar works on row offsets and every scroll
+    asks the controller for the rows at the new offset.
+    '''
+
+    ROWS = 20           # visible rows
+    DEBOUNCE_MS = 250   # filter typing pause before a new scan
+
+    FILTERS = (
+        ('name', _("Name")),
+        ('mac',  _("MAC")),
+        ('date', _("Date")),
+    )
+
+    HEADINGS = (
+        (_("Name"),         110, tk.W),
+        (_("MAC"),          140, tk.W),
+        (_("Sensor"),        80, tk.W),
+        (_("Zero Point"),    80, tk.E),
+        (_("Freq. Offset"),  90, tk.E),
+        (_("Registered"),   150, tk.W),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._filter = tk.StringVar(value=self.FILTERS[0][1])
+        self._text   = tk.StringVar()
+        self._count  = tk.StringVar()
+        self._total  = 0
+        self._offset = 0
+        self._typing = None
+        self.build()
+        self.onFilterChange()
+
+    def build(self):
+        self.title(_("Registered photometers"))
+        # Frames
+        top_frame = ttk.Frame(self)
+        top_frame.pack(side=tk.TOP, expand=True, fill=tk.X, padx=5, pady=5)
+        middle_frame = ttk.Frame(self)
+        middle_frame.pack(side=tk.TOP, expand=True, fill=tk.BOTH, padx=5, pady=5)
+        bottom_frame = ttk.Frame(self,  borderwidth=2, relief=tk.GROOVE)
+        bottom_frame.pack(side=tk.TOP, expand=True, fill=tk.X, padx=5, pady=5)
+
+        # Filter
+        widget = ttk.Label(top_frame, text= _("Find by"))
+        widget.pack(side=tk.LEFT, padx=5, pady=5)
+        widget = ttk.Combobox(top_frame, width=8, textvariable=self._filter, state='readonly', values=[label for kind, label in self.FILTERS])
+        widget.pack(side=tk.LEFT, padx=5, pady=5)
+        widget.bind('<<ComboboxSelected>>', self.onFilterChange)
+        widget = ttk.Entry(top_frame, width=24, textvariable=self._text)
+        widget.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5, pady=5)
+        widget.bind('<KeyRelease>', self.onTyping)
+        ToolTip(widget, _("Name (i.e. stars12), MAC (i.e. 5C:CF) or registration date (i.e. 2022-05) start"))
+        widget = ttk.Label(top_frame, width=16, textvariable=self._count, anchor=tk.E)
+        widget.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Virtual list
+        columns = tuple(str(i) for i in range(len(self.HEADINGS)))
+        self._tree = tree = ttk.Treeview(middle_frame, columns=columns, show='headings', height=self.ROWS, selectmode='browse')
+        for column, (heading, width, anchor) in zip(columns, self.HEADINGS):
+            tree.heading(column, text=heading, anchor=anchor)
+            tree.column(column, width=width, anchor=anchor, stretch=False)
+        tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        self._scrollbar = ttk.Scrollbar(middle_frame, orient=tk.VERTICAL, command=self.onScroll)
+        self._scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        for sequence, delta in (('<Up>', -1), ('<Down>', 1), ('<Prior>', -self.ROWS), ('<Next>', self.ROWS), ('<Button-4>', -3), ('<Button-5>', 3)):
+            tree.bind(sequence, lambda event, delta=delta: self.scrollBy(delta))
+        tree.bind('<Home>', lambda event: self.scrollTo(0))
+        tree.bind('<End>',  lambda event: self.scrollTo(self._total))
+        tree.bind('<MouseWheel>', lambda event: self.scrollBy(-3 if event.delta > 0 else 3))
+
+        # Lower Buttons
+        button = ttk.Button(bottom_frame, text=_("Close"), command=self.onCloseButton)
+        button.pack(side=tk.RIGHT, padx=10, pady=5)
+
+    # Filter callbacks
+    def onTyping(self, event=None):
+        if self._typing is not None:
+            self.after_cancel(self._typing)
+        self._typing = self.after(self.DEBOUNCE_MS, self.onFilterChange)
+
+    def onFilterChange(self, event=None):
+        self._typing = None
+        kind = dict((label, kind) for kind, label in self.FILTERS)[self._filter.get()]
+        pub.sendMessage('registry_scan_req', kind=kind, text=self._text.get())
+
+    # Scrolling
+    def onScroll(self, action, value, units=None):
+        if action == tk.MOVETO:
+            self.scrollTo(round(float(value) * self._total))
+        elif units == tk.PAGES:
+            self.scrollBy(int(value) * self.ROWS)
+        else:
+            self.scrollBy(int(value))
+
+    def scrollBy(self, delta):
+        self.scrollTo(self._offset + delta)
+        return 'break'
+
+    def scrollTo(self, offset, force=False):
+        offset = max(0, min(offset, self._total - self.ROWS))
+        if offset == self._offset and not force:
+            return
+        self._offset = offset
+        if self._total:
+            self._scrollbar.set(offset / self._total, min(1.0, (offset + self.ROWS) / self._total))
+        else:
+            self._scrollbar.set(0.0, 1.0)
+        pub.sendMessage('registry_page_req', offset=offset, limit=self.ROWS)
+
+    # Controller responses
+    def setTotal(self, count):
+        self._total = count
+        self._count.set(_("{0} photometers").format(count))
+        self.scrollTo(0, force=True)
+
+    def setPage(self, offset, rows):
+        if offset != self._offset:
+            return  # stale page, a newer one was requested
+        items = self._tree.get_children()
+        for i, (prefix, suffix, mac, sensor, zero_point, freq_offset, creation_date) in enumerate(rows):
+            values = (f"{prefix}{suffix}", mac, sensor, zero_point, freq_offset, creation_date)
+            if i < len(items):
+                self._tree.item(items[i], values=values)
+            else:
+                self._tree.insert('', tk.END, values=values)
+        if len(items) > len(rows):
+            self._tree.delete(*items[len(rows):])
+
+    # Buttons callbacks
+    def onCloseButton(self):
+        self.destroy()
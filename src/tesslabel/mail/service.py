@@ -0,0 +1,312 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2022
+#
+# See the LICENSE file for details
+# see the AUTHORS file for authors
+# ----------------------------------------------------------------------
+
+#--------------------
+# System wide imports
+# -------------------
+
+import os
+import io
+import random
+import datetime
+
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# ---------------
+# Twisted imports
+# ---------------
+
+# twisted.mail.smtp is imported on first delivery only
+from twisted.internet import task, reactor
+from twisted.application.service import Service
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.threads import deferToThread
+
+# -------------------
+# Third party imports
+# -------------------
+
+from pubsub import pub
+
+#--------------
+# local imports
+# -------------
+
+from tesslabel.logger import setLogLevel
+from tesslabel.dbase.service import DatabaseService
+from tesslabel.mail import NAMESPACE, log
+
+# ----------------
+# Module constants
+# ----------------
+
+SECTION = 'outbox'
+
+# Defaults, overriden by the 'outbox' section in config_t
+PERIOD       = 60       # seconds between outbox scans
+MAX_ATTEMPTS = 10       # delivery attempts before giving up
+RETRY_DELAY  = 60       # seconds before the first retry, doubled on every attempt
+MAX_DELAY    = 6*3600   # upper limit of the retry delay
+
+# Seconds a delivery may take before being considered failed
+SEND_TIMEOUT = 120
+
+STATUS_PENDING = 'pending'
+STATUS_SENT    = 'sent'
+STATUS_FAILED  = 'failed'
+
+# ------------------------
+# Module Utility Functions
+# ------------------------
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+def retry_delay(attempts, base=RETRY_DELAY, limit=MAX_DELAY):
+    '''Exponential backoff with up to 10% random jitter, in seconds'''
+    delay = min(limit, base * 2 ** max(0, attempts - 1))
+    return delay + random.uniform(0, delay / 10)
+
+
+def build_message(subject, body, sender, receivers, attachment=None, confidential=False):
+    '''
+    Builds a MIME message with an optional file attachment.
+    receivers is a comma separated list of addresses, which are sent as Bcc if confidential.
+    Returns the message as bytes.
+    '''
+    message = MIMEMultipart()
+    message["Subject"] = subject
+    message["From"] = sender
+    if confidential:
+        message["To"]   = sender
+        message["Bcc"]  = receivers
+    else:
+        message["To"]   = receivers
+    message.attach(MIMEText(body, "plain"))
+    if attachment:
+        with open(attachment, "rb") as fd:
+            # Add file as application/octet-stream
+            # Email client can usually download this automatically as attachment
+            part = MIMEBase("application", "octet-stream")
+            part.set_payload(fd.read())
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", f"attachment; filename= {os.path.basename(attachment)}")
+        message.attach(part)
+    return message.as_bytes()
+
+# --------------
+# Module Classes
+# --------------
+
+class OutboxService(Service):
+    '''
+    Persistent email outbox. Messages are queued in outbox_t by the
+    'outbox_enqueue_req' event and delivered in the background with Twisted's
+    non blocking ESMTP client, so that the reactor never waits on the network.
+    Failed deliveries are retried with exponential backoff up to a maximum
+    number of attempts. Batch reports mark their batch as emailed (or not)
+    in batch_t once delivered (or given up). The outbox state is published
+    with 'outbox_status' after every change.
+
+    SMTP settings are read from the 'smtp' section on every delivery:
+    host, port, sender, receivers, password (no login if empty) and
+    starttls (1 by default, 0 for a plain local SMTP server).
+    '''
+
+    NAME = 'Outbox Service'
+
+    def __init__(self, *args, **kargs):
+        super().__init__(*args, **kargs)
+        self._sending = False
+        self._task = task.LoopingCall(self.flush)
+        setLogLevel(namespace=NAMESPACE, levelStr='info')
+
+    # -----------
+    # Service API
+    # -----------
+
+    def startService(self):
+        log.info('Starting {name}', name=self.name)
+        self.dbaseService = self.parent.getServiceNamed(DatabaseService.NAME)
+        config = self.dbaseService.getInitialConfig(SECTION)
+        self.period       = int(config.get('period', PERIOD))
+        self.max_attempts = int(config.get('max_attempts', MAX_ATTEMPTS))
+        self.retry_delay  = int(config.get('retry_delay', RETRY_DELAY))
+        pub.subscribe(self.onEnqueueReq, 'outbox_enqueue_req')
+        pub.subscribe(self.onStatusReq, 'outbox_status_req')
+        super().startService()
+        self._task.start(self.period, now=False)
+
+    def stopService(self):
+        log.info('Stopping {name}', name=self.name)
+        if self._task.running:
+            self._task.stop()
+        return super().stopService()
+
+    # --------------
+    # Event handlers
+    # --------------
+
+    @inlineCallbacks
+    def onEnqueueReq(self, job):
+        try:
+            yield self.enqueue(**job)
+            reactor.callLater(0, self.flush)
+        except Exception as e:
+            log.failure('{e}', e=e)
+
+    @inlineCallbacks
+    def onStatusReq(self):
+        try:
+            yield self.publish()
+        except Exception as e:
+            log.failure('{e}', e=e)
+
+    # ----------
+    # Public API
+    # ----------
+
+    @inlineCallbacks
+    def enqueue(self, subject, body, attachment=None, batch=None):
+        '''Queues a message for delivery. Returns a Deferred'''
+        row = {
+            'batch': batch, 'subject': subject, 'body': body, 'attachment': attachment,
+            'status': STATUS_PENDING, 'now': _utcnow().isoformat(),
+        }
+        yield self.dbaseService.pool.runInteraction(self._insert, row)
+        log.info("Queued email '{subject}'", subject=subject)
+        yield self.publish("Email queued")
+
+    @inlineCallbacks
+    def flush(self):
+        '''Delivers the messages due, one at a time. Returns a Deferred'''
+        pool = self.dbaseService.pool
+        if self._sending or pool is None:
+            return
+        self._sending = True
+        try:
+            jobs = yield pool.runReadInteraction(self._due, _utcnow().isoformat())
+            for job in jobs:
+                yield self._deliver(job)
+        except Exception as e:
+            log.failure('{e}', e=e)
+        finally:
+            self._sending = False
+
+    @inlineCallbacks
+    def publish(self, message=None):
+        '''Publishes the outbox counters with 'outbox_status'. Returns a Deferred'''
+        counters = yield self.dbaseService.pool.runReadInteraction(self._counters)
+        status = {STATUS_PENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        status.update(counters)
+        status['message'] = message
+        pub.sendMessage('outbox_status', status=status)
+
+    # --------------
+    # Helper methods
+    # --------------
+
+    @inlineCallbacks
+    def _deliver(self, job):
+        config = yield self.dbaseService.dao.config.loadSection('smtp')
+        config = dict(config)
+        attempts = job['attempts'] + 1
+        try:
+            message = yield deferToThread(build_message,
+                subject    = job['subject'],
+                body       = job['body'],
+                sender     = config['sender'],
+                receivers  = config['receivers'],
+                attachment = job['attachment'],
+            )
+            from twisted.mail import smtp
+            password = config.get('password') or None
+            d = smtp.sendmail(
+                config['host'],
+                config['sender'],
+                [address.strip() for address in config['receivers'].split(',')],
+                io.BytesIO(message),
+                port = int(config.get('port', 587)),
+                username = config['sender'] if password else None,
+                password = password,
+                requireAuthentication = password is not None,
+                requireTransportSecurity = bool(int(config.get('starttls', 1))),
+            )
+            d.addTimeout(SEND_TIMEOUT, reactor)
+            yield d
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            # A missing attachment will not show up by retrying
+            final = attempts >= self.max_attempts or isinstance(e, FileNotFoundError)
+            if final:
+                log.error("Giving up email {id} after {n} attempts: {e}", id=job['id'], n=attempts, e=error)
+                row = {'id': job['id'], 'status': STATUS_FAILED, 'attempts': attempts, 'error': error,
+                    'next': None, 'batch': job['batch'], 'emailed': 0}
+            else:
+                delay = retry_delay(attempts, self.retry_delay)
+                log.warn("Email {id} attempt {n} failed, retrying in {delay:.0f} s.: {e}", id=job['id'], n=attempts, delay=delay, e=error)
+                row = {'id': job['id'], 'status': STATUS_PENDING, 'attempts': attempts, 'error': error,
+                    'next': (_utcnow() + datetime.timedelta(seconds=delay)).isoformat(), 'batch': job['batch'], 'emailed': None}
+            yield self.dbaseService.pool.runInteraction(self._update, row)
+            yield self.publish(f"Email failed: {error}" if final else f"Email retry #{attempts}")
+        else:
+            log.info("Email {id} sent", id=job['id'])
+            row = {'id': job['id'], 'status': STATUS_SENT, 'attempts': attempts, 'error': None,
+                'next': None, 'batch': job['batch'], 'emailed': 1}
+            yield self.dbaseService.pool.runInteraction(self._update, row)
+            yield self.publish("Email sent")
+
+    # -----------------
+    # Read interactions
+    # -----------------
+
+    def _due(self, txn, now):
+        txn.execute('''
+            SELECT id, batch, subject, body, attachment, attempts
+            FROM outbox_t
+            WHERE status = 'pending' AND next_attempt <= :now
+            ORDER BY next_attempt, id
+            ''', {'now': now})
+        columns = ('id', 'batch', 'subject', 'body', 'attachment', 'attempts')
+        return [dict(zip(columns, row)) for row in txn.fetchall()]
+
+    def _counters(self, txn):
+        txn.execute("SELECT status, count(*) FROM outbox_t GROUP BY status")
+        return dict(txn.fetchall())
+
+    # ------------------
+    # Write interactions
+    # ------------------
+
+    def _insert(self, txn, row):
+        txn.execute('''
+            INSERT INTO outbox_t(batch, subject, body, attachment, status, attempts, next_attempt, created_at)
+            VALUES (:batch, :subject, :body, :attachment, :status, 0, :now, :now)
+            ''', row)
+
+    def _update(self, txn, row):
+        txn.execute('''
+            UPDATE outbox_t
+            SET status = :status, attempts = :attempts, last_error = :error, next_attempt = :next,
+                sent_at = CASE WHEN :status = 'sent' THEN datetime('now') END
+            WHERE id = :id
+            ''', row)
+        if row['batch'] is not None and row['emailed'] is not None:
+            txn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'batch_t'")
+            if txn.fetchone():
+                txn.execute("UPDATE batch_t SET email_sent = :emailed WHERE begin_tstamp = :batch", row)
+
+
+__all__ = [
+    "OutboxService",
+    "build_message",
+    "retry_delay",
+]
@@ -15,7 +15,8 @@ import datetime
 # Twisted imports
 # ---------------
 
-import treq
+# treq (twisted.web and TLS) is imported on first HTTP request only,
+# as it doubles the command line startup time
 from twisted.internet             import reactor, task, defer
 from twisted.internet.defer       import inlineCallbacks
 from zope.interface               import implementer
@@ -92,6 +93,7 @@ class HTMLPhotometer:
         url = self._make_config_url()
         self.log.info("==> {label:6s} [HTTP GET] {url}", url=url, label=label)
         params = [('cons', '{0:0.2f}'.format(zero_point))]
+        import treq
         resp = yield treq.get(url, params=params, timeout=4)
         text = yield treq.text_content(resp)
         self.log.info("<== {label:6s} [HTTP GET] {url}", url=url, label=label)
@@ -113,6 +115,7 @@ class HTMLPhotometer:
        
         url = self._make_state_url()
         self.log.info("==> {label:6s} [HTTP GET] {url}", label=label,url=url)
+        import treq
         resp = yield treq.get(url, timeout=timeout)
         text = yield treq.text_content(resp)
         self.log.info("<== {label:6s} [HTTP GET] {url}", label=label, url=url)